@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from authemail.admin import EmailUserAdmin
-from.models import Video
+from.models import Video, VideoRendition
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
@@ -28,6 +28,7 @@ class MyUserAdmin(EmailUserAdmin):
 class VideoResource(resources.ModelResource):
     class Meta:
         model = Video
+        exclude = ("search_vector",)
     """
     Custom resource class for handling Video data import and export.
     This class extends the 'ModelResource' class provided by the 'django-import-export'
@@ -42,9 +43,17 @@ class VideoAdmin(ImportExportModelAdmin):
 	package, enabling the import and export of Video records in the Django admin interface.
 	"""
 
+class VideoRenditionInline(admin.TabularInline):
+    """
+    Read-only inline listing the HLS renditions packaged for a video.
+    """
+    model = VideoRendition
+    extra = 0
+    readonly_fields = ('resolution', 'width', 'height', 'bandwidth', 'average_bandwidth', 'playlist_file')
+
 @admin.register(Video)
 class VideoAdmin(ImportExportModelAdmin):
-    pass
+    inlines = [VideoRenditionInline]
     """
     Registers the 'Video' model with the Django admin site using the custom 'VideoAdmin' class.
     This class includes import/export functionality.
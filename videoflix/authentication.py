@@ -0,0 +1,105 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .metrics import increment
+
+# User columns never written to the token cache.
+UNCACHED_USER_FIELDS = ("password",)
+
+
+def token_cache_key(key):
+    """
+    Return the shared cache key for an authentication token.
+
+    The token itself is hashed, so raw credentials never appear in Redis key names.
+    """
+
+    return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def evict_cached_token(key):
+    """
+    Remove a token from the shared (Redis) token cache.
+
+    Called when a token is deleted or its user changes, so the next request
+    with this token is checked against the database again.
+
+    Parameters:
+    - key (str): The token key.
+    """
+
+    cache.delete(token_cache_key(key))
+
+
+def cache_entry(token):
+    """
+    Return the cached form of a token: its creation time and the columns of its user except the password hash.
+    """
+
+    user = token.user
+    return {
+        "created": token.created,
+        "user": {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname not in UNCACHED_USER_FIELDS
+        },
+    }
+
+
+def restore_token(model, key, entry):
+    """
+    Build a new token and user instance from a cache entry.
+
+    The instances are created as if loaded from the database, with the
+    password deferred: it is only read (with a query) if accessed, and
+    saving the user does not overwrite it.
+    """
+
+    user_model = model._meta.get_field("user").related_model
+    names = list(entry["user"])
+    user = user_model.from_db(DEFAULT_DB_ALIAS, names, [entry["user"][name] for name in names])
+    token = model.from_db(DEFAULT_DB_ALIAS, ["key", "user_id", "created"], [key, user.pk, entry["created"]])
+    token.user = user
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with cached token lookups.
+
+    DRF's 'TokenAuthentication' queries the token and its user from the
+    database on every request. This class looks the token up in the shared
+    Redis cache first (valid for TOKEN_CACHE_TTL seconds) and only queries
+    the database (with the user joined) on a miss.
+
+    Only the token's creation time and the user's columns without the
+    password hash are cached, and every request gets its own user instance.
+    Deleting a token (e.g. through 'LogoutView') or saving its user evicts
+    the cached entry (see 'videoflix.signals'). Every process reads the
+    same entry, so revocation takes effect immediately everywhere.
+    """
+
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        source = "cache"
+        entry = cache.get(token_cache_key(key))
+        if entry is not None:
+            token = restore_token(model, key, entry)
+        else:
+            source = "database"
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                increment("videoflix_token_auth_total", {"source": "invalid"})
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cache.set(token_cache_key(key), cache_entry(token), settings.TOKEN_CACHE_TTL)
+        increment("videoflix_token_auth_total", {"source": source})
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
@@ -0,0 +1,126 @@
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+import django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+def percentile(samples, percent):
+    """
+    Return a percentile of a list of samples (nearest-rank method).
+
+    Parameters:
+    - samples (list): The measured values.
+    - percent (float): The percentile, between 0 and 100.
+
+    Returns:
+    - float: The smallest sample that at least 'percent' percent of the samples do not exceed.
+    """
+
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(timings, queries, peak_memory):
+    """
+    Summarize the measurements of one benchmark scenario.
+
+    Parameters:
+    - timings (list): The duration of every run in seconds.
+    - queries (list): The number of database queries of every run.
+    - peak_memory (int): The highest memory allocated during a run, in bytes.
+
+    Returns:
+    - dict: Latencies in milliseconds, query counts and peak memory in KiB.
+    """
+
+    return {
+        "runs": len(timings),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 3),
+        "queries": max(queries),
+        "peak_memory_kib": round(peak_memory / 1024, 1),
+    }
+
+
+def measure(run, repeat, prepare=None, memory_runs=3, warmup=1):
+    """
+    Run a benchmark scenario and measure it.
+
+    After 'warmup' untimed runs (filling caches as in a running site), latency
+    and query counts are measured over 'repeat' runs. Peak memory is
+    measured with tracemalloc over 'memory_runs' separate runs, so its
+    overhead does not distort the latencies.
+
+    Parameters:
+    - run (callable): Function executing the scenario once.
+    - repeat (int): The number of timed runs.
+    - prepare (callable, optional): Function called before every run, not timed.
+      It may return a value that is passed to 'run'.
+    - memory_runs (int, optional): The number of runs traced for peak memory. Defaults to 3.
+    - warmup (int, optional): The number of untimed runs before measuring. Defaults to 1.
+
+    Returns:
+    - dict: The summary of the measurements (see 'summarize').
+    """
+
+    def arguments():
+        return () if prepare is None else (prepare(),)
+
+    for _ in range(warmup):
+        run(*arguments())
+    timings, queries = [], []
+    for _ in range(repeat):
+        args = arguments()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            run(*args)
+            timings.append(time.perf_counter() - start)
+        queries.append(len(captured))
+
+    peak_memory = 0
+    for _ in range(min(memory_runs, repeat)):
+        args = arguments()
+        tracemalloc.start()
+        try:
+            run(*args)
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return summarize(timings, queries, peak_memory)
+
+
+def environment():
+    """
+    Describe the environment a benchmark ran in, stored with its results.
+    """
+
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "python": sys.version.split()[0],
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "platform": platform.platform(),
+    }
+
+
+def write_results(results, output, stdout):
+    """
+    Write benchmark results as JSON to a file, or to stdout if no file is given.
+    """
+
+    data = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as output_file:
+            output_file.write(data + "\n")
+    else:
+        stdout.write(data)
@@ -0,0 +1,247 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from .metrics import increment
+from .models import Video
+
+CACHE_TTL = getattr(settings, "CACHE_TTL", DEFAULT_TIMEOUT)
+
+LIST_NAMESPACE = "list"
+
+
+def genre_namespace(genre):
+    """
+    Return the cache namespace of the video list filtered by one genre.
+    """
+
+    return f"genre:{genre}"
+
+
+def detail_namespace(pk):
+    """
+    Return the cache namespace of a single video.
+    """
+
+    return f"detail:{pk}"
+
+
+def video_namespaces(video, genres=None):
+    """
+    Return every cache namespace whose content includes the given video.
+
+    Parameters:
+    - video (Video): The video that changed.
+    - genres (iterable, optional): The genres to invalidate. Defaults to the genre of the video.
+
+    Returns:
+    - list: The affected namespaces.
+    """
+
+    genres = genres or [video.genre]
+    return [LIST_NAMESPACE, detail_namespace(video.pk)] + [genre_namespace(genre) for genre in genres]
+
+
+def exists_key(pk):
+    return f"catalog:exists:{pk}"
+
+
+def video_exists(pk):
+    """
+    Return whether a video exists, caching positive answers.
+
+    Used by the endpoints called every few seconds by players (heartbeats, 
+    plays), so they reject unknown videos without a query per call. Only 
+    existing videos are cached, so a video created later is found at once; 
+    the entry is removed when the video is deleted (see videoflix.signals).
+
+    Parameters:
+    - pk (int): The primary key of the video.
+
+    Returns:
+    - bool: Whether the video exists.
+    """
+
+    if cache.get(exists_key(pk)):
+        return True
+    exists = Video.objects.filter(pk=pk).exists()
+    if exists:
+        cache.set(exists_key(pk), True, CACHE_TTL)
+    return exists
+
+
+def version_key(namespace):
+    return f"catalog:version:{namespace}"
+
+
+def modified_key(namespace):
+    return f"catalog:modified:{namespace}"
+
+
+def initial_version():
+    """
+    Return the version assigned to a namespace that has none yet.
+
+    Versions start at the current time in milliseconds instead of 1, so a
+    namespace whose counter was evicted from Redis can never reuse a version
+    (and therefore a cached payload or ETag) that was handed out before.
+    """
+
+    return int(time.time() * 1000)
+
+
+def get_catalog_version(namespace):
+    """
+    Read the current version of a cache namespace, creating it if needed.
+
+    Parameters:
+    - namespace (str): The namespace, e.g. LIST_NAMESPACE or detail_namespace(pk).
+
+    Returns:
+    - int: The current version.
+    """
+
+    key = version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = initial_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_catalog_state(namespace):
+    """
+    Read the version and the last modification time of a cache namespace.
+
+    Both values are fetched in one cache round trip. They are cheap validators
+    for conditional requests: the response of a namespace can only change when
+    its version changes.
+
+    Parameters:
+    - namespace (str): The namespace.
+
+    Returns:
+    - tuple: The current version and the time of the last invalidation as a timestamp.
+    """
+
+    values = cache.get_many([version_key(namespace), modified_key(namespace)])
+    version = values.get(version_key(namespace))
+    if version is None:
+        version = get_catalog_version(namespace)
+    last_modified = values.get(modified_key(namespace))
+    if last_modified is None:
+        last_modified = int(time.time())
+        if not cache.add(modified_key(namespace), last_modified, timeout=None):
+            last_modified = cache.get(modified_key(namespace), last_modified)
+    return version, last_modified
+
+
+def bump_catalog_versions(*namespaces):
+    """
+    Invalidate cache namespaces by incrementing their versions.
+
+    Cached entries of the old versions are never read again and simply
+    expire, so no keys have to be searched for or deleted and unrelated
+    cache entries are left untouched. The modification time of the
+    namespaces is set to now.
+
+    Parameters:
+    - *namespaces (str): The namespaces to invalidate.
+    """
+
+    namespaces = set(namespaces)
+    for namespace in namespaces:
+        key = version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_version(), timeout=None)
+    now = int(time.time())
+    cache.set_many({modified_key(namespace): now for namespace in namespaces}, timeout=None)
+
+
+def catalog_key(namespace, version, *parts):
+    """
+    Build the cache key of an entry in a namespace.
+
+    Parameters:
+    - namespace (str): The namespace of the entry.
+    - version (int): The current version of the namespace.
+    - *parts: Values distinguishing entries of the same namespace (e.g. the request URL).
+
+    Returns:
+    - str: The cache key.
+    """
+
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f"catalog:{namespace}:{version}:{digest}"
+
+
+def catalog_etag(namespace, version, *parts):
+    """
+    Build a strong ETag for a response of a namespace.
+
+    The ETag is derived from the namespace version instead of the response
+    body, so it can be checked before anything is queried or serialized.
+
+    Parameters:
+    - namespace (str): The namespace of the response.
+    - version (int): The current version of the namespace.
+    - *parts: Values distinguishing responses of the same namespace (e.g. URL and format).
+
+    Returns:
+    - str: The quoted ETag.
+    """
+
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()[:16]
+    return f'"{namespace}-{version}-{digest}"'
+
+
+def get_or_compute(key, compute, timeout=CACHE_TTL):
+    """
+    Return a cached value, computing it at most once on concurrent misses.
+
+    On a miss, the first caller takes a short-lived lock (an atomic 'add') and
+    computes the value. Concurrent callers wait for that value instead of all
+    querying the database at the same time (dogpile protection). If the lock
+    holder does not finish within CATALOG_CACHE_LOCK_TIMEOUT, waiting callers
+    compute the value themselves.
+
+    Parameters:
+    - key (str): The cache key.
+    - compute (callable): Function without arguments returning the value.
+    - timeout (int, optional): Lifetime of the cached value in seconds. Defaults to CACHE_TTL.
+
+    Returns:
+    - The cached or freshly computed value.
+    """
+
+    value = cache.get(key)
+    if value is not None:
+        increment("videoflix_catalog_cache_total", {"result": "hit"})
+        return value
+
+    lock_timeout = getattr(settings, "CATALOG_CACHE_LOCK_TIMEOUT", 10)
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        increment("videoflix_catalog_cache_total", {"result": "miss"})
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            increment("videoflix_catalog_cache_total", {"result": "wait"})
+            return value
+        if cache.get(lock_key) is None:
+            break
+    increment("videoflix_catalog_cache_total", {"result": "fallback"})
+    return compute()
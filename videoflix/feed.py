@@ -0,0 +1,44 @@
+from .models import Video
+
+
+def newest_per_genre(limit, fields):
+    """
+    Query the newest videos of every genre with a single query.
+
+    The query is a UNION ALL of one 'ORDER BY created_at DESC, id DESC LIMIT n'
+    subquery per genre. Each of them reads only its first rows from the
+    '(genre, created_at, id)' index, so the cost does not grow with the
+    catalog. (A 'ROW_NUMBER() OVER (PARTITION BY genre ...)' window has to
+    number every video of the table first.)
+
+    Parameters:
+    - limit (int): The number of videos per genre.
+    - fields (iterable): The columns to read, e.g. VideoCatalogSerializer.fields.
+
+    Returns:
+    - QuerySet: The '.values()' rows, ordered by genre and newest first within each genre.
+    """
+
+    queries = [
+        Video.objects.filter(genre=genre).order_by("-created_at", "-id").values(*fields)[:limit]
+        for genre, _ in Video.GENRES
+    ]
+    return queries[0].union(*queries[1:], all=True).order_by("genre", "-created_at", "-id")
+
+
+def build_home_feed(videos):
+    """
+    Group serialized videos into the rows of the home screen, one per entry of Video.GENRES.
+
+    Parameters:
+    - videos (list): Serialized videos (e.g. of 'newest_per_genre').
+
+    Returns:
+    - list: One dict per genre with 'genre', 'name' and its 'results', in the order of Video.GENRES.
+      Genres without videos have empty results.
+    """
+
+    rows = {genre: [] for genre, _ in Video.GENRES}
+    for video in videos:
+        rows.setdefault(video["genre"], []).append(video)
+    return [{"genre": genre, "name": name, "results": rows[genre]} for genre, name in Video.GENRES]
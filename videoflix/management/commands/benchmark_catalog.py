@@ -0,0 +1,204 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from videoflix.benchmarks import environment, measure, write_results
+from videoflix.catalog_cache import LIST_NAMESPACE, bump_catalog_versions, detail_namespace, genre_namespace
+from videoflix.models import Video
+from videoflix.renderers import FastJSONRenderer
+from videoflix.serializers import VideoCatalogSerializer, VideoSerializer
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+# Maximum number of videos serialized at once by the serialize scenarios.
+SERIALIZE_ROWS = 10000
+
+# Search typed by a user, matching about 1% of the synthetic videos.
+SEARCH_URL = "/videos/search/?q=video+42"
+
+
+class Command(BaseCommand):
+    """
+    Management command benchmarking the catalog and authentication endpoints.
+
+    Creates a throwaway test database (like the test runner), fills it with
+    synthetic videos and users in steps of the requested sizes and measures
+    the following requests through the test client at every size:
+    - list / list_uncached: the first page of 'VideoView', served from the
+      catalog cache and with the cache invalidated before every request,
+    - home / home_uncached: the genre rows of 'HomeFeedView', the same way,
+    - detail / detail_uncached: a single video, the same way,
+    - login: 'LoginView' with email and password,
+    - logout: 'LogoutView' with a fresh token,
+    - serialize / serialize_fast: querying, serializing and rendering up to
+      10k videos with 'VideoSerializer' and 'JSONRenderer', and with
+      'VideoCatalogSerializer' and 'FastJSONRenderer' (the catalog path).
+      The ratio of their p50 latencies is reported as 'serialize_speedup',
+    - search / search_uncached: 'VideoSearchView' with a prefix query, the
+      same way as the list (PostgreSQL only).
+
+    For every request p50/p95/mean latency, the number of queries and the
+    peak memory are reported as JSON, so results of releases can be compared.
+    Cache entries are written with the key prefix 'benchmark' and metrics are
+    disabled, so the caches and metrics of a running site are not touched.
+
+    Usage:
+    - python manage.py benchmark_catalog
+    - python manage.py benchmark_catalog --sizes 1000 10000 --requests 100 --output results.json
+    """
+
+    help = "Benchmark the catalog, login and logout endpoints against synthetic data."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10000, 100000],
+            help="Numbers of videos (and users) to benchmark with (default: 1000 10000 100000).",
+        )
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per scenario (default: 50).")
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        caches = {name: {**config, "KEY_PREFIX": "benchmark"} for name, config in settings.CACHES.items()}
+        try:
+            with override_settings(CACHES=caches, METRICS_ENABLED=False):
+                results = self.run_benchmarks(options["sizes"], options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        write_results(results, options["output"], self.stdout)
+
+    def run_benchmarks(self, sizes, requests):
+        """
+        Fill the database step by step and benchmark every scenario at each size.
+
+        Parameters:
+        - sizes (list): The numbers of videos (and users) to benchmark with.
+        - requests (int): The number of timed requests per scenario.
+
+        Returns:
+        - dict: The environment and the results per size and scenario.
+        """
+
+        User = get_user_model()
+        user = User.objects.create_user(email="benchmark@example.com", password=BENCHMARK_PASSWORD)
+        logout_user = User.objects.create_user(email="benchmark-logout@example.com", password=BENCHMARK_PASSWORD)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=user).key)
+
+        def get(url):
+            return self.check_response(url, client.get(url))
+
+        def login():
+            data = {"username": user.email, "password": BENCHMARK_PASSWORD}
+            return self.check_response("/login/", APIClient().post("/login/", data))
+
+        def logout(key):
+            return self.check_response("/logout/", APIClient(HTTP_AUTHORIZATION="Token " + key).post("/logout/"))
+
+        request = APIRequestFactory().get("/videos/")
+
+        def serialize(rows):
+            videos = Video.objects.prefetch_related("renditions")[:rows]
+            return JSONRenderer().render(VideoSerializer(videos, many=True, context={"request": request}).data)
+
+        def serialize_fast(rows):
+            serializer = VideoCatalogSerializer(request)
+            return FastJSONRenderer().render(serializer.serialize(Video.objects.values(*serializer.fields)[:rows]))
+
+        results = {**environment(), "requests": requests, "sizes": []}
+        for size in sorted(sizes):
+            self.populate(size)
+            pk = Video.objects.order_by("pk").values_list("pk", flat=True)[size // 2]
+            detail_url = f"/videos/{pk}/"
+            rows = min(size, SERIALIZE_ROWS)
+            self.stderr.write(f"Benchmarking {size} videos...")
+            results["sizes"].append({
+                "videos": size,
+                "scenarios": {
+                    "list": measure(lambda: get("/videos/"), requests),
+                    "list_uncached": measure(
+                        lambda _: get("/videos/"), requests, prepare=lambda: bump_catalog_versions(LIST_NAMESPACE)
+                    ),
+                    "home": measure(lambda: get("/videos/home/"), requests),
+                    "home_uncached": measure(
+                        lambda _: get("/videos/home/"), requests, prepare=lambda: bump_catalog_versions(LIST_NAMESPACE)
+                    ),
+                    "detail": measure(lambda: get(detail_url), requests),
+                    "detail_uncached": measure(
+                        lambda _: get(detail_url), requests, prepare=lambda: bump_catalog_versions(detail_namespace(pk))
+                    ),
+                    "login": measure(login, requests),
+                    "logout": measure(logout, requests, prepare=lambda: Token.objects.create(user=logout_user).key),
+                    "serialize": measure(lambda: serialize(rows), requests),
+                    "serialize_fast": measure(lambda: serialize_fast(rows), requests),
+                },
+            })
+            scenarios = results["sizes"][-1]["scenarios"]
+            if connection.vendor == "postgresql":
+                scenarios["search"] = measure(lambda: get(SEARCH_URL), requests)
+                scenarios["search_uncached"] = measure(
+                    lambda _: get(SEARCH_URL), requests, prepare=lambda: bump_catalog_versions(LIST_NAMESPACE)
+                )
+            results["sizes"][-1]["serialize_speedup"] = round(
+                scenarios["serialize"]["p50_ms"] / scenarios["serialize_fast"]["p50_ms"], 1
+            )
+        return results
+
+    def populate(self, size):
+        """
+        Add synthetic videos and users until there are 'size' of each.
+
+        Rows are inserted with 'bulk_create', which sends no signals, so no
+        upload pipeline is started; the catalog cache is invalidated explicitly.
+        All users share one password hash, since hashing is deliberately slow.
+        """
+
+        User = get_user_model()
+        start = Video.objects.count()
+        if start >= size:
+            return
+        self.stderr.write(f"Generating {size - start} videos and users...")
+        genres = [genre for genre, _ in Video.GENRES]
+        today = date.today()
+        Video.objects.bulk_create(
+            (
+                Video(
+                    title=f"Video {index}",
+                    description=f"Synthetic video number {index} of the benchmark catalog.",
+                    genre=genres[index % len(genres)],
+                    created_at=today - timedelta(days=index % 3650),
+                    video_file=f"videos/benchmark_{index}.mp4",
+                    thumbnail_file=f"thumbnails/benchmark_{index}.jpg",
+                    processing_state=Video.PUBLISHED,
+                )
+                for index in range(start, size)
+            ),
+            batch_size=1000,
+        )
+        password = make_password(BENCHMARK_PASSWORD)
+        User.objects.bulk_create(
+            (User(email=f"user{index}@benchmark.test", password=password, is_verified=True) for index in range(start, size)),
+            batch_size=1000,
+        )
+        bump_catalog_versions(LIST_NAMESPACE, *(genre_namespace(genre) for genre in genres))
+
+    def check_response(self, url, response):
+        """
+        Stop the benchmark if a request failed, since its timings would be meaningless.
+        """
+
+        if response.status_code >= 400:
+            raise CommandError(f"{url} returned {response.status_code}.")
+        return response
@@ -0,0 +1,181 @@
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from videoflix.benchmarks import environment, write_results
+from videoflix.tasks import FFMPEG_PATH, RENDITIONS, convert_renditions
+
+CLIP_FRAME_RATE = 24
+
+# The rendition tasks benchmarked for every clip: a label and the renditions encoded together.
+RENDITION_TASKS = [(resolution, [resolution]) for resolution in RENDITIONS] + [("all", list(RENDITIONS))]
+
+
+def parse_profile(value):
+    """
+    Parse an encoder profile given as 'PRESET:CRF[:THREADS]'.
+
+    Parameters:
+    - value (str): The profile, e.g. "veryfast:26" or "medium:23:4".
+
+    Returns:
+    - dict: The VIDEO_X264_PRESET, VIDEO_X264_CRF and VIDEO_X264_THREADS settings of the profile.
+
+    Raises:
+    - CommandError: If the profile cannot be parsed.
+    """
+
+    parts = value.split(":")
+    if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts[1:]):
+        raise CommandError(f"Invalid profile '{value}', expected PRESET:CRF[:THREADS].")
+    return {
+        "VIDEO_X264_PRESET": parts[0],
+        "VIDEO_X264_CRF": int(parts[1]),
+        "VIDEO_X264_THREADS": int(parts[2]) if len(parts) == 3 else 0,
+    }
+
+
+def children_cpu_seconds():
+    """
+    Return the CPU time (user + system) used by finished child processes so far.
+    """
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Command(BaseCommand):
+    """
+    Management command benchmarking the rendition encodes of the upload pipeline.
+
+    Generates deterministic source clips with the 'testsrc2' and 'sine'
+    sources of FFMPEG's lavfi device for every combination of '--durations'
+    and '--sizes', then runs 'convert_renditions' on them for every rendition
+    (and all renditions at once, as the pipeline does) with every encoder
+    profile. A profile is an x264 preset, CRF and thread count, applied
+    through the VIDEO_X264_* settings.
+
+    Reported per clip, profile and task:
+    - fps: source frames encoded per second of wall time,
+    - cpu_seconds: CPU time of the FFMPEG process,
+    - output_bytes and bitrate_kbps: the size of the encoded files,
+    - speed: clip duration divided by wall time (1.0 is real time).
+
+    Usage:
+    - python manage.py benchmark_transcode
+    - python manage.py benchmark_transcode --profiles veryfast:23 medium:23 slow:21 --durations 60 --output transcode.json
+    """
+
+    help = "Benchmark the rendition encodes with generated test clips and several encoder profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            default=["veryfast:23", "medium:23"],
+            metavar="PRESET:CRF[:THREADS]",
+            help="Encoder profiles to compare (default: veryfast:23 medium:23).",
+        )
+        parser.add_argument(
+            "--durations", nargs="+", type=int, default=[10, 60], help="Clip durations in seconds (default: 10 60)."
+        )
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=["1920x1080", "1280x720"],
+            metavar="WIDTHxHEIGHT",
+            help="Clip resolutions (default: 1920x1080 1280x720).",
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        profiles = {profile: parse_profile(profile) for profile in options["profiles"]}
+        work_dir = tempfile.mkdtemp(prefix="benchmark_transcode_")
+        results = {**environment(), "ffmpeg": FFMPEG_PATH, "results": []}
+        try:
+            for size in options["sizes"]:
+                for duration in options["durations"]:
+                    clip_path = self.generate_clip(work_dir, size, duration)
+                    for profile, profile_settings in profiles.items():
+                        for label, resolutions in RENDITION_TASKS:
+                            self.stderr.write(f"{size} {duration}s {profile} {label}...")
+                            # Metrics are disabled, so benchmark runs do not show up in the production counters.
+                            with override_settings(METRICS_ENABLED=False, **profile_settings):
+                                measurement = self.measure_task(clip_path, resolutions, duration)
+                            results["results"].append({
+                                "clip": {"size": size, "duration": duration, "frame_rate": CLIP_FRAME_RATE},
+                                "profile": profile,
+                                "task": label,
+                                **measurement,
+                            })
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        write_results(results, options["output"], self.stdout)
+
+    def generate_clip(self, work_dir, size, duration):
+        """
+        Generate a deterministic test clip with video and audio.
+
+        The clip is encoded nearly losslessly, so decoding it costs about as
+        much as decoding an upload of the same size.
+
+        Parameters:
+        - work_dir (str): The directory to write the clip to.
+        - size (str): The resolution as 'WIDTHxHEIGHT'.
+        - duration (int): The duration in seconds.
+
+        Returns:
+        - str: The path to the clip.
+        """
+
+        clip_path = os.path.join(work_dir, f"clip_{size}_{duration}s.mp4")
+        cmd = (
+            '{} -y -v error -f lavfi -i "testsrc2=size={}:rate={}:duration={}" '
+            '-f lavfi -i "sine=frequency=440:duration={}" -c:v libx264 -preset ultrafast -crf 10 '
+            '-pix_fmt yuv420p -c:a aac -map_metadata -1 -fflags +bitexact "{}"'.format(
+                FFMPEG_PATH, size, CLIP_FRAME_RATE, duration, duration, clip_path
+            )
+        )
+        try:
+            subprocess.run(cmd, shell=True, check=True)
+        except subprocess.CalledProcessError as error:
+            raise CommandError(f"Could not generate the test clip: {error}")
+        return clip_path
+
+    def measure_task(self, clip_path, resolutions, duration):
+        """
+        Run 'convert_renditions' on a clip and measure it.
+
+        The encoded files are deleted afterwards.
+
+        Parameters:
+        - clip_path (str): The path to the test clip.
+        - resolutions (list): The renditions to encode.
+        - duration (int): The duration of the clip in seconds.
+
+        Returns:
+        - dict: Wall and CPU time, frames per second, output size, bitrate and speed.
+        """
+
+        cpu_start = children_cpu_seconds()
+        start = time.perf_counter()
+        output_paths = convert_renditions(clip_path, resolutions)
+        wall_seconds = time.perf_counter() - start
+        cpu_seconds = children_cpu_seconds() - cpu_start
+
+        output_bytes = 0
+        for output_path in output_paths:
+            output_bytes += os.path.getsize(output_path)
+            os.remove(output_path)
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "fps": round(duration * CLIP_FRAME_RATE / wall_seconds, 1),
+            "output_bytes": output_bytes,
+            "bitrate_kbps": round(output_bytes * 8 / duration / 1000, 1),
+            "speed": round(duration / wall_seconds, 2),
+        }
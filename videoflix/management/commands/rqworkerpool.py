@@ -0,0 +1,93 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Management command running a pool of RQ workers sized per queue.
+
+    Starts RQ_WORKER_POOL[queue] 'rqworker' processes for every queue, so
+    thumbnails and low resolution renditions are processed by their own
+    workers while long encodes run in parallel on the heavy queue. Workers
+    that exit unexpectedly are restarted; SIGINT/SIGTERM stop all workers
+    (each finishes its current job first). Workers run with '--with-scheduler',
+    so jobs enqueued for later (e.g. the watch progress flush) are started.
+
+    Usage:
+    - python manage.py rqworkerpool
+    - python manage.py rqworkerpool --workers transcode_heavy=4 thumbnail=2
+    """
+
+    help = "Run a pool of RQ workers with a configurable number of workers per queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            nargs="+",
+            default=[],
+            metavar="QUEUE=COUNT",
+            help="Override the number of workers of a queue (default: RQ_WORKER_POOL).",
+        )
+
+    def handle(self, *args, **options):
+        pool = self.get_pool_sizes(options["workers"])
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        workers = []
+        for queue_name, count in pool.items():
+            for _ in range(count):
+                workers.append([queue_name, self.start_worker(queue_name)])
+        self.stdout.write("Started {} workers: {}".format(
+            len(workers), ", ".join(f"{queue}={count}" for queue, count in pool.items())
+        ))
+
+        while not self.stopping:
+            for worker in workers:
+                queue_name, process = worker
+                if process.poll() is not None and not self.stopping:
+                    self.stderr.write(f"Worker for '{queue_name}' exited with {process.returncode}, restarting.")
+                    worker[1] = self.start_worker(queue_name)
+            time.sleep(1)
+
+        for _, process in workers:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for _, process in workers:
+            process.wait()
+
+    def get_pool_sizes(self, overrides):
+        """
+        Combine RQ_WORKER_POOL with the '--workers' overrides.
+
+        Returns:
+        - dict: Number of workers per queue name.
+        """
+
+        pool = dict(settings.RQ_WORKER_POOL)
+        for override in overrides:
+            queue_name, _, count = override.partition("=")
+            if not count.isdigit():
+                raise CommandError(f"Invalid worker count '{override}', expected QUEUE=COUNT.")
+            pool[queue_name] = int(count)
+        unknown = set(pool) - set(settings.RQ_QUEUES)
+        if unknown:
+            raise CommandError("Unknown queues: {}".format(", ".join(sorted(unknown))))
+        return {queue_name: count for queue_name, count in pool.items() if count > 0}
+
+    def start_worker(self, queue_name):
+        """
+        Start one 'rqworker' process listening on a single queue.
+        """
+
+        manage_py = os.path.join(settings.BASE_DIR, "manage.py")
+        return subprocess.Popen([sys.executable, manage_py, "rqworker", "--with-scheduler", queue_name])
+
+    def stop(self, signum, frame):
+        self.stopping = True
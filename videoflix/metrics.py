@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import defaultdict
+import django_rq
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rq import Worker
+from rq.job import Job
+from rq.utils import utcnow
+
+# Upper bounds of the histogram buckets for request latencies and for job and encode durations (seconds).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+
+# Metrics collected by the application: name -> (type, help text, histogram buckets).
+METRICS = {
+    "videoflix_http_request_duration_seconds": (
+        "histogram", "Time until the response of a request is returned, per URL pattern.", LATENCY_BUCKETS,
+    ),
+    "videoflix_catalog_cache_total": (
+        "counter", "Catalog responses by cache result (hit, miss, wait, fallback, not_modified).", None,
+    ),
+    "videoflix_catalog_snapshot_total": (
+        "counter", "Catalog snapshot responses by result (hit, stale, miss, not_modified) and content coding.", None,
+    ),
+    "videoflix_token_auth_total": (
+        "counter", "Token authentications by the layer answering them (local, cache, database, invalid).", None,
+    ),
+    "videoflix_rq_job_duration_seconds": (
+        "histogram", "Run time of background jobs per queue, function and status.", DURATION_BUCKETS,
+    ),
+    "videoflix_ffmpeg_runs_total": ("counter", "FFMPEG runs per operation and status.", None),
+    "videoflix_transcode_duration_seconds": (
+        "histogram", "Duration of rendition encodes per renditions, x264 preset and CRF.", DURATION_BUCKETS,
+    ),
+}
+
+KEY_PREFIX = "videoflix:metrics:"
+
+# Measurements are collected in process memory and written to Redis at most
+# every METRICS_FLUSH_INTERVAL seconds, so a request only touches Redis for
+# metrics once per interval and process. Redis sums the values of all web and
+# worker processes.
+_counters = defaultdict(float)
+_histograms = {}
+_buffer_lock = threading.Lock()
+_next_flush = 0.0
+
+
+def format_labels(labels):
+    """
+    Format a label dict as in the text exposition format, e.g. 'method="GET",route="videos/"'.
+    """
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return ",".join('{}="{}"'.format(key, escape(value)) for key, value in sorted((labels or {}).items()))
+
+
+def increment(name, labels=None, amount=1):
+    """
+    Increase a counter.
+
+    Parameters:
+    - name (str): A counter of METRICS.
+    - labels (dict, optional): The label values of the series.
+    - amount (float, optional): The increment. Defaults to 1.
+    """
+
+    if not settings.METRICS_ENABLED:
+        return
+    with _buffer_lock:
+        _counters[(name, format_labels(labels))] += amount
+    flush_if_due()
+
+
+def observe(name, value, labels=None):
+    """
+    Record a measurement in a histogram.
+
+    Parameters:
+    - name (str): A histogram of METRICS.
+    - value (float): The measured value, e.g. a duration in seconds.
+    - labels (dict, optional): The label values of the series.
+    """
+
+    if not settings.METRICS_ENABLED:
+        return
+    buckets = METRICS[name][2]
+    index = next((index for index, bound in enumerate(buckets) if value <= bound), len(buckets))
+    with _buffer_lock:
+        counts, total = _histograms.get((name, format_labels(labels)), ([0] * (len(buckets) + 1), 0.0))
+        counts[index] += 1
+        _histograms[(name, format_labels(labels))] = (counts, total + value)
+    flush_if_due()
+
+
+def flush_if_due():
+    if time.monotonic() >= _next_flush:
+        flush()
+
+
+def flush():
+    """
+    Write the measurements collected by this process to Redis.
+
+    Counters are stored in one Redis hash per metric with the label set as
+    field. Histograms store one field per bucket plus the sum and count of
+    the series. If Redis is unavailable the measurements are dropped, so
+    metrics never break a request or a job.
+    """
+
+    global _next_flush
+    with _buffer_lock:
+        counters, histograms = dict(_counters), dict(_histograms)
+        _counters.clear()
+        _histograms.clear()
+        _next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+    if not counters and not histograms:
+        return
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for (name, labels), amount in counters.items():
+            pipe.hincrbyfloat(KEY_PREFIX + name, labels, amount)
+        for (name, labels), (counts, total) in histograms.items():
+            for index, count in enumerate(counts):
+                if count:
+                    pipe.hincrby(KEY_PREFIX + name, f"{labels}|{index}", count)
+            pipe.hincrbyfloat(KEY_PREFIX + name, f"{labels}|sum", total)
+            pipe.hincrby(KEY_PREFIX + name, f"{labels}|count", sum(counts))
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def join_labels(*parts):
+    labels = ",".join(part for part in parts if part)
+    return "{" + labels + "}" if labels else ""
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    The counters and histograms stored in Redis are combined with gauges of
+    the RQ queues that are read at scrape time.
+
+    Returns:
+    - str: The exposition text.
+    """
+
+    flush()
+    connection = get_redis_connection("default")
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        values = {field.decode(): float(value) for field, value in connection.hgetall(KEY_PREFIX + name).items()}
+        if metric_type == "counter":
+            for labels, value in sorted(values.items()):
+                lines.append("{}{} {}".format(name, join_labels(labels), format_value(value)))
+            continue
+        series = sorted({field.rpartition("|")[0] for field in values})
+        for labels in series:
+            cumulative = 0
+            for index, bound in enumerate(buckets):
+                cumulative += values.get("{}|{}".format(labels, index), 0)
+                bucket_labels = join_labels(labels, 'le="{:g}"'.format(bound))
+                lines.append("{}_bucket{} {}".format(name, bucket_labels, format_value(cumulative)))
+            count = values.get(labels + "|count", 0)
+            lines.append("{}_bucket{} {}".format(name, join_labels(labels, 'le="+Inf"'), format_value(count)))
+            lines.append("{}_sum{} {}".format(name, join_labels(labels), format_value(values.get(labels + "|sum", 0))))
+            lines.append("{}_count{} {}".format(name, join_labels(labels), format_value(count)))
+    lines.extend(queue_metrics())
+    return "\n".join(lines) + "\n"
+
+
+def queue_metrics():
+    """
+    Read the state of every RQ queue: jobs per state, workers and the run time of the oldest running job.
+
+    Returns:
+    - list: Lines in the text exposition format.
+    """
+
+    jobs, workers, oldest = [], [], []
+    for queue_name in settings.RQ_QUEUES:
+        queue = django_rq.get_queue(queue_name)
+        registries = {
+            "queued": queue,
+            "started": queue.started_job_registry,
+            "deferred": queue.deferred_job_registry,
+            "scheduled": queue.scheduled_job_registry,
+            "failed": queue.failed_job_registry,
+        }
+        for state, registry in registries.items():
+            jobs.append(f'videoflix_rq_jobs{{queue="{queue_name}",state="{state}"}} {registry.count}')
+        workers.append(f'videoflix_rq_workers{{queue="{queue_name}"}} {Worker.count(queue=queue)}')
+        started = [
+            job.started_at for job in Job.fetch_many(queue.started_job_registry.get_job_ids(), connection=queue.connection)
+            if job is not None and job.started_at is not None
+        ]
+        running = (utcnow() - min(started)).total_seconds() if started else 0
+        oldest.append(f'videoflix_rq_oldest_running_job_seconds{{queue="{queue_name}"}} {format_value(running)}')
+    return [
+        "# HELP videoflix_rq_jobs Jobs per RQ queue and state.",
+        "# TYPE videoflix_rq_jobs gauge",
+        *jobs,
+        "# HELP videoflix_rq_workers Workers listening on an RQ queue.",
+        "# TYPE videoflix_rq_workers gauge",
+        *workers,
+        "# HELP videoflix_rq_oldest_running_job_seconds Run time of the oldest job currently running on a queue.",
+        "# TYPE videoflix_rq_oldest_running_job_seconds gauge",
+        *oldest,
+    ]
+
+
+def record_job(job, status):
+    """
+    Record the run time of a finished or failed RQ job and flush the metrics.
+
+    Called from the job callbacks in the work horse, which exits after the
+    job, so the collected metrics are written to Redis right away.
+
+    Parameters:
+    - job (Job): The job.
+    - status (str): "finished" or "failed".
+    """
+
+    if job.started_at is not None:
+        observe(
+            "videoflix_rq_job_duration_seconds",
+            (utcnow() - job.started_at).total_seconds(),
+            {"queue": job.origin, "func": job.func_name, "status": status},
+        )
+    flush()
+
+
+class MetricsMiddleware:
+    """
+    Middleware measuring the latency of every request per URL pattern.
+
+    The route of the matched URL pattern (e.g. 'videos/<int:pk>/') is used as
+    label instead of the path, so the number of series stays bounded. For
+    streamed responses the time until the response is returned is measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        observe(
+            "videoflix_http_request_duration_seconds",
+            time.perf_counter() - start,
+            {
+                "route": match.route if match is not None else "unmatched",
+                "method": request.method,
+                "status": response.status_code,
+            },
+        )
+        return response
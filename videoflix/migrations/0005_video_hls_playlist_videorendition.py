@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0004_delete_videoprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_playlist',
+            field=models.FileField(blank=True, null=True, upload_to='hls'),
+        ),
+        migrations.CreateModel(
+            name='VideoRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bandwidth', models.PositiveIntegerField()),
+                ('average_bandwidth', models.PositiveIntegerField()),
+                ('playlist_file', models.FileField(upload_to='hls')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='videoflix.video')),
+            ],
+            options={
+                'ordering': ['-bandwidth'],
+                'unique_together': {('video', 'resolution')},
+            },
+        ),
+    ]
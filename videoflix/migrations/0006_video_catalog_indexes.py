@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0005_video_hls_playlist_videorendition'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['created_at', 'id'], name='video_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['genre', 'created_at', 'id'], name='video_genre_created_id_idx'),
+        ),
+    ]
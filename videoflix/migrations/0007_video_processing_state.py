@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+def publish_existing_videos(apps, schema_editor):
+    """
+    Videos uploaded before the pipeline state existed have been processed already.
+    """
+
+    Video = apps.get_model('videoflix', 'Video')
+    Video.objects.update(processing_state='published')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0006_video_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='processing_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='processing_state',
+            field=models.CharField(choices=[('pending', 'Pending'), ('probing', 'Probing'), ('transcoding', 'Transcoding'), ('finalizing', 'Finalizing'), ('published', 'Published'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(publish_existing_videos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:22
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Keeps 'search_vector' current on every insert and on updates of title or description.
+# The 'simple' configuration does not stem, so prefixes of words typed so far match
+# (see videoflix.search). Titles are weighted above descriptions for ranking.
+CREATE_TRIGGER = """
+CREATE FUNCTION videoflix_video_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER videoflix_video_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, description ON videoflix_video
+FOR EACH ROW EXECUTE FUNCTION videoflix_video_search_vector_update();
+
+UPDATE videoflix_video SET title = title;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS videoflix_video_search_vector_trigger ON videoflix_video;
+DROP FUNCTION IF EXISTS videoflix_video_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0009_video_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='video_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
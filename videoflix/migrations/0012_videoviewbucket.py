@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0011_watchprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField(db_index=True)),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='videoflix.video')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('video', 'bucket_start'), name='view_bucket_video_start_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix', '0012_videoviewbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='preview_track',
+            field=models.FileField(blank=True, null=True, upload_to='previews'),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from datetime import date
 import datetime
+import uuid
 from authemail.models import EmailUserManager, EmailAbstractUser
 
 class MyUser(EmailAbstractUser):
@@ -27,7 +31,18 @@ class Video(models.Model):
     - description: A brief description of the video (maximum 500 characters).
     - video_file: A file field to upload the actual video file (optional).
     - thumbnail_file: A file field to upload the video's thumbnail image (optional).
+    - thumbnail_variants: Smaller copies of the thumbnail in modern image formats (type, width 
+      and file of each, set by the thumbnail step of the pipeline).
     - genre: The genre of the video, chosen from a predefined set of categories (default is "fitness").
+    - hls_playlist: The HLS master playlist listing all renditions (set once packaging has finished).
+    - duration: The duration of the source in seconds (set by the probe step of the pipeline).
+    - processing_state: The step of the upload pipeline the video is in (see videoflix.pipeline).
+    - processing_error: The error of the failed pipeline job, if any.
+    - content_hash: The SHA-256 digest of the source, used to detect re-uploads of the same file.
+    - preview_track: The WebVTT track of seek-preview images pointing into sprite sheets
+      (set by the preview step of the pipeline).
+    - search_vector: The full-text search document of title and description, maintained by a 
+      database trigger (see videoflix.search).
     """
     
     GENRES = [
@@ -35,10 +50,165 @@ class Video(models.Model):
     ("pets", "Pets"),
     ("holiday", "Holiday"),
     ]
+    
+    PENDING = "pending"
+    PROBING = "probing"
+    TRANSCODING = "transcoding"
+    FINALIZING = "finalizing"
+    PUBLISHED = "published"
+    FAILED = "failed"
+    PROCESSING_STATES = [
+    (PENDING, "Pending"),
+    (PROBING, "Probing"),
+    (TRANSCODING, "Transcoding"),
+    (FINALIZING, "Finalizing"),
+    (PUBLISHED, "Published"),
+    (FAILED, "Failed"),
+    ]
         
     created_at = models.DateField(default=datetime.date.today)
     title = models.CharField(max_length=80)
     description = models.CharField(max_length=500)
     video_file = models.FileField(upload_to="videos", blank=True, null=True)
     thumbnail_file = models.FileField(upload_to="thumbnails", blank=True, null=True)
-    genre = models.CharField(max_length=20, choices=GENRES, default="fitness")
\ No newline at end of file
+    thumbnail_variants = models.JSONField(default=list, blank=True)
+    genre = models.CharField(max_length=20, choices=GENRES, default="fitness")
+    hls_playlist = models.FileField(upload_to="hls", blank=True, null=True)
+    duration = models.FloatField(blank=True, null=True)
+    processing_state = models.CharField(max_length=20, choices=PROCESSING_STATES, default=PENDING)
+    processing_error = models.TextField(blank=True, default="")
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    preview_track = models.FileField(upload_to="previews", blank=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog, optionally filtered by genre.
+            models.Index(fields=["created_at", "id"], name="video_created_id_idx"),
+            models.Index(fields=["genre", "created_at", "id"], name="video_genre_created_id_idx"),
+            # Full-text search of the catalog.
+            GinIndex(fields=["search_vector"], name="video_search_vector_idx"),
+        ]
+
+
+class VideoRendition(models.Model):
+    """
+    Model representing one HLS rendition (variant stream) of a Video.
+
+    Every rendition is a segmented copy of one of the transcoded resolutions
+    and is referenced from the video's master playlist, so players can switch
+    between them while streaming.
+
+    Fields:
+    - video: The Video this rendition belongs to.
+    - resolution: The resolution label of the rendition (e.g. "720p").
+    - width: The frame width in pixels.
+    - height: The frame height in pixels.
+    - bandwidth: The peak bitrate in bits per second, as announced in the master playlist.
+    - average_bandwidth: The average bitrate in bits per second.
+    - playlist_file: The media playlist listing the segments of this rendition.
+    """
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="renditions")
+    resolution = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    bandwidth = models.PositiveIntegerField()
+    average_bandwidth = models.PositiveIntegerField()
+    playlist_file = models.FileField(upload_to="hls")
+
+    class Meta:
+        unique_together = ("video", "resolution")
+        ordering = ["-bandwidth"]
+
+
+class Upload(models.Model):
+    """
+    Model representing a resumable video upload.
+
+    The file is sent in chunks (see videoflix.uploads) that are appended 
+    directly to its final location below MEDIA_ROOT. Once 'offset' reaches 
+    'length', the Video is created from the file and its upload pipeline starts.
+
+    Fields:
+    - id: A random UUID, used in the URL of the upload.
+    - user: The user uploading the file.
+    - file_name: The storage name of the file (e.g. "videos/movie.mp4").
+    - length: The total size of the file in bytes.
+    - offset: The number of bytes received so far.
+    - sha256: The SHA-256 digest of the file (set once the upload is complete).
+    - metadata: The title, description and genre of the video to create.
+    - created_at: Date and time the upload was started.
+    - video: The Video created from the completed upload.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="uploads")
+    file_name = models.CharField(max_length=255)
+    length = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, blank=True, null=True, related_name="upload")
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.length
+
+
+class WatchProgress(models.Model):
+    """
+    Model storing how far a user has watched a video, for "continue watching".
+    
+    Players report the position every few seconds. These heartbeats are kept 
+    in Redis and written here in batches by a periodic job (see 
+    videoflix.progress), so this table holds the positions as of the last flush.
+    
+    Fields:
+    - user: The viewer.
+    - video: The video being watched.
+    - position: The playback position in seconds.
+    - updated_at: The time of the heartbeat the position was reported by.
+    """
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="watch_progress")
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="watch_progress")
+    position = models.FloatField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "video"], name="watch_progress_user_video_unique"),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} - {self.video}: {self.position:.0f}s"
+
+
+class VideoViewBucket(models.Model):
+    """
+    Model storing how often a video was played in one time bucket (e.g. one hour).
+    
+    Plays are counted in Redis and folded into these rows by a scheduled job 
+    (see videoflix.trending), which also computes the trending list from them.
+    
+    Fields:
+    - video: The played video.
+    - bucket_start: The start of the time bucket.
+    - plays: The number of plays in the bucket.
+    - unique_viewers: The estimated number of different users who played the video in the bucket.
+    """
+    
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name="view_buckets")
+    bucket_start = models.DateTimeField(db_index=True)
+    plays = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["video", "bucket_start"], name="view_bucket_video_start_unique"),
+        ]
+    
+    def __str__(self):
+        return f"{self.video} @ {self.bucket_start:%Y-%m-%d %H:%M}: {self.plays}"
@@ -0,0 +1,132 @@
+import base64
+from datetime import date
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class VideoCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for the video catalog.
+
+    Videos are ordered by '(created_at, id)'. Instead of an offset, the cursor
+    stores the key of the last (or first) video of the current page, and the
+    next page is fetched with a 'WHERE (created_at, id) > key' condition that
+    the composite index on these columns can answer directly. Every page
+    therefore costs the same, no matter how deep into the catalog it is.
+
+    Query parameters:
+    - cursor: Opaque position returned in the 'next' and 'previous' links.
+    - page_size: Number of videos per page (defaults to VIDEO_PAGE_SIZE,
+      capped at VIDEO_MAX_PAGE_SIZE).
+
+    Response:
+    - next / previous: Absolute URLs of the neighbouring pages, or None.
+    - results: The serialized videos of the current page.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor."
+
+    def get_page_size(self, request):
+        """
+        Read the requested page size, falling back to VIDEO_PAGE_SIZE.
+        """
+
+        page_size = settings.VIDEO_PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+        return max(1, min(page_size, settings.VIDEO_MAX_PAGE_SIZE))
+
+    def decode_cursor(self, request):
+        """
+        Decode the cursor query parameter.
+
+        Returns:
+        - tuple: (created_at, id, reverse) or None if no cursor was given.
+
+        Raises:
+        - NotFound: If the cursor cannot be decoded.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split("|")
+            return date.fromisoformat(created_at), int(pk), direction == "p"
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, video, reverse):
+        """
+        Build the link to the page after (or before) the given video.
+        
+        The video may be a model instance or a '.values()' row.
+        """
+
+        if isinstance(video, dict):
+            created_at, pk = video["created_at"], video["id"]
+        else:
+            created_at, pk = video.created_at, video.pk
+        position = "{}|{}|{}".format("p" if reverse else "n", created_at.isoformat(), pk)
+        encoded = base64.urlsafe_b64encode(position.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Fetch one page of videos following the cursor of the request.
+
+        One extra row is read to find out whether another page follows.
+        """
+
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is None:
+            queryset = queryset.order_by("created_at", "id")
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+                ).order_by("-created_at", "-id")
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+                ).order_by("created_at", "id")
+
+        page = list(queryset[: page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
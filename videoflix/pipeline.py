@@ -0,0 +1,387 @@
+import os
+from django.conf import settings
+from django.db import transaction
+from rq.job import Job, JobStatus
+from .models import Video, VideoRendition
+from .queues import enqueue_job, get_job_queue, job_failed
+from .tasks import (
+    FAST_RENDITIONS,
+    HEAVY_RENDITIONS,
+    concat_renditions,
+    convert_renditions,
+    file_sha256,
+    generate_preview,
+    generate_thumbnail,
+    package_hls,
+    probe_video,
+    rename_to_1080p,
+    split_source,
+)
+
+# Conversion jobs reading the source (or one of its segments): job class and renditions.
+CONVERSION_JOBS = (
+    ("fast_transcode", FAST_RENDITIONS),
+    ("heavy_transcode", HEAVY_RENDITIONS),
+)
+
+# The upload pipeline of a video is a graph of RQ jobs:
+#
+#   probe --+--> thumbnail ---------------------+
+#           +--> preview sprite sheets ---------+
+#           +--> fast renditions (360p, 120p) --+--> finalize --> publish
+#           +--> heavy renditions (720p) -------+
+#
+# The thumbnail, preview and rendition jobs only read the source, so they run in
+# parallel on their own queues. 'finalize' packages the renditions for HLS and
+# renames the source, so it depends on every job reading the source and is
+# only started by RQ once all of them have succeeded. The step a video is in
+# is stored in 'Video.processing_state'; a failing job marks the video as failed
+# and its dependents are never started.
+#
+# Sources of at least VIDEO_CHUNKED_MIN_DURATION seconds are converted in
+# chunked mode instead, so a long upload is encoded by all workers at once:
+#
+#   probe --+--> thumbnail ---------------------------------------------+
+#           +--> preview sprite sheets ---------------------------------+
+#           +--> split --+--> segment 1 fast / heavy --+                +--> finalize --> publish
+#                        +--> ...                      +--> concat -----+
+#                        +--> segment N fast / heavy --+
+#
+# The number of segments is only known once the source has been split, so the
+# split job enqueues the jobs following it.
+#
+# If the content hash of the source matches a published video, nothing is
+# converted: the probe job attaches the new video to the existing media. Sources
+# uploaded without a content hash (admin, imports) are hashed by a 'hash' job
+# first, on a queue of its own (so it never waits behind encodes of other
+# videos), with a timeout scaled by the file size.
+
+
+def start_pipeline(video):
+    """
+    Start the upload pipeline of a newly created video.
+
+    Only the probe job is enqueued here; it enqueues the remaining jobs once
+    the duration of the source is known, so the request uploading the video
+    never waits for FFPROBE. Sources without a content hash (e.g. added in 
+    the admin or imported) are hashed first by a 'hash' job. It runs on the 
+    'hash' queue, so it does not wait behind transcodes of other videos, and 
+    its timeout grows with the file size, so large files do not time out.
+
+    Parameters:
+    - video (Video): The newly created video.
+
+    Returns:
+    - Job: The probe job.
+    """
+
+    options = pipeline_job_options(video.pk)
+    depends_on = None
+    if not video.content_hash:
+        try:
+            size = video.video_file.size
+        except OSError:
+            # The source is missing; the hash job fails and marks the video as failed.
+            size = None
+        depends_on = enqueue_job("hash", hash_source, video.pk, size=size, **options)
+    return enqueue_job("probe", probe_source, video.pk, depends_on=depends_on, **options)
+
+
+def hash_source(video_id):
+    """
+    Store the content hash of the source of a video, used to detect re-uploads.
+
+    Parameters:
+    - video_id (int): The primary key of the Video.
+
+    Returns:
+    - str: The SHA-256 digest of the source.
+    """
+
+    video = Video.objects.get(pk=video_id)
+    video.content_hash = file_sha256(video.video_file.path)
+    video.save(update_fields=["content_hash"])
+    return video.content_hash
+
+
+def pipeline_job_options(video_id):
+    """
+    Return the enqueue options shared by all jobs of the pipeline of a video.
+
+    The video id is stored in the job meta data, so 'pipeline_failed' knows
+    which video to mark as failed.
+    """
+
+    return {"meta": {"video_id": video_id}, "on_failure": pipeline_failed}
+
+
+def set_processing_state(video, state, error=""):
+    """
+    Store the pipeline step of a video.
+
+    Only the state columns are written, so the pipeline is not started again,
+    while the catalog cache of the video is still invalidated.
+
+    Parameters:
+    - video (Video): The video.
+    - state (str): One of 'Video.PROCESSING_STATES'.
+    - error (str, optional): The error message of a failed job.
+    """
+
+    video.processing_state = state
+    video.processing_error = error
+    video.save(update_fields=["processing_state", "processing_error"])
+
+
+def probe_source(video_id):
+    """
+    First job of the pipeline: probe the source and fan out the conversion jobs.
+
+    Re-uploads of a published video (same content hash, set by the upload or 
+    the 'hash' job) are attached to its media instead of being converted again. Otherwise the duration of the source is 
+    stored on the video and used for the timeouts of all following jobs.
+
+    Parameters:
+    - video_id (int): The primary key of the Video.
+
+    Returns:
+    - float: The duration of the source in seconds, or None if it could not be read.
+    """
+
+    video = Video.objects.get(pk=video_id)
+    set_processing_state(video, Video.PROBING)
+    source_path = video.video_file.path
+    original = find_original(video) if video.content_hash else None
+    if original is not None:
+        attach_to_original(video, original)
+        return video.duration
+    video.duration = probe_video(source_path)["duration"]
+    video.processing_state = Video.TRANSCODING
+    video.save(update_fields=["duration", "processing_state"])
+    enqueue_conversions(video, source_path)
+    return video.duration
+
+
+def find_original(video):
+    """
+    Return the published video with the same source as the given one, if any.
+
+    Parameters:
+    - video (Video): A video with its content hash set.
+
+    Returns:
+    - Video: The oldest published video with the same content hash, or None.
+    """
+
+    return (
+        Video.objects.filter(content_hash=video.content_hash, processing_state=Video.PUBLISHED)
+        .exclude(pk=video.pk)
+        .order_by("pk")
+        .first()
+    )
+
+
+def attach_to_original(video, original):
+    """
+    Let a re-uploaded video share the media of the published original.
+
+    The new video references the source, thumbnail and its variants (unless one was uploaded), 
+    preview track, HLS playlist and renditions of the original, its uploaded copy of the source 
+    is deleted and it is published right away, so a duplicate costs neither 
+    transcoding time nor storage. The original is published, so its source 
+    has already been renamed by 'finalize_video' and 'video_file' holds the 
+    renamed file. Deleting a Video never deletes its media files, so either 
+    of the two videos can be deleted without breaking the other.
+
+    Parameters:
+    - video (Video): The re-uploaded video.
+    - original (Video): The published video with the same content hash.
+    """
+
+    duplicate_name = video.video_file.name
+    with transaction.atomic():
+        VideoRendition.objects.bulk_create([
+            VideoRendition(
+                video=video,
+                resolution=rendition.resolution,
+                width=rendition.width,
+                height=rendition.height,
+                bandwidth=rendition.bandwidth,
+                average_bandwidth=rendition.average_bandwidth,
+                playlist_file=rendition.playlist_file.name,
+            )
+            for rendition in original.renditions.all()
+        ], ignore_conflicts=True)
+        video.video_file.name = original.video_file.name
+        if not video.thumbnail_file.name:
+            video.thumbnail_file.name = original.thumbnail_file.name
+            video.thumbnail_variants = original.thumbnail_variants
+        video.preview_track.name = original.preview_track.name
+        video.hls_playlist.name = original.hls_playlist.name
+        video.duration = original.duration
+        video.processing_state = Video.PUBLISHED
+        video.save(update_fields=[
+            "video_file", "thumbnail_file", "thumbnail_variants", "preview_track", "hls_playlist", "duration", "processing_state"
+        ])
+    if duplicate_name != original.video_file.name:
+        video.video_file.storage.delete(duplicate_name)
+
+
+def use_chunked_mode(duration):
+    """
+    Return whether a source is long enough to be converted in segments.
+    """
+
+    min_duration = settings.VIDEO_CHUNKED_MIN_DURATION
+    return duration is not None and min_duration is not None and duration >= min_duration
+
+
+def enqueue_conversions(video, source_path):
+    """
+    Enqueue the parallel jobs reading the source and the jobs waiting for them.
+
+    Parameters:
+    - video (Video): The probed video.
+    - source_path (str): The path to the original video file.
+
+    Returns:
+    - Job: The publish job, or the split job in chunked mode.
+    """
+
+    options = pipeline_job_options(video.pk)
+    image_jobs = [
+        enqueue_job("preview", generate_preview, video.pk, source_path, duration=video.duration, **options),
+        enqueue_job("thumbnail", generate_thumbnail, video.pk, source_path, duration=video.duration, **options),
+    ]
+    if use_chunked_mode(video.duration):
+        return enqueue_job(
+            "split", split_video, video.pk, source_path, [job.id for job in image_jobs],
+            duration=video.duration, **options
+        )
+    conversion_jobs = [
+        enqueue_job(job_class, convert_renditions, source_path, resolutions, duration=video.duration, **options)
+        for job_class, resolutions in CONVERSION_JOBS
+    ]
+    return enqueue_finalize(video, source_path, image_jobs + conversion_jobs)
+
+
+def enqueue_finalize(video, source_path, depends_on):
+    """
+    Enqueue the finalize and publish jobs of a video.
+
+    Parameters:
+    - video (Video): The probed video.
+    - source_path (str): The path to the original video file.
+    - depends_on (list): The jobs that must succeed before the video is finalized.
+
+    Returns:
+    - Job: The publish job.
+    """
+
+    options = pipeline_job_options(video.pk)
+    finalize_job = enqueue_job(
+        "finalize", finalize_video, video.pk, source_path, duration=video.duration, depends_on=depends_on, **options
+    )
+    return enqueue_job("finalize", publish_video, video.pk, depends_on=finalize_job, **options)
+
+
+def split_video(video_id, source_path, image_job_ids):
+    """
+    Chunked mode: split the source into segments and fan out their conversion.
+
+    Every segment is converted by its own fast and heavy job, so the segments
+    are encoded in parallel by all workers. Each job gets the start time of
+    its segment, so the forced keyframes of all segments and renditions lie on
+    one HLS_SEGMENT_SECONDS grid of the whole video. The converted segments are joined
+    by a concat job, after which the video is finalized as usual.
+
+    Parameters:
+    - video_id (int): The primary key of the Video.
+    - source_path (str): The path to the original video file.
+    - image_job_ids (list): The ids of the thumbnail and preview jobs reading the source.
+
+    Returns:
+    - list: The file paths of the segments.
+    """
+
+    video = Video.objects.get(pk=video_id)
+    options = pipeline_job_options(video_id)
+    segment_seconds = settings.VIDEO_CHUNK_SECONDS
+    chunks = split_source(source_path, segment_seconds)
+    chunk_paths = [chunk_path for chunk_path, start_time in chunks]
+    chunk_jobs = [
+        enqueue_job(
+            job_class, convert_renditions, chunk_path, resolutions, start_time,
+            duration=segment_seconds, **options
+        )
+        for chunk_path, start_time in chunks
+        for job_class, resolutions in CONVERSION_JOBS
+    ]
+    concat_job = enqueue_job(
+        "concat", concat_renditions, source_path, chunk_paths, duration=video.duration,
+        depends_on=chunk_jobs, **options
+    )
+    enqueue_finalize(video, source_path, [concat_job] + unfinished_jobs(image_job_ids))
+    return chunk_paths
+
+
+def unfinished_jobs(job_ids):
+    """
+    Return the jobs of the given ids that have not finished successfully yet.
+
+    Finished jobs are left out, since RQ drops their data after a while and
+    a missing dependency cannot be resolved anymore.
+    """
+
+    jobs = Job.fetch_many(job_ids, connection=get_job_queue("thumbnail").connection)
+    return [job for job in jobs if job is not None and job.get_status() != JobStatus.FINISHED]
+
+
+def finalize_video(video_id, source_path):
+    """
+    Package the renditions of a video for HLS and rename its source.
+
+    Runs only after every job reading the source has succeeded, so the
+    source is never moved while it is still being converted. The renamed
+    source ('<name>_1080p.<ext>') is stored as the video's file.
+
+    Parameters:
+    - video_id (int): The primary key of the Video.
+    - source_path (str): The path to the original video file.
+
+    Returns:
+    - str: The file path to the generated master playlist.
+    """
+
+    video = Video.objects.get(pk=video_id)
+    set_processing_state(video, Video.FINALIZING)
+    master_path = package_hls(video_id, source_path)
+    video.video_file.name = os.path.relpath(rename_to_1080p(source_path), settings.MEDIA_ROOT)
+    video.save(update_fields=["video_file"])
+    return master_path
+
+
+def publish_video(video_id):
+    """
+    Last job of the pipeline: mark the video as published.
+    """
+
+    set_processing_state(Video.objects.get(pk=video_id), Video.PUBLISHED)
+
+
+def pipeline_failed(job, connection, type, value, traceback):
+    """
+    RQ failure callback of all pipeline jobs: mark the video as failed.
+
+    The jobs depending on the failed job stay deferred and are never run.
+
+    Parameters:
+    - job (Job): The failed job.
+    - connection (Redis): The Redis connection of the worker.
+    - type, value, traceback: The exception raised by the job.
+    """
+
+    job_failed(job, connection, type, value, traceback)
+    video = Video.objects.filter(pk=job.meta.get("video_id")).first()
+    if video is not None:
+        set_processing_state(video, Video.FAILED, "{}: {}".format(job.func_name, value))
@@ -0,0 +1,244 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from .models import Video, WatchProgress
+from .queues import get_job_queue, job_failed, job_succeeded, job_timeout
+
+KEY_PREFIX = "videoflix:progress:"
+DIRTY_KEY = KEY_PREFIX + "dirty"
+FLUSHING_KEY = KEY_PREFIX + "flushing"
+FLUSH_SCHEDULED_KEY = KEY_PREFIX + "flush_scheduled"
+FLUSH_LOCK_KEY = KEY_PREFIX + "flush_lock"
+
+# Field of a progress hash marking that the positions stored in the database have been loaded into it.
+LOADED_FIELD = "loaded"
+
+# Heartbeats are written to Redis only and copied to the database by a
+# periodic job ('flush_watch_progress'):
+# - videoflix:progress:<user id>  hash video id -> "position|timestamp" with the
+#   latest position of every video the user watched (the continue watching list),
+# - videoflix:progress:dirty      set of "user id:video id" changed since the last flush.
+# A heartbeat therefore costs one HSET, EXPIRE, SADD and SET NX (whether a flush is
+# scheduled) in a single round trip and no database query.
+
+
+def progress_key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def get_connection():
+    return get_redis_connection("default")
+
+
+def parse_progress(value):
+    """
+    Decode a position stored in a progress hash.
+
+    Returns:
+    - tuple: The position in seconds and the time of the heartbeat as a timestamp.
+    """
+
+    position, _, timestamp = value.decode().partition("|")
+    return float(position), float(timestamp)
+
+
+def record_heartbeat(user_id, video_id, position, timestamp=None):
+    """
+    Store the playback position of a video for a user.
+
+    Only Redis is written; the database is updated by the next flush, which
+    is scheduled here if none is pending.
+
+    Parameters:
+    - user_id (int): The viewer.
+    - video_id (int): The video being watched.
+    - position (float): The playback position in seconds.
+    - timestamp (float, optional): The time of the heartbeat. Defaults to now.
+    """
+
+    timestamp = time.time() if timestamp is None else timestamp
+    pipe = get_connection().pipeline(transaction=False)
+    pipe.hset(progress_key(user_id), video_id, f"{position}|{timestamp}")
+    pipe.expire(progress_key(user_id), settings.WATCH_PROGRESS_CACHE_TTL)
+    pipe.sadd(DIRTY_KEY, f"{user_id}:{video_id}")
+    pipe.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=settings.WATCH_PROGRESS_FLUSH_INTERVAL)
+    if pipe.execute()[-1]:
+        schedule_flush()
+
+
+def schedule_flush():
+    """
+    Enqueue 'flush_watch_progress' to run after WATCH_PROGRESS_FLUSH_INTERVAL seconds.
+
+    The job runs on a worker started with '--with-scheduler' (as 'rqworkerpool' does).
+    """
+
+    get_job_queue("progress").enqueue_in(
+        timedelta(seconds=settings.WATCH_PROGRESS_FLUSH_INTERVAL),
+        flush_watch_progress,
+        job_timeout=job_timeout("progress", 0),
+        on_success=job_succeeded,
+        on_failure=job_failed,
+    )
+
+
+def flush_watch_progress():
+    """
+    Copy the positions changed since the last flush from Redis to the database.
+
+    The dirty set is renamed before it is read, so heartbeats arriving
+    meanwhile are collected for the next flush. Positions are upserted in
+    batches of WATCH_PROGRESS_FLUSH_BATCH_SIZE with one
+    'INSERT ... ON CONFLICT (user_id, video_id) DO UPDATE' each. If a flush
+    fails, the renamed set is kept and flushed first by the next run.
+
+    Only one flush runs at a time: a lock expiring with the job timeout is
+    taken first. A flush finding it taken (e.g. several scheduled flushes
+    became due together) schedules another one instead, so the running
+    flush never has its renamed set replaced or deleted by another run.
+
+    Returns:
+    - int: The number of positions written.
+    """
+
+    connection = get_connection()
+    token = uuid.uuid4().hex
+    if not connection.set(FLUSH_LOCK_KEY, token, nx=True, ex=job_timeout("progress", 0)):
+        schedule_flush()
+        return 0
+    try:
+        return flush_locked(connection)
+    finally:
+        if connection.get(FLUSH_LOCK_KEY) == token.encode():
+            connection.delete(FLUSH_LOCK_KEY)
+
+
+def flush_locked(connection):
+    """
+    Flush the renamed dirty set; the caller holds the flush lock.
+
+    Returns:
+    - int: The number of positions written.
+    """
+
+    written = 0
+    if not connection.exists(FLUSHING_KEY):
+        try:
+            connection.rename(DIRTY_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # Nothing changed since the last flush (the dirty set does not exist).
+            return written
+    members = connection.sscan_iter(FLUSHING_KEY, count=settings.WATCH_PROGRESS_FLUSH_BATCH_SIZE)
+    while True:
+        batch = [member.decode().split(":") for member in islice(members, settings.WATCH_PROGRESS_FLUSH_BATCH_SIZE)]
+        if not batch:
+            break
+        written += flush_batch(connection, [(int(user_id), int(video_id)) for user_id, video_id in batch])
+    connection.delete(FLUSHING_KEY)
+    return written
+
+
+def flush_batch(connection, pairs):
+    """
+    Upsert the current positions of a batch of (user id, video id) pairs.
+
+    Positions whose video was deleted meanwhile, or that expired from Redis,
+    are skipped.
+
+    Returns:
+    - int: The number of rows written.
+    """
+
+    pipe = connection.pipeline(transaction=False)
+    for user_id, video_id in pairs:
+        pipe.hget(progress_key(user_id), video_id)
+    values = pipe.execute()
+    existing = set(Video.objects.filter(pk__in={video_id for _, video_id in pairs}).values_list("pk", flat=True))
+    rows = []
+    for (user_id, video_id), value in zip(pairs, values):
+        if value is None or video_id not in existing:
+            continue
+        position, timestamp = parse_progress(value)
+        rows.append(WatchProgress(
+            user_id=user_id,
+            video_id=video_id,
+            position=position,
+            updated_at=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+        ))
+    WatchProgress.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "video"],
+        update_fields=["position", "updated_at"],
+    )
+    return len(rows)
+
+
+def get_positions(user_id):
+    """
+    Return the latest playback positions of a user, newest first.
+
+    The progress hash of the user is read from Redis. If it does not hold
+    the positions stored in the database yet (e.g. after it expired), they
+    are loaded into it without overwriting newer heartbeats.
+
+    Parameters:
+    - user_id (int): The viewer.
+
+    Returns:
+    - list: Tuples (video id, position in seconds, timestamp), newest first.
+    """
+
+    connection = get_connection()
+    values = connection.hgetall(progress_key(user_id))
+    if LOADED_FIELD.encode() not in values:
+        pipe = connection.pipeline(transaction=False)
+        for video_id, position, updated_at in WatchProgress.objects.filter(user_id=user_id).values_list(
+            "video_id", "position", "updated_at"
+        ):
+            pipe.hsetnx(progress_key(user_id), video_id, f"{position}|{updated_at.timestamp()}")
+        pipe.hset(progress_key(user_id), LOADED_FIELD, 1)
+        pipe.expire(progress_key(user_id), settings.WATCH_PROGRESS_CACHE_TTL)
+        pipe.execute()
+        values = connection.hgetall(progress_key(user_id))
+    values.pop(LOADED_FIELD.encode(), None)
+    positions = [(int(video_id), *parse_progress(value)) for video_id, value in values.items()]
+    return sorted(positions, key=lambda entry: entry[2], reverse=True)
+
+
+def continue_watching(user_id, serializer, limit):
+    """
+    Build the continue watching list of a user: started, unfinished videos, most recently watched first.
+
+    A video counts as finished once the position reaches
+    WATCH_PROGRESS_FINISHED_RATIO of its duration.
+
+    Parameters:
+    - user_id (int): The viewer.
+    - serializer (VideoCatalogSerializer): Serializer of the videos.
+    - limit (int): The maximum number of videos.
+
+    Returns:
+    - list: Dicts with the serialized 'video', its 'position' and 'updated_at'.
+    """
+
+    positions = get_positions(user_id)[:settings.WATCH_PROGRESS_MAX_ENTRIES]
+    rows = Video.objects.filter(pk__in=[video_id for video_id, _, _ in positions]).values(*serializer.fields)
+    videos = {video["id"]: video for video in serializer.serialize(rows)}
+    entries = []
+    for video_id, position, timestamp in positions:
+        video = videos.get(video_id)
+        if video is None or (video["duration"] and position >= video["duration"] * settings.WATCH_PROGRESS_FINISHED_RATIO):
+            continue
+        entries.append({
+            "video": video,
+            "position": position,
+            "updated_at": datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(),
+        })
+        if len(entries) == limit:
+            break
+    return entries
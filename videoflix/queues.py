@@ -0,0 +1,91 @@
+from django.conf import settings
+import django_rq
+from .metrics import record_job
+
+
+def job_timeout(job_class, duration=None, size=None):
+    """
+    Compute the timeout of a job from the duration or file size of its source video.
+
+    Every job class in VIDEO_JOB_CLASSES has a fixed base timeout plus an
+    allowance per second of source video and, optionally, per GiB of source
+    file ('TIMEOUT_PER_GB', for jobs running before the duration is known), 
+    so long uploads are not killed while short jobs still fail fast.
+
+    Parameters:
+    - job_class (str): A key of VIDEO_JOB_CLASSES.
+    - duration (float, optional): The duration of the source video in seconds.
+    - size (int, optional): The size of the source file in bytes.
+
+    Returns:
+    - int: The timeout in seconds, or None to use the DEFAULT_TIMEOUT of the
+      queue when neither the duration nor the size is known.
+    """
+
+    if duration is None and size is None:
+        return None
+    config = settings.VIDEO_JOB_CLASSES[job_class]
+    return int(
+        config["BASE_TIMEOUT"]
+        + config["TIMEOUT_PER_SECOND"] * (duration or 0)
+        + config.get("TIMEOUT_PER_GB", 0) * (size or 0) / 2 ** 30
+    )
+
+
+def get_job_queue(job_class):
+    """
+    Return the RQ queue that jobs of a job class are routed to.
+
+    Parameters:
+    - job_class (str): A key of VIDEO_JOB_CLASSES.
+
+    Returns:
+    - Queue: The django-rq queue.
+    """
+
+    return django_rq.get_queue(settings.VIDEO_JOB_CLASSES[job_class]["QUEUE"], autocommit=True)
+
+
+def enqueue_job(job_class, func, *args, duration=None, size=None, depends_on=None, **kwargs):
+    """
+    Enqueue a job on the queue of its job class with a duration based timeout.
+
+    Parameters:
+    - job_class (str): A key of VIDEO_JOB_CLASSES.
+    - func (callable): The task to run.
+    - *args: Positional arguments of the task.
+    - duration (float, optional): The duration of the source video in seconds.
+    - size (int, optional): The size of the source file in bytes.
+    - depends_on (Job or list, optional): Jobs that must finish successfully first.
+    - **kwargs: Further keyword arguments passed to 'Queue.enqueue'. Unless given, 
+      'on_success' and 'on_failure' record the run time of the job in the metrics.
+
+    Returns:
+    - Job: The enqueued job.
+    """
+
+    kwargs.setdefault("on_success", job_succeeded)
+    kwargs.setdefault("on_failure", job_failed)
+    return get_job_queue(job_class).enqueue(
+        func,
+        *args,
+        job_timeout=job_timeout(job_class, duration, size),
+        depends_on=depends_on,
+        **kwargs
+    )
+
+
+def job_succeeded(job, connection, result, *args, **kwargs):
+    """
+    RQ success callback recording the run time of the job.
+    """
+
+    record_job(job, "finished")
+
+
+def job_failed(job, connection, type, value, traceback):
+    """
+    RQ failure callback recording the run time of the job.
+    """
+
+    record_job(job, "failed")
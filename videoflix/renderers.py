@@ -0,0 +1,25 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson, which encodes large catalog pages several
+    times faster than the standard library.
+
+    The output matches DRF's compact 'JSONRenderer' (UTF-8, no whitespace).
+    Indented output (e.g. for the browsable API), data orjson cannot encode
+    and installations without orjson fall back to 'JSONRenderer'.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,69 @@
+import re
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from .models import Video
+
+# Text search configuration of the 'search_vector' trigger (migration 0010). 'simple' does not
+# stem words, so a prefix typed so far matches the words it begins.
+SEARCH_CONFIG = "simple"
+
+# Words as split by the 'simple' parser: letters and digits only, so no tsquery syntax can be injected.
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def search_words(text):
+    """
+    Split a search text into lower case words, at most VIDEO_SEARCH_MAX_WORDS.
+
+    Returns an empty list if the text has fewer than VIDEO_SEARCH_MIN_LENGTH
+    letters and digits, since such short prefixes match most of the catalog.
+    """
+
+    words = WORD_PATTERN.findall((text or "").lower())[:settings.VIDEO_SEARCH_MAX_WORDS]
+    if sum(len(word) for word in words) < settings.VIDEO_SEARCH_MIN_LENGTH:
+        return []
+    return words
+
+
+def build_search_query(words):
+    """
+    Build a query matching videos containing all words, the last ones as prefixes.
+
+    Every word is matched as a prefix ('word:*'), so results appear while the
+    user is still typing and for partial words.
+
+    Parameters:
+    - words (list): Words returned by 'search_words'.
+
+    Returns:
+    - SearchQuery: The query, e.g. to_tsquery('simple', 'dog:* & tra:*').
+    """
+
+    return SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_videos(text, genre=None):
+    """
+    Search the catalog by title and description.
+
+    Uses the GIN index on 'search_vector' and orders the matches by rank:
+    matches in the title (weight A) outrank matches in the description
+    (weight B), newer videos come first on a tie.
+
+    Parameters:
+    - text (str): The search text as typed by the user.
+    - genre (str, optional): Only search videos of this genre.
+
+    Returns:
+    - QuerySet: The matching videos, best first, or an empty queryset if the text is too short.
+    """
+
+    words = search_words(text)
+    if not words:
+        return Video.objects.none()
+    query = build_search_query(words)
+    videos = Video.objects.filter(search_vector=query)
+    if genre:
+        videos = videos.filter(genre=genre)
+    return videos.annotate(rank=SearchRank(F("search_vector"), query)).order_by("-rank", "-created_at", "-id")
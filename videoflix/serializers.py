@@ -1,7 +1,46 @@
 from rest_framework import serializers
-from .models import Video
+from .models import Video, VideoRendition
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.templatetags.static import static
+from django.utils.encoding import filepath_to_uri
+from functools import partial
+from urllib.parse import urljoin
+
+
+def thumbnail_sources(variants, media_url):
+    """
+    Group the thumbnail variants of a video into srcset lists, one per image format.
+
+    Each entry maps to a '<source type="..." srcset="...">' of a '<picture>' 
+    element whose '<img>' shows 'thumbnail_file' as fallback, so browsers 
+    download the smallest image in the best format they support.
+
+    Parameters:
+    - variants (list): The 'thumbnail_variants' of the video.
+    - media_url (callable): Returns the URL of a stored file name.
+
+    Returns:
+    - list: Dicts with the MIME 'type' and the 'srcset' ("<url> 320w, ..."), in the 
+      order of the variants (most efficient format first).
+    """
+
+    srcsets = {}
+    for variant in variants or []:
+        srcsets.setdefault(variant["type"], []).append("{} {}w".format(media_url(variant["file"]), variant["width"]))
+    return [{"type": mime_type, "srcset": ", ".join(srcset)} for mime_type, srcset in srcsets.items()]
+
+
+class VideoRenditionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the VideoRendition model.
+
+    Lists one HLS variant stream of a video together with its resolution,
+    bitrate and the URL of its media playlist.
+    """
+
+    class Meta:
+        model = VideoRendition
+        fields = ["resolution", "width", "height", "bandwidth", "average_bandwidth", "playlist_file"]
 
 
 class VideoSerializer(serializers.ModelSerializer):
@@ -10,51 +49,148 @@ class VideoSerializer(serializers.ModelSerializer):
     
     This class is used to convert Video model instances into JSON and vice versa, 
     allowing for easy serialization and deserialization when interacting with 
-    video-related API endpoints.
+    video-related API endpoints. The HLS master playlist ('hls_playlist'), 
+    the packaged renditions and the WebVTT track of seek-preview images 
+    ('preview_track') are included read-only. While the thumbnail is 
+    still being generated, 'thumbnail_file' points to a placeholder image. 
+    Its smaller WebP/AVIF variants are listed as 'thumbnail_sources' 
+    (see 'thumbnail_sources').
     """
     
+    renditions = VideoRenditionSerializer(many=True, read_only=True)
+    thumbnail_sources = serializers.SerializerMethodField()
+    
     class Meta:
         """
         Meta options for the VideoSerializer.
         
         Specifies the model to be serialized (Video) and the fields to include in the 
-        serialized representation, which in this case is all fields of the model.
+        serialized representation, which in this case is all fields of the model 
+        except the internal full-text search document and the thumbnail variants 
+        (listed as 'thumbnail_sources' instead).
         """
         model = Video
-        fields = "__all__"
+        exclude = ["search_vector", "thumbnail_variants"]
+        read_only_fields = [
+            "hls_playlist", "duration", "processing_state", "processing_error", "content_hash", "preview_track",
+        ]
     
-    def get_video_file(self, video):
+    def to_representation(self, video):
+        """
+        Serialize a video, substituting the placeholder for a missing thumbnail.
         """
-        Retrieve the absolute URL of the video file.
         
-        This method constructs the full URL to the video file if the request method is GET 
-        and the video file exists. It ensures that the client receives the complete URL 
-        to access the video file instead of just the relative path.
+        data = super().to_representation(video)
+        if not data.get("thumbnail_file"):
+            data["thumbnail_file"] = self.get_placeholder_thumbnail()
+        return data
+    
+    def get_thumbnail_sources(self, video):
+        """
+        Retrieve the srcset lists of the thumbnail variants, with absolute URLs if a request is available.
+        """
         
-        Parameters:
-        - video (Video): The Video model instance from which to get the video file URL.
+        request = self.context.get("request")
+        storage = video.thumbnail_file.storage
+        
+        def media_url(name):
+            return request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+        
+        return thumbnail_sources(video.thumbnail_variants, media_url)
+    
+    def get_placeholder_thumbnail(self):
+        """
+        Retrieve the URL of the placeholder image shown until a thumbnail exists.
         
         Returns:
-        - str: The absolute URL of the video file, if available.
+        - str: The absolute URL of the placeholder if a request is available, 
+          otherwise the relative static URL.
         """
         
-        if self.context["request"].method == "GET" and video.video_file:
-            return self.context["request"].build_absolute_uri(video.video_file.url)
+        url = static(settings.THUMBNAIL_PLACEHOLDER)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
 
-    def get_thumbnail_file(self, video):
+class VideoCatalogSerializer:
+    """
+    Fast read-only serializer for the video catalog.
+    
+    Produces the same representation as 'VideoSerializer' for GET requests, 
+    but from '.values()' rows instead of model instances and without DRF's 
+    field machinery: the absolute media and placeholder URLs are built once 
+    per request and only the file names are appended for every row. The 
+    renditions of all videos are read with one additional query.
+    
+    Usage:
+    - VideoCatalogSerializer(request).serialize(Video.objects.values(*VideoCatalogSerializer.fields))
+    """
+    
+    # Columns read with '.values()', in the order of the 'VideoSerializer' representation
+    # ('thumbnail_variants' is returned as 'thumbnail_sources').
+    fields = (
+        "id", "created_at", "title", "description", "video_file", "thumbnail_file", "thumbnail_variants", "genre",
+        "hls_playlist", "duration", "processing_state", "processing_error", "content_hash", "preview_track",
+    )
+    rendition_fields = ("video_id", "resolution", "width", "height", "bandwidth", "average_bandwidth", "playlist_file")
+    file_fields = ("video_file", "thumbnail_file", "hls_playlist", "preview_track")
+    
+    def __init__(self, request=None, base_url=None):
+        """
+        Parameters:
+        - request (Request, optional): The request the URLs are built for.
+        - base_url (str, optional): The site URL (e.g. "https://videoflix.example.com") 
+          used instead of a request, e.g. for catalog snapshots built in a job.
+        """
+        
+        build_absolute_uri = request.build_absolute_uri if request is not None else partial(urljoin, base_url)
+        self.media_prefix = build_absolute_uri(settings.MEDIA_URL)
+        self.placeholder_thumbnail = build_absolute_uri(static(settings.THUMBNAIL_PLACEHOLDER))
+    
+    def media_url(self, name):
+        """
+        Return the absolute URL of a stored file, or None if there is none.
         """
-        Retrieve the absolute URL of the thumbnail image file.
         
-        This method constructs the full URL to the thumbnail image if the request method is GET 
-        and the thumbnail file exists. It ensures that the client receives the complete URL 
-        to access the thumbnail image instead of just the relative path.
+        return self.media_prefix + filepath_to_uri(name) if name else None
+    
+    def serialize(self, rows):
+        """
+        Serialize videos read with '.values(*VideoCatalogSerializer.fields)'.
         
         Parameters:
-        - video (Video): The Video model instance from which to get the thumbnail image URL.
+        - rows (iterable): The video rows (dicts).
         
         Returns:
-        - str: The absolute URL of the thumbnail image, if available.
+        - list: The serialized videos, including their renditions.
         """
         
-        if self.context["request"].method == "GET" and video.thumbnail_file:
-            return self.context["request"].build_absolute_uri(video.thumbnail_file.url)
\ No newline at end of file
+        rows = list(rows)
+        renditions = {}
+        if rows:
+            rendition_rows = (
+                VideoRendition.objects.filter(video_id__in=[row["id"] for row in rows])
+                .order_by("-bandwidth")
+                .values_list(*self.rendition_fields)
+            )
+            for video_id, resolution, width, height, bandwidth, average_bandwidth, playlist_file in rendition_rows:
+                renditions.setdefault(video_id, []).append({
+                    "resolution": resolution,
+                    "width": width,
+                    "height": height,
+                    "bandwidth": bandwidth,
+                    "average_bandwidth": average_bandwidth,
+                    "playlist_file": self.media_url(playlist_file),
+                })
+        return [self.serialize_row(row, renditions.get(row["id"], [])) for row in rows]
+    
+    def serialize_row(self, row, renditions):
+        data = {"id": row["id"], "renditions": renditions, "thumbnail_sources": None}
+        data.update(row)
+        data["thumbnail_sources"] = thumbnail_sources(data.pop("thumbnail_variants"), self.media_url)
+        data["created_at"] = row["created_at"].isoformat()
+        for field in self.file_fields:
+            data[field] = self.media_url(row[field])
+        if data["thumbnail_file"] is None:
+            data["thumbnail_file"] = self.placeholder_thumbnail
+        return data
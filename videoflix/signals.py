@@ -1,13 +1,16 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.conf import settings
-from .models import Video
+from django.core.cache import cache
+from .models import Video, VideoRendition
 import os
-from .tasks import convert720p, convert120p, convert360p, rename_to_1080p, convert_path, create_thumbnail
-from django_rq import enqueue
-import django_rq
+from .pipeline import start_pipeline
 
-from django.core.cache import cache
+from .catalog_cache import bump_catalog_versions, exists_key, video_namespaces
+from .snapshots import schedule_snapshot_rebuild
+from .authentication import evict_cached_token
+from rest_framework.authtoken.models import Token
 
 
 @receiver(post_save, sender=Video)
@@ -17,12 +20,22 @@ def video_post_save(sender, instance, created, **kwargs):
     Run "brew services start redis" to start caching
     Run "python3 manage.py runserver " to get started
     Run "python3 manage.py rqworker" to run worker
+    Run "python3 manage.py rqworkerpool" to run the workers of all queues
     Run "brew services stop redis" to stop caching
 
-    This function performs the following actions when a new Video instance is created:
-    - Generates a thumbnail if not already present.
-    - Enqueues video conversion tasks for 720p and 480p formats.
-    - Clears the cache.
+    When a new Video instance is created, its upload pipeline (see videoflix.pipeline) 
+    is started once the transaction creating it has been committed (admin saves and 
+    imports run in one), so the jobs never look up a video that is not visible yet:
+    - The source is probed for its duration, which determines the job timeouts.
+    - The thumbnail (if none was uploaded, the API shows a placeholder meanwhile) 
+      and its smaller WebP/AVIF variants, 
+      the seek-preview sprite sheets, the 360p/120p and the 720p renditions are 
+      created in parallel on their own queues.
+    - Once all of them have succeeded, the renditions are packaged for HLS and the 
+      source is renamed, then the video is published.
+    
+    On every save the catalog cache namespaces containing the video are invalidated 
+    and the catalog snapshots are rebuilt.
 
     Args:
     - sender: The model class (Video), instance sender.
@@ -32,15 +45,71 @@ def video_post_save(sender, instance, created, **kwargs):
     """
 
     if created:
-        if not instance.thumbnail_file.name:
-            thumbnail_path = create_thumbnail(instance.video_file.path)
-            instance.thumbnail_file.name = thumbnail_path[
-            len(settings.MEDIA_ROOT) + 1 :
-            ]
-            instance.save()
-        queue = django_rq.get_queue("default", autocommit=True)
-        queue.enqueue(convert720p, instance.video_file.path)
-        queue.enqueue(convert360p, instance.video_file.path)
-        queue.enqueue(convert120p, instance.video_file.path)
-        queue.enqueue(rename_to_1080p, instance.video_file.path)
-        cache.clear()
\ No newline at end of file
+        transaction.on_commit(lambda: start_pipeline(instance))
+    invalidate_video_cache(instance, created, kwargs.get("update_fields"))
+
+
+@receiver(post_delete, sender=Video)
+def video_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver invalidating the catalog cache and snapshots after a Video is deleted.
+    """
+
+    cache.delete(exists_key(instance.pk))
+    bump_catalog_versions(*video_namespaces(instance))
+    schedule_snapshot_rebuild()
+
+
+@receiver(post_save, sender=VideoRendition)
+@receiver(post_delete, sender=VideoRendition)
+def video_rendition_changed(sender, instance, **kwargs):
+    """
+    Signal receiver invalidating the catalog cache when a rendition of a video
+    is added, updated (e.g. after transcoding finished) or removed.
+    """
+
+    bump_catalog_versions(*video_namespaces(instance.video))
+    schedule_snapshot_rebuild()
+
+
+def invalidate_video_cache(video, created, update_fields):
+    """
+    Invalidate the catalog cache namespaces affected by saving a video and 
+    queue a rebuild of the catalog snapshots (see videoflix.snapshots).
+
+    The previous genre of an updated video is unknown here, so when the genre 
+    may have changed, the lists of all genres are invalidated.
+
+    Args:
+    - video: The saved Video instance.
+    - created: A boolean indicating if a new record was created.
+    - update_fields: The fields passed to 'save()', or None if all fields were saved.
+    """
+
+    genres = None
+    if not created and (update_fields is None or "genre" in update_fields):
+        genres = [genre for genre, _ in Video.GENRES]
+    bump_catalog_versions(*video_namespaces(video, genres))
+    schedule_snapshot_rebuild()
+
+
+@receiver(post_delete, sender=Token)
+def token_post_delete(sender, instance, **kwargs):
+    """
+    Signal receiver evicting a deleted token (e.g. on logout) from the token caches,
+    so it is rejected by the next request.
+    """
+
+    evict_cached_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_post_save(sender, instance, created, **kwargs):
+    """
+    Signal receiver evicting the cached tokens of a changed user, so changes
+    such as deactivation take effect on the next request.
+    """
+
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+            evict_cached_token(key)
@@ -0,0 +1,206 @@
+import gzip
+import time
+from itertools import islice
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .catalog_cache import LIST_NAMESPACE, genre_namespace, get_catalog_version, version_key
+from .models import Video
+from .queues import enqueue_job, job_timeout
+from .renderers import FastJSONRenderer
+from .serializers import VideoCatalogSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings stored for every snapshot, in order of preference. "identity" is the uncompressed JSON.
+SNAPSHOT_ENCODINGS = ("br", "gzip", "identity") if brotli is not None else ("gzip", "identity")
+
+# Number of videos serialized at once while building the snapshots, which bounds the renditions query.
+SNAPSHOT_BATCH_SIZE = 2000
+
+REBUILD_SCHEDULED_KEY = "catalog:snapshot:scheduled"
+
+
+def snapshot_namespaces():
+    """
+    Return the catalog namespaces a snapshot is kept for: the whole catalog and every genre.
+    """
+
+    return [LIST_NAMESPACE] + [genre_namespace(genre) for genre, _ in Video.GENRES]
+
+
+def snapshot_key(namespace, encoding):
+    return f"catalog:snapshot:{namespace}:{encoding}"
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an 'Accept-Encoding' header into a dict of content codings and their quality values.
+
+    Parameters:
+    - header (str): The header value (may be empty).
+
+    Returns:
+    - dict: Coding (lower case) -> q value, e.g. {"gzip": 1.0, "br": 0.5}.
+    """
+
+    accepted = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """
+    Choose the stored content coding of a snapshot for a request.
+
+    The coding with the highest q value wins; on a tie the smaller one
+    (brotli before gzip) is preferred. Codings with q=0 are never used. If
+    the client accepts no compressed coding, the uncompressed JSON is sent.
+
+    Parameters:
+    - header (str): The 'Accept-Encoding' header of the request.
+
+    Returns:
+    - str: One of SNAPSHOT_ENCODINGS.
+    """
+
+    accepted = parse_accept_encoding(header)
+    best, best_quality = "identity", 0.0
+    for encoding in SNAPSHOT_ENCODINGS[:-1]:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    """
+    Compress a snapshot body with the maximum compression level.
+
+    Snapshots are compressed once per catalog change instead of once per
+    request, so the slowest and smallest settings are affordable.
+    """
+
+    if encoding == "br":
+        return brotli.compress(body, quality=11)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+def render_snapshot(videos):
+    """
+    Render the JSON body of a snapshot: the number of videos and all of them.
+    """
+
+    return FastJSONRenderer().render({"count": len(videos), "results": videos})
+
+
+def serialize_catalog(videos):
+    """
+    Serialize the videos of a queryset in batches, ordered by '(created_at, id)' like the catalog pages.
+
+    Parameters:
+    - videos (QuerySet): The videos to serialize.
+
+    Returns:
+    - list: The serialized videos.
+    """
+
+    serializer = VideoCatalogSerializer(base_url=settings.CATALOG_SNAPSHOT_BASE_URL)
+    rows = videos.order_by("created_at", "id").values(*serializer.fields).iterator(chunk_size=SNAPSHOT_BATCH_SIZE)
+    serialized = []
+    while True:
+        batch = list(islice(rows, SNAPSHOT_BATCH_SIZE))
+        if not batch:
+            return serialized
+        serialized.extend(serializer.serialize(batch))
+
+
+def rebuild_snapshots():
+    """
+    Build the catalog snapshots of the whole catalog and every genre and store them in the cache.
+
+    Runs as a background job after the catalog changed (see
+    'schedule_snapshot_rebuild'). The catalog is read once and split by
+    genre. Every snapshot is stored in all SNAPSHOT_ENCODINGS, each under its
+    own key, together with the namespace version it was built from and the
+    build time, so a request reads exactly one key.
+
+    The namespace versions are read before the catalog is queried: a change
+    made during the build bumps the version again, which marks the new
+    snapshot as stale and schedules another rebuild.
+
+    Returns:
+    - dict: The number of videos per namespace.
+    """
+
+    cache.delete(REBUILD_SCHEDULED_KEY)
+    versions = {namespace: get_catalog_version(namespace) for namespace in snapshot_namespaces()}
+    built_at = int(time.time())
+    videos = serialize_catalog(Video.objects.all())
+    catalogs = {namespace: [] for namespace in versions}
+    catalogs[LIST_NAMESPACE] = videos
+    for video in videos:
+        catalogs.setdefault(genre_namespace(video["genre"]), []).append(video)
+
+    entries = {}
+    for namespace, version in versions.items():
+        body = render_snapshot(catalogs[namespace])
+        for encoding in SNAPSHOT_ENCODINGS:
+            entries[snapshot_key(namespace, encoding)] = (version, built_at, compress(body, encoding))
+    cache.set_many(entries, timeout=None)
+    return {namespace: len(catalogs[namespace]) for namespace in versions}
+
+
+def schedule_snapshot_rebuild():
+    """
+    Enqueue a rebuild of the catalog snapshots once the current transaction is committed.
+
+    Saving one video (e.g. while it is transcoded) changes the catalog many
+    times in a row. Only one rebuild is queued at a time: a flag is set when
+    it is enqueued and cleared when it starts, so changes made meanwhile are
+    covered by the queued rebuild. The flag expires after the timeout of the
+    job, in case the job is lost.
+    """
+
+    def enqueue():
+        if cache.add(REBUILD_SCHEDULED_KEY, 1, timeout=job_timeout("snapshot", 0)):
+            enqueue_job("snapshot", rebuild_snapshots, duration=0)
+
+    transaction.on_commit(enqueue)
+
+
+def get_snapshot(namespace, encoding):
+    """
+    Read a catalog snapshot and the current version of its namespace in one cache round trip.
+
+    Parameters:
+    - namespace (str): LIST_NAMESPACE or a genre namespace.
+    - encoding (str): One of SNAPSHOT_ENCODINGS.
+
+    Returns:
+    - tuple: (snapshot, stale). The snapshot is a tuple (version, built_at,
+      body) or None if none is stored; stale is True if the catalog changed
+      since it was built.
+    """
+
+    values = cache.get_many([snapshot_key(namespace, encoding), version_key(namespace)])
+    snapshot = values.get(snapshot_key(namespace, encoding))
+    if snapshot is None:
+        return None, True
+    return snapshot, snapshot[0] != values.get(version_key(namespace))
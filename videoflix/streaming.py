@@ -0,0 +1,213 @@
+import mimetypes
+import os
+import re
+import uuid
+from django.conf import settings
+from django.http import Http404
+from django.utils._os import safe_join
+from django.utils.http import parse_http_date_safe
+from django.core.exceptions import SuspiciousFileOperation
+
+# Playlists, segments and text tracks written by the tasks pipeline.
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+mimetypes.add_type("text/vtt", ".vtt")
+
+RANGE_SPEC = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+# Requests asking for more ranges than this are answered with the whole file.
+MAX_RANGES = 16
+
+
+def media_file_path(path):
+    """
+    Resolve a media URL path to a file below MEDIA_ROOT.
+
+    Parameters:
+    - path (str): The path relative to MEDIA_URL.
+
+    Returns:
+    - str: The absolute file path.
+
+    Raises:
+    - Http404: If the path escapes MEDIA_ROOT or is not a regular file.
+    """
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media file not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("Media file not found.")
+    return full_path
+
+
+def media_content_type(path):
+    """
+    Guess the content type of a media file from its extension.
+
+    Parameters:
+    - path (str): The file path.
+
+    Returns:
+    - str: The content type, 'application/octet-stream' if unknown.
+    """
+
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+
+def media_etag(stat_result):
+    """
+    Build a strong ETag for a media file from its modification time and size.
+
+    Parameters:
+    - stat_result (os.stat_result): The result of 'os.stat' for the file.
+
+    Returns:
+    - str: The quoted ETag.
+    """
+
+    return '"{:x}-{:x}"'.format(int(stat_result.st_mtime), stat_result.st_size)
+
+
+def if_range_matches(header, etag, last_modified):
+    """
+    Evaluate an 'If-Range' request header.
+
+    The header holds either an entity tag or an HTTP date. A Range header is
+    only honoured when the validator still matches the current file.
+
+    Parameters:
+    - header (str): The 'If-Range' header value, or None if absent.
+    - etag (str): The current ETag of the file.
+    - last_modified (int): The current modification time as a timestamp.
+
+    Returns:
+    - bool: True if the Range header may be applied.
+    """
+
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag
+    return parse_http_date_safe(header) == last_modified
+
+
+def parse_range_header(header, size):
+    """
+    Parse a 'Range: bytes=...' request header.
+
+    Supports explicit ('0-499'), open ('500-') and suffix ('-500') ranges.
+    Overlapping and adjacent ranges are merged.
+
+    Parameters:
+    - header (str): The 'Range' header value, or None if absent.
+    - size (int): The size of the file in bytes.
+
+    Returns:
+    - list: Inclusive (start, end) tuples. An empty list means no range can
+      be satisfied (416). None means the header is absent or malformed and
+      the whole file should be sent.
+    """
+
+    if not header:
+        return None
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC.match(spec)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            suffix_length = int(last)
+            if suffix_length == 0 or size == 0:
+                continue
+            start, end = max(size - suffix_length, 0), size - 1
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def iter_file_range(path, start, end, chunk_size):
+    """
+    Read a byte range of a file in fixed-size chunks.
+
+    The file is opened lazily and closed once the range has been sent or the
+    client has disconnected, so only one chunk is held in memory at a time.
+
+    Parameters:
+    - path (str): The file path.
+    - start (int): The first byte to send.
+    - end (int): The last byte to send (inclusive).
+    - chunk_size (int): The maximum number of bytes read at once.
+
+    Yields:
+    - bytes: The next chunk of the range.
+    """
+
+    with open(path, "rb") as media_file:
+        media_file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = media_file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def multipart_byteranges(path, ranges, size, content_type, chunk_size):
+    """
+    Build a 'multipart/byteranges' body for a multi-range request.
+
+    Parameters:
+    - path (str): The file path.
+    - ranges (list): Inclusive (start, end) tuples.
+    - size (int): The size of the file in bytes.
+    - content_type (str): The content type of the file.
+    - chunk_size (int): The maximum number of bytes read at once.
+
+    Returns:
+    - tuple: The boundary, the total body length and an iterator over the body.
+    """
+
+    boundary = uuid.uuid4().hex
+    headers = [
+        "--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n".format(
+            boundary, content_type, start, end, size
+        ).encode()
+        for start, end in ranges
+    ]
+    closing = "--{}--\r\n".format(boundary).encode()
+    length = len(closing) + sum(
+        len(header) + (end - start + 1) + 2 for header, (start, end) in zip(headers, ranges)
+    )
+
+    def body():
+        for header, (start, end) in zip(headers, ranges):
+            yield header
+            yield from iter_file_range(path, start, end, chunk_size)
+            yield b"\r\n"
+        yield closing
+
+    return boundary, length, body()
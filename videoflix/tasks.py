@@ -1,8 +1,117 @@
 import subprocess # run commands from terminal
 from django.conf import settings
+import csv
+import hashlib
+import json
+import math
 import os
+import shutil
+import time
+from .models import Video, VideoRendition
+from .metrics import increment, observe
 
 FFMPEG_PATH = "/Users/mariuskatzer/ffmpeg"
+FFPROBE_PATH = "/Users/mariuskatzer/ffprobe"
+
+# Output size (width, height) of every rendition produced from an upload.
+RENDITIONS = {
+    "720p": (1280, 720),
+    "360p": (640, 360),
+    "120p": (160, 120),
+}
+
+# Renditions encoded together on the fast queue (available within seconds)
+# and on the heavy queue (long encodes of large frames).
+FAST_RENDITIONS = ("360p", "120p")
+HEAVY_RENDITIONS = ("720p",)
+
+# Image formats of the thumbnail variants (see THUMBNAIL_VARIANT_FORMATS): file extension,
+# MIME type and FFMPEG encoder options, most efficient first. AVIF needs an FFMPEG built with
+# libaom and the 'avif' muxer (FFMPEG 6 or later).
+THUMBNAIL_FORMATS = {
+    "avif": ("avif", "image/avif", "-c:v libaom-av1 -still-picture 1 -crf 35 -b:v 0 -cpu-used 6"),
+    "webp": ("webp", "image/webp", "-c:v libwebp -quality 75"),
+}
+
+# Target length of an HLS segment. Renditions get a keyframe at every
+# multiple of this, so they can be segmented without re-encoding and
+# players can switch between them at every segment boundary.
+HLS_SEGMENT_SECONDS = 4
+
+def run_ffmpeg(cmd, operation):
+    """
+    Run an FFMPEG command and count the run in the metrics.
+    
+    Parameters:
+    - cmd (str): The shell command.
+    - operation (str): The label of the run in the metrics (e.g. "thumbnail").
+    
+    Raises:
+    - CalledProcessError: If FFMPEG exits with an error.
+    """
+    
+    try:
+        subprocess.run(cmd, shell=True, check=True)
+    except subprocess.CalledProcessError:
+        increment("videoflix_ffmpeg_runs_total", {"operation": operation, "status": "failed"})
+        raise
+    increment("videoflix_ffmpeg_runs_total", {"operation": operation, "status": "succeeded"})
+
+
+def probe_video(source_path):
+    """
+    Read basic stream information of a video file.
+    
+    This function uses the FFPROBE tool, which only reads the container 
+    headers, so it returns within milliseconds even for large files.
+    
+    Parameters:
+    - source_path (str): The path to the video file.
+    
+    Returns:
+    - dict: 'duration' (seconds), 'width', 'height' and 'has_audio'. 
+      Values that could not be read are None.
+    """
+    
+    cmd = '{} -v error -print_format json -show_format -show_streams "{}"'.format(
+        FFPROBE_PATH, source_path
+    )
+    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    try:
+        info = json.loads(result.stdout or "{}")
+    except ValueError:
+        info = {}
+    streams = info.get("streams", [])
+    video_stream = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    duration = info.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration else None,
+        "width": video_stream.get("width"),
+        "height": video_stream.get("height"),
+        "has_audio": any(stream.get("codec_type") == "audio" for stream in streams) if streams else None,
+    }
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """
+    Compute the SHA-256 digest of a file.
+    
+    The file is read in blocks, so memory use does not depend on its size.
+    
+    Parameters:
+    - path (str): The path to the file.
+    - block_size (int, optional): The number of bytes read at once. Defaults to 1 MiB.
+    
+    Returns:
+    - str: The hexadecimal digest.
+    """
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 def create_thumbnail(source_path, time="00:00:01", width=854 , height=480):
     """
@@ -10,13 +119,15 @@ def create_thumbnail(source_path, time="00:00:01", width=854 , height=480):
     
     This function uses the FFMPEG tool to generate a thumbnail image 
     from a video. The thumbnail is saved in the 'thumbnails' directory 
-    within the MEDIA_ROOT.
+    within the MEDIA_ROOT. The timestamp is passed before the input, so 
+    FFMPEG seeks to the nearest keyframe instead of decoding the video 
+    from the start.
     
     Parameters:
     - source_path (str): The path to the video file from which to generate the thumbnail.
-    - time (str, optional): The timestamp (in HH:MM:SS) at which to capture the thumbnail. Defaults to "00:00:00".
-    - width (int, optional): The width of the thumbnail. Defaults to 640 pixels.
-    - height (int, optional): The height of the thumbnail. Defaults to 360 pixels.
+    - time (str, optional): The timestamp (in HH:MM:SS) at which to capture the thumbnail. Defaults to "00:00:01".
+    - width (int, optional): The width of the thumbnail. Defaults to 854 pixels.
+    - height (int, optional): The height of the thumbnail. Defaults to 480 pixels.
     
     Returns:
     - str: The file path to the generated thumbnail image.
@@ -24,74 +135,463 @@ def create_thumbnail(source_path, time="00:00:01", width=854 , height=480):
     
     file_name = os.path.splitext(os.path.basename(source_path))[0]
     thumbnail_path = os.path.join(settings.MEDIA_ROOT, "thumbnails", f"{file_name}.jpg")
-    cmd = '{} -i "{}" -ss {} -vframes 1 -vf "scale={}:{}" -update 1 "{}"'.format(
-       FFMPEG_PATH, source_path, time, width, height, thumbnail_path
+    cmd = '{} -ss {} -i "{}" -vframes 1 -vf "scale={}:{}" -update 1 "{}"'.format(
+       FFMPEG_PATH, time, source_path, width, height, thumbnail_path
     )
-    subprocess.run(cmd, shell=True)
+    run_ffmpeg(cmd, "thumbnail")
     return thumbnail_path
 
 
-def convert720p(source_path):
+def create_thumbnail_variants(image_path):
+    """
+    Create smaller copies of a thumbnail in modern image formats for responsive images.
 
+    The image is decoded once; a 'split' filter graph scales a copy to every 
+    width of THUMBNAIL_VARIANT_WIDTHS for every format of 
+    THUMBNAIL_VARIANT_FORMATS, and all of them are encoded by the same 
+    FFMPEG run. The aspect ratio is kept. The files are saved next to the 
+    image as '<file name>_<width>w.<extension>'; the image itself stays the 
+    JPEG fallback.
+
+    Parameters:
+    - image_path (str): The path to the thumbnail image.
+
+    Returns:
+    - list: One dict per variant with its MIME 'type', 'width' and 'file' (relative 
+      to the MEDIA_ROOT), ordered by THUMBNAIL_FORMATS and width.
     """
-    Convert a video to 720p resolution.
+
+    formats = [name for name in THUMBNAIL_FORMATS if name in settings.THUMBNAIL_VARIANT_FORMATS]
+    widths = sorted(settings.THUMBNAIL_VARIANT_WIDTHS)
+    count = len(formats) * len(widths)
+    if not count:
+        return []
+    base_name = os.path.splitext(image_path)[0]
+    labels = "".join("[v{}]".format(index) for index in range(count))
+    filters = ["[0:v]split={}{}".format(count, labels)]
+    outputs = []
+    variants = []
+    for index, (name, width) in enumerate((name, width) for name in formats for width in widths):
+        extension, mime_type, encoder_options = THUMBNAIL_FORMATS[name]
+        variant_path = "{}_{}w.{}".format(base_name, width, extension)
+        filters.append("[v{0}]scale={1}:-2[out{0}]".format(index, width))
+        outputs.append('-map "[out{}]" -frames:v 1 {} "{}"'.format(index, encoder_options, variant_path))
+        variants.append({
+            "type": mime_type,
+            "width": width,
+            "file": os.path.relpath(variant_path, settings.MEDIA_ROOT),
+        })
+    cmd = '{} -y -i "{}" -filter_complex "{}" {}'.format(
+        FFMPEG_PATH, image_path, ";".join(filters), " ".join(outputs)
+    )
+    run_ffmpeg(cmd, "thumbnail_variants")
+    return variants
+
+
+def generate_thumbnail(video_id, source_path):
+    """
+    Create the thumbnail of an uploaded video and its variants in the background.
     
-    This function uses the FFMPEG tool to convert a video file to 
-    720p resolution and saves it with a new file name.
+    Runs 'create_thumbnail' unless a thumbnail was uploaded with the video, 
+    then 'create_thumbnail_variants' for it, and stores both on the Video. 
+    Only the 'thumbnail_file' and 'thumbnail_variants' columns are written, 
+    so the upload pipeline is not triggered again. Until this job has 
+    finished the API returns a placeholder image for the video.
     
     Parameters:
+    - video_id (int): The primary key of the Video.
     - source_path (str): The path to the original video file.
     
     Returns:
-    - None
+    - str: The file path to the thumbnail image.
+    """
+    
+    video = Video.objects.get(pk=video_id)
+    if video.thumbnail_file.name:
+        thumbnail_path = video.thumbnail_file.path
+    else:
+        thumbnail_path = create_thumbnail(source_path)
+        video.thumbnail_file.name = os.path.relpath(thumbnail_path, settings.MEDIA_ROOT)
+    video.thumbnail_variants = create_thumbnail_variants(thumbnail_path)
+    video.save(update_fields=["thumbnail_file", "thumbnail_variants"])
+    return thumbnail_path
+
+
+def create_preview_sprites(source_path, duration):
+    """
+    Create the seek-preview images of a video as sprite sheets with a WebVTT track.
+
+    One frame is sampled every VIDEO_PREVIEW_INTERVAL seconds and scaled 
+    (letterboxed) to VIDEO_PREVIEW_SIZE. A 'tile' filter packs the frames 
+    into sheets of VIDEO_PREVIEW_GRID (columns, rows), so all sheets are 
+    written by a single FFMPEG run decoding the source once. The WebVTT 
+    track has one cue per frame pointing to its area of a sheet 
+    ('sprite_001.jpg#xywh=x,y,w,h'). Players load the track and a few 
+    sheets instead of one image per position of the timeline.
+
+    How many frames the 'fps' filter emits near the end of the video 
+    depends on its rounding and on the exact length of the stream, so the 
+    number of frames is fixed instead: the last frame is repeated for one 
+    more interval ('tpad') and a 'trim' filter passes exactly 
+    ceil(duration / interval) frames to 'tile', one per cue of the track.
+
+    The files are saved in the 'previews/<file name>' directory within 
+    the MEDIA_ROOT; the sheets are referenced relative to the track.
+
+    Parameters:
+    - source_path (str): The path to the video file.
+    - duration (float): The duration of the video in seconds.
+
+    Returns:
+    - str: The file path to the generated WebVTT track.
     """
 
-    new_file_name = convert_path(source_path, "720p")
+    interval = settings.VIDEO_PREVIEW_INTERVAL
+    width, height = settings.VIDEO_PREVIEW_SIZE
+    columns, rows = settings.VIDEO_PREVIEW_GRID
+    file_name = os.path.splitext(os.path.basename(source_path))[0]
+    preview_dir = os.path.join(settings.MEDIA_ROOT, "previews", file_name)
+    os.makedirs(preview_dir, exist_ok=True)
+    frame_count = max(1, math.ceil(duration / interval))
     cmd = (
-        '{} -i "{}" -s hd720 -c:v libx264 -crf 23 -c:a aac -strict -2 "{}"'.format(
-           FFMPEG_PATH, source_path, new_file_name
+        '{} -y -i "{}" -an -sn -vf "tpad=stop_mode=clone:stop_duration={},fps=1/{},trim=end_frame={},'
+        'scale={}:{}:force_original_aspect_ratio=decrease,pad={}:{}:(ow-iw)/2:(oh-ih)/2,tile={}x{}" '
+        '-q:v 5 "{}"'.format(
+            FFMPEG_PATH, source_path, interval, interval, frame_count, width, height, width, height, columns, rows,
+            os.path.join(preview_dir, "sprite_%03d.jpg"),
+        )
+    )
+    run_ffmpeg(cmd, "preview")
+
+    lines = ["WEBVTT", ""]
+    frames_per_sheet = columns * rows
+    for index in range(frame_count):
+        cell = index % frames_per_sheet
+        lines.append("{} --> {}".format(
+            vtt_timestamp(index * interval), vtt_timestamp(min((index + 1) * interval, duration))
+        ))
+        lines.append("sprite_{:03d}.jpg#xywh={},{},{},{}".format(
+            index // frames_per_sheet + 1, cell % columns * width, cell // columns * height, width, height
+        ))
+        lines.append("")
+    track_path = os.path.join(preview_dir, "preview.vtt")
+    with open(track_path, "w") as track_file:
+        track_file.write("\n".join(lines))
+    return track_path
+
+
+def vtt_timestamp(seconds):
+    """
+    Format a position as WebVTT timestamp ('HH:MM:SS.mmm').
+    """
+
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    return "{:02d}:{:02d}:{:02d}.{:03d}".format(hours, minutes, milliseconds // 1000, milliseconds % 1000)
+
+
+def generate_preview(video_id, source_path):
+    """
+    Create the seek-preview sprite sheets of an uploaded video in the background.
+
+    Runs 'create_preview_sprites' and stores the track on the Video. Only the 
+    'preview_track' column is written, so the upload pipeline is not 
+    triggered again. Videos whose duration could not be probed get no 
+    preview, since the cues cannot be timed.
+
+    Parameters:
+    - video_id (int): The primary key of the Video.
+    - source_path (str): The path to the original video file.
+
+    Returns:
+    - str: The file path to the generated WebVTT track, or None.
+    """
+
+    video = Video.objects.get(pk=video_id)
+    if not video.duration:
+        return None
+    track_path = create_preview_sprites(source_path, video.duration)
+    video.preview_track.name = os.path.relpath(track_path, settings.MEDIA_ROOT)
+    video.save(update_fields=["preview_track"])
+    return track_path
+
+
+def convert_renditions(source_path, resolutions=("720p", "360p", "120p"), start_time=0):
+    """
+    Convert a video to several resolutions in a single FFMPEG run.
+
+    The source is decoded only once: a 'split' filter graph duplicates the
+    decoded frames, scales each copy to one of the requested resolutions and
+    encodes it into its own output file. Compared to running one FFMPEG
+    process per resolution this saves a full decode (and a full read from
+    disk) for every additional rendition. Keyframes are forced every
+    HLS_SEGMENT_SECONDS so that all renditions can be packaged for HLS
+    with aligned segment boundaries. For a segment of a longer video 
+    (chunked mode) the keyframes are forced on multiples of 
+    HLS_SEGMENT_SECONDS of the whole video, counted from 'start_time', so 
+    they stay on the same grid after the segments are joined. The x264 
+    preset, CRF and thread count are read from the VIDEO_X264_* settings on 
+    every call.
+
+    Parameters:
+    - source_path (str): The path to the original video file.
+    - resolutions (iterable, optional): Keys of RENDITIONS to produce. Defaults to all of them.
+    - start_time (float, optional): The position of the file within the whole video in seconds. Defaults to 0.
+
+    Returns:
+    - list: The file paths of the converted videos, in the order of 'resolutions'.
+    """
+
+    resolutions = list(resolutions)
+    labels = "".join("[v{}]".format(index) for index in range(len(resolutions)))
+    filters = ["[0:v]split={}{}".format(len(resolutions), labels)]
+    first_keyframe = round(-start_time % HLS_SEGMENT_SECONDS, 6)
+    if first_keyframe:
+        keyframes = "expr:gte(t,{:g}+n_forced*{})".format(first_keyframe, HLS_SEGMENT_SECONDS)
+    else:
+        keyframes = "expr:gte(t,n_forced*{})".format(HLS_SEGMENT_SECONDS)
+    outputs = []
+    new_file_names = []
+    for index, resolution in enumerate(resolutions):
+        width, height = RENDITIONS[resolution]
+        new_file_name = convert_path(source_path, resolution)
+        filters.append("[v{0}]scale={1}:{2}[out{0}]".format(index, width, height))
+        outputs.append(
+            '-map "[out{}]" -map "0:a?" -c:v libx264 -preset {} -crf {} -threads {} -force_key_frames "{}" '
+            '-c:a aac -strict -2 "{}"'.format(
+                index, settings.VIDEO_X264_PRESET, settings.VIDEO_X264_CRF, settings.VIDEO_X264_THREADS,
+                keyframes, new_file_name,
+            )
         )
+        new_file_names.append(new_file_name)
+    cmd = '{} -i "{}" -filter_complex "{}" {}'.format(
+        FFMPEG_PATH, source_path, ";".join(filters), " ".join(outputs)
     )
-    subprocess.run(cmd, shell=True)
+    start = time.perf_counter()
+    run_ffmpeg(cmd, "transcode")
+    observe(
+        "videoflix_transcode_duration_seconds",
+        time.perf_counter() - start,
+        {
+            "renditions": "+".join(resolutions),
+            "preset": settings.VIDEO_X264_PRESET,
+            "crf": settings.VIDEO_X264_CRF,
+        },
+    )
+    return new_file_names
+
+
+def convert720p(source_path):
+
+    """
+    Convert a video to 720p resolution.
+    
+    Thin wrapper around 'convert_renditions' for a single 720p output.
+    
+    Parameters:
+    - source_path (str): The path to the original video file.
+    
+    Returns:
+    - None
+    """
+
+    convert_renditions(source_path, ["720p"])
 
 
 def convert360p(source_path):
     """
     Convert a video to 360p resolution.
     
-    This function uses the FFMPEG tool to convert a video file to 
-    360p resolution and saves it with a new file name.
+    Thin wrapper around 'convert_renditions' for a single 360p output.
     
     Parameters:
     - source_path (str): The path to the original video file.
     """
-    new_file_name = convert_path(source_path, "360p")
-    cmd = (
-        '{} -i "{}" -s 640x360 -c:v libx264 -crf 23 -c:a aac -strict -2 "{}"'.format(
-           FFMPEG_PATH, source_path, new_file_name
-        )
-    )
-    subprocess.run(cmd, shell=True)
+    convert_renditions(source_path, ["360p"])
     
 
 def convert120p(source_path):
     """
     Convert a video to 120p resolution.
     
-    This function uses the FFMPEG tool to convert a video file to 
-    120p resolution and saves it with a new file name.
+    Thin wrapper around 'convert_renditions' for a single 120p output.
+    
+    Parameters:
+    - source_path (str): The path to the original video file.
+    """
+    convert_renditions(source_path, ["120p"])
     
+
+def split_source(source_path, segment_seconds):
+    """
+    Split the video stream of a file into segments for chunked transcoding.
+
+    The segments are cut by stream copy, so they start at keyframes of the 
+    source and nothing is decoded. Since those keyframes rarely fall on exact 
+    multiples of 'segment_seconds', the start time of every segment is read 
+    from the segment list FFMPEG writes next to them. Audio is left out; it 
+    is encoded once for the whole video when the converted segments are 
+    joined again ('concat_renditions'), which avoids gaps at the segment 
+    boundaries.
+
     Parameters:
     - source_path (str): The path to the original video file.
+    - segment_seconds (int): The target length of a segment in seconds.
+
+    Returns:
+    - list: A (file path, start time in seconds) tuple per segment, in playback order.
     """
-    new_file_name = convert_path(source_path, "120p")
+
+    file_name, ext = os.path.splitext(os.path.basename(source_path))
+    chunk_dir = os.path.join(settings.MEDIA_ROOT, "chunks", file_name)
+    os.makedirs(chunk_dir, exist_ok=True)
+    list_path = os.path.join(chunk_dir, "chunks.csv")
     cmd = (
-        '{} -i "{}" -s 160x120 -c:v libx264 -crf 23 -c:a aac -strict -2 "{}"'.format(
-           FFMPEG_PATH, source_path, new_file_name
+        '{} -y -i "{}" -map 0:v:0 -an -c copy -f segment -segment_time {} '
+        '-segment_list "{}" -segment_list_type csv -reset_timestamps 1 "{}"'.format(
+            FFMPEG_PATH, source_path, segment_seconds, list_path, os.path.join(chunk_dir, "chunk_%04d" + ext)
         )
     )
-    subprocess.run(cmd, shell=True)
-    
+    run_ffmpeg(cmd, "split")
+    with open(list_path, newline="") as list_file:
+        return [(os.path.join(chunk_dir, row[0]), float(row[1])) for row in csv.reader(list_file) if row]
+
+
+def concat_renditions(source_path, chunk_paths, resolutions=("720p", "360p", "120p")):
+    """
+    Join the converted segments of a video into one file per rendition.
+
+    The segments of a rendition are concatenated with the concat demuxer by 
+    stream copy, so the video is not encoded again. The audio of the source 
+    is encoded into every rendition. The output files are the ones 
+    'convert_renditions' would have written for the whole source, and the 
+    segments are deleted afterwards.
+
+    Parameters:
+    - source_path (str): The path to the original video file.
+    - chunk_paths (list): The segments written by 'split_source', in playback order.
+    - resolutions (iterable, optional): Keys of RENDITIONS to join. Defaults to all of them.
+
+    Returns:
+    - list: The file paths of the joined videos, in the order of 'resolutions'.
+    """
+
+    chunk_dir = os.path.dirname(chunk_paths[0])
+    new_file_names = []
+    for resolution in resolutions:
+        list_path = os.path.join(chunk_dir, "{}.txt".format(resolution))
+        with open(list_path, "w") as list_file:
+            for chunk_path in chunk_paths:
+                list_file.write("file '{}'\n".format(convert_path(chunk_path, resolution)))
+        new_file_name = convert_path(source_path, resolution)
+        cmd = (
+            '{} -y -f concat -safe 0 -i "{}" -i "{}" -map 0:v -map "1:a?" -c:v copy '
+            '-c:a aac -strict -2 "{}"'.format(FFMPEG_PATH, list_path, source_path, new_file_name)
+        )
+        run_ffmpeg(cmd, "concat")
+        new_file_names.append(new_file_name)
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    return new_file_names
+
+
+def package_hls(video_id, source_path, resolutions=("720p", "360p", "120p")):
+    """
+    Package the converted renditions of a video for HLS adaptive streaming.
+
+    Every rendition written by 'convert_renditions' is split into MPEG-TS
+    segments by stream copy (no re-encoding) and gets its own media playlist.
+    A master playlist referencing all renditions is written next to them,
+    each rendition is recorded as a VideoRendition and the master playlist is
+    stored on the Video.
+
+    Parameters:
+    - video_id (int): The primary key of the Video being packaged.
+    - source_path (str): The path to the original video file.
+    - resolutions (iterable, optional): Keys of RENDITIONS to package. Defaults to all of them.
+
+    Returns:
+    - str: The file path to the generated master playlist.
+    """
+
+    file_name = os.path.splitext(os.path.basename(source_path))[0]
+    hls_dir = os.path.join(settings.MEDIA_ROOT, "hls", file_name)
+    master_lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for resolution in resolutions:
+        width, height = RENDITIONS[resolution]
+        rendition_dir = os.path.join(hls_dir, resolution)
+        os.makedirs(rendition_dir, exist_ok=True)
+        playlist_path = os.path.join(rendition_dir, "index.m3u8")
+        cmd = (
+            '{} -y -i "{}" -c copy -f hls -hls_time {} -hls_playlist_type vod '
+            '-hls_segment_filename "{}" "{}"'.format(
+                FFMPEG_PATH,
+                convert_path(source_path, resolution),
+                HLS_SEGMENT_SECONDS,
+                os.path.join(rendition_dir, "segment_%03d.ts"),
+                playlist_path,
+            )
+        )
+        run_ffmpeg(cmd, "package_hls")
+        bandwidth, average_bandwidth = playlist_bandwidth(playlist_path)
+        master_lines.append(
+            "#EXT-X-STREAM-INF:BANDWIDTH={},AVERAGE-BANDWIDTH={},RESOLUTION={}x{}".format(
+                bandwidth, average_bandwidth, width, height
+            )
+        )
+        master_lines.append("{}/index.m3u8".format(resolution))
+        VideoRendition.objects.update_or_create(
+            video_id=video_id,
+            resolution=resolution,
+            defaults={
+                "width": width,
+                "height": height,
+                "bandwidth": bandwidth,
+                "average_bandwidth": average_bandwidth,
+                "playlist_file": os.path.relpath(playlist_path, settings.MEDIA_ROOT),
+            },
+        )
+
+    master_path = os.path.join(hls_dir, "master.m3u8")
+    with open(master_path, "w") as master_file:
+        master_file.write("\n".join(master_lines) + "\n")
+    video = Video.objects.get(pk=video_id)
+    video.hls_playlist.name = os.path.relpath(master_path, settings.MEDIA_ROOT)
+    video.save(update_fields=["hls_playlist"])
+    return master_path
+
+
+def playlist_bandwidth(playlist_path):
+    """
+    Measure the bitrate of a packaged HLS media playlist.
+
+    The bitrate of every segment is derived from its size on disk and the
+    duration announced by its '#EXTINF' tag.
+
+    Parameters:
+    - playlist_path (str): The path to the media playlist ('index.m3u8').
+
+    Returns:
+    - tuple: The peak and the average bitrate in bits per second.
+    """
+
+    playlist_dir = os.path.dirname(playlist_path)
+    peak = total_bits = total_duration = 0
+    duration = None
+    with open(playlist_path) as playlist:
+        for line in playlist:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration:
+                bits = os.path.getsize(os.path.join(playlist_dir, line)) * 8
+                peak = max(peak, int(bits / duration))
+                total_bits += bits
+                total_duration += duration
+                duration = None
+    average = int(total_bits / total_duration) if total_duration else 0
+    return peak, average
+
 
 def rename_to_1080p(source_path):
     """
@@ -1,20 +1,61 @@
+import base64
+import gzip
+import hashlib
+import json
 import os
+import re
+import subprocess
+import time
 from unittest import skip
-from django.test import TestCase
-from videoflix.models import Video
+from django.test import TestCase, override_settings
+from videoflix.models import Upload, Video, VideoRendition, VideoViewBucket, WatchProgress
 from datetime import date
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from rest_framework import status
-from videoflix.serializers import VideoSerializer
+from videoflix.serializers import VideoCatalogSerializer, VideoSerializer
+from videoflix.renderers import FastJSONRenderer
+from rest_framework.renderers import JSONRenderer
 from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIRequestFactory
 from django.core.cache import cache
 from django_rq import get_queue
 from unittest.mock import patch, MagicMock
 from videoflix.signals import video_post_save
+from videoflix.tasks import HEAVY_RENDITIONS, HLS_SEGMENT_SECONDS, concat_renditions, convert_renditions, file_sha256, create_preview_sprites, create_thumbnail, create_thumbnail_variants, generate_preview, generate_thumbnail, playlist_bandwidth, split_source, vtt_timestamp
+from videoflix.queues import job_timeout
+from videoflix.pipeline import attach_to_original, finalize_video, hash_source, pipeline_failed, probe_source, publish_video, split_video, start_pipeline
+from videoflix.authentication import CachedTokenAuthentication, token_cache_key
+from videoflix.uploads import _running_hashes, append_chunk, create_upload_video
+from videoflix.snapshots import SNAPSHOT_ENCODINGS, choose_encoding, rebuild_snapshots
+from videoflix.progress import DIRTY_KEY, FLUSH_LOCK_KEY, FLUSHING_KEY, flush_watch_progress, record_heartbeat
+from videoflix.trending import BUCKETS_KEY, TRENDING_KEY, fold_play_counts, get_trending, record_play
+from django_redis import get_redis_connection
+from videoflix import metrics
+from authemail.models import SignupCode, PasswordResetCode
+from django.conf import settings
+import shutil
+import tempfile
+from videoflix_backend import urls as project_urls
+from io import StringIO
+from videoflix.benchmarks import percentile
+from videoflix.management.commands.benchmark_catalog import Command as BenchmarkCatalogCommand
+from videoflix.management.commands.benchmark_transcode import Command as BenchmarkTranscodeCommand, parse_profile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from videoflix.catalog_cache import (
+    LIST_NAMESPACE,
+    bump_catalog_versions,
+    catalog_key,
+    genre_namespace,
+    get_catalog_version,
+    get_or_compute,
+)
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -130,25 +171,87 @@ class VideoSerializerTest(TestCase):
         self.assertEqual(video_instance.description, "A new test video")
         self.assertEqual(video_instance.genre, "holiday")
 
-    def test_get_video_file(self):
+    def test_video_file_url(self):
         """
-        Test that the `get_video_file` method returns the absolute URL of the video file.
+        Test that the video file is serialized as the absolute URL of the file.
         """
         request = self.factory.get("/api/videos/")
         serializer = VideoSerializer(instance=self.video, context={"request": request})
-        video_url = serializer.get_video_file(self.video)
+        video_url = serializer.data["video_file"]
 
+        self.assertTrue(video_url.startswith("http://testserver/media/videos/"))
         self.assertIn("3327959-hd_1920_1080_24fps", video_url)
 
-    def test_get_thumbnail_file(self):
+    def test_thumbnail_file_url(self):
         """
-        Test that the `get_thumbnail_file` method returns the absolute URL of the thumbnail image.
+        Test that the thumbnail is serialized as the absolute URL of the image.
         """
         request = self.factory.get("/api/videos/")
         serializer = VideoSerializer(instance=self.video, context={"request": request})
-        thumbnail_url = serializer.get_thumbnail_file(self.video)
+        thumbnail_url = serializer.data["thumbnail_file"]
 
-        self.assertIn("/media/thumbnails/test_thumbnail.jpg", thumbnail_url)
+        self.assertEqual(thumbnail_url, "http://testserver/media/thumbnails/test_thumbnail.jpg")
+
+    def test_missing_thumbnail_uses_placeholder(self):
+        """
+        Test that a video without thumbnail is serialized with the placeholder image.
+        """
+        video = Video.objects.create(
+            title="Pending Video",
+            description="Thumbnail not generated yet",
+            genre="pets",
+            video_file="videos/pending.mp4",
+        )
+        request = self.factory.get("/api/videos/")
+        data = VideoSerializer(instance=video, context={"request": request}).data
+
+        self.assertTrue(data["thumbnail_file"].startswith("http://testserver/static/"))
+        self.assertIn(settings.THUMBNAIL_PLACEHOLDER, data["thumbnail_file"])
+
+    def test_catalog_serializer_matches_video_serializer(self):
+        """
+        Test that VideoCatalogSerializer returns the same data as VideoSerializer, including renditions and placeholder.
+        """
+        VideoRendition.objects.create(
+            video=self.video, resolution="480p", width=854, height=480, bandwidth=1400000,
+            average_bandwidth=1200000, playlist_file="videos/hls/test_480p.m3u8",
+        )
+        VideoRendition.objects.create(
+            video=self.video, resolution="720p", width=1280, height=720, bandwidth=2800000,
+            average_bandwidth=2500000, playlist_file="videos/hls/test_720p.m3u8",
+        )
+        Video.objects.filter(pk=self.video.pk).update(
+            hls_playlist="videos/hls/test master.m3u8",
+            duration=12.5,
+            thumbnail_variants=[
+                {"type": "image/webp", "width": 160, "file": "thumbnails/test_160w.webp"},
+                {"type": "image/webp", "width": 320, "file": "thumbnails/test_320w.webp"},
+            ],
+        )
+        Video.objects.create(title="Pending Video", description="No thumbnail", genre="pets", video_file="videos/pending.mp4")
+        request = self.factory.get("/api/videos/")
+        videos = Video.objects.order_by("pk")
+
+        expected = VideoSerializer(videos.prefetch_related("renditions"), many=True, context={"request": request}).data
+        data = VideoCatalogSerializer(request).serialize(videos.values(*VideoCatalogSerializer.fields))
+
+        self.assertEqual(json.loads(JSONRenderer().render(data)), json.loads(JSONRenderer().render(expected)))
+        self.assertEqual([rendition["resolution"] for rendition in data[0]["renditions"]], ["720p", "480p"])
+        self.assertEqual(data[0]["thumbnail_sources"], [{
+            "type": "image/webp",
+            "srcset": "http://testserver/media/thumbnails/test_160w.webp 160w, http://testserver/media/thumbnails/test_320w.webp 320w",
+        }])
+        self.assertEqual(data[1]["thumbnail_sources"], [])
+
+    def test_fast_renderer_output(self):
+        """
+        Test that FastJSONRenderer renders the same JSON as JSONRenderer and indents for the browsable API.
+        """
+        request = self.factory.get("/api/videos/")
+        data = VideoCatalogSerializer(request).serialize(Video.objects.values(*VideoCatalogSerializer.fields))
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b"\n", FastJSONRenderer().render(data, renderer_context={"indent": 4}))
 
 
 class VideoSignalTest(TestCase):
@@ -175,32 +278,546 @@ class VideoSignalTest(TestCase):
                 os.remove(self.video.video_file.path)
 
 
-    @patch('videoflix.signals.create_thumbnail')
-    @patch('django_rq.enqueue')
-    def test_video_post_save_creates_thumbnail_and_enqueues_tasks(self, mock_enqueue, mock_create_thumbnail):
+    @patch('videoflix.signals.schedule_snapshot_rebuild')
+    def test_video_post_save_only_enqueues_probe(self, mock_schedule_snapshot_rebuild):
         """
-        Tests that the video post_save signal creates a thumbnail and enqueues tasks.
+        Tests that the video post_save signal starts the upload pipeline.
         This test verifies that when a Video instance is saved:
-        - A thumbnail is created.
-        - The thumbnail file is properly associated with the Video instance.
-        - Two tasks (for video conversion) are enqueued.
-        It uses mocks to simulate the behavior of the `create_thumbnail`
-        function and the task queue. The initial task queue count is checked
-        before and after the signal is triggered to ensure that the expected
-        number of tasks have been enqueued.
+        - No thumbnail is generated and nothing is probed inside the request.
+        - Only the probe job is enqueued and the video is pending.
+        """
+
+        self.video.content_hash = 'a' * 64
+        queues = {name: get_queue(name) for name in ('default', 'thumbnail', 'transcode_fast', 'transcode_heavy')}
+        initial_counts = {name: queue.count for name, queue in queues.items()}
+        with self.captureOnCommitCallbacks(execute=True):
+            video_post_save(Video, self.video, created=True)
+
+        self.assertFalse(self.video.thumbnail_file)
+        self.assertEqual(self.video.processing_state, Video.PENDING)
+        self.assertEqual(queues['thumbnail'].count, initial_counts['thumbnail'] + 1)
+        self.assertEqual(queues['thumbnail'].jobs[-1].func, probe_source)
+        for name in ('default', 'transcode_fast', 'transcode_heavy'):
+            self.assertEqual(queues[name].count, initial_counts[name])
+
+    def test_unhashed_source_is_hashed_before_probing(self):
+        """
+        Tests that a source without a content hash is hashed by its own job on the
+        hash queue (not behind the transcodes of other videos), with a timeout scaled
+        by the file size, before it is probed.
+        """
+
+        heavy_count = get_queue('transcode_heavy').count
+        initial_deferred = get_queue('thumbnail').deferred_job_registry.count
+        probe_job = start_pipeline(self.video)
+
+        hash_job = get_queue('hash').jobs[-1]
+        self.assertEqual(get_queue('transcode_heavy').count, heavy_count)
+        self.assertEqual(hash_job.func, hash_source)
+        self.assertEqual(hash_job.timeout, job_timeout('hash', size=self.video.video_file.size))
+        self.assertEqual(probe_job.dependency.id, hash_job.id)
+        self.assertEqual(get_queue('thumbnail').deferred_job_registry.count, initial_deferred + 1)
+
+        self.assertEqual(hash_source(self.video.pk), file_sha256(self.video.video_file.path))
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.content_hash, file_sha256(self.video.video_file.path))
+
+    @patch('videoflix.signals.start_pipeline')
+    def test_pipeline_starts_after_commit(self, mock_start_pipeline):
+        """
+        Tests that the pipeline of a new video is started only once the transaction
+        creating it has been committed, so no job can look up an invisible video.
+        """
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            video = Video.objects.create(title="New", description="Created in a transaction", video_file="videos/new.mp4")
+            mock_start_pipeline.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        mock_start_pipeline.assert_called_once_with(video)
+
+    @patch('videoflix.pipeline.probe_video', return_value={'duration': 100.0})
+    def test_probe_fans_out_conversion_jobs(self, mock_probe_video):
+        """
+        Tests that the probe job routes the conversion jobs to their queues.
+        This test verifies that:
+        - The thumbnail, preview, fast and heavy transcode jobs are enqueued on their own
+          queues with timeouts derived from the duration of the source.
+        - Finalizing and publishing wait for their dependencies instead of being queued.
+        """
+
+        queues = {name: get_queue(name) for name in ('default', 'thumbnail', 'transcode_fast', 'transcode_heavy')}
+        initial_counts = {name: queue.count for name, queue in queues.items()}
+        initial_deferred = queues['default'].deferred_job_registry.count
+        probe_source(self.video.pk)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.duration, 100.0)
+        self.assertEqual(self.video.processing_state, Video.TRANSCODING)
+        for name in ('thumbnail', 'transcode_heavy'):
+            self.assertEqual(queues[name].count, initial_counts[name] + 1)
+        self.assertEqual(queues['transcode_fast'].count, initial_counts['transcode_fast'] + 2)
+        self.assertIn(generate_preview, [job.func for job in queues['transcode_fast'].jobs[-2:]])
+        self.assertEqual(queues['default'].count, initial_counts['default'])
+        heavy_job = queues['transcode_heavy'].jobs[-1]
+        self.assertEqual(heavy_job.timeout, job_timeout('heavy_transcode', 100.0))
+        self.assertEqual(heavy_job.args[1], HEAVY_RENDITIONS)
+        self.assertEqual(queues['default'].deferred_job_registry.count, initial_deferred + 2)
+
+    @patch('videoflix.pipeline.rename_to_1080p')
+    @patch('videoflix.pipeline.package_hls')
+    def test_finalize_and_publish_update_state(self, mock_package_hls, mock_rename):
+        """
+        Tests that finalizing packages and renames the source, stores the renamed
+        source as the video file, and that publishing marks the video as published.
+        """
+
+        source_path = self.video.video_file.path
+        mock_rename.return_value = os.path.join(settings.MEDIA_ROOT, 'videos', 'clip_1080p.mp4')
+        finalize_video(self.video.pk, source_path)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.processing_state, Video.FINALIZING)
+        self.assertEqual(self.video.video_file.name, 'videos/clip_1080p.mp4')
+        mock_package_hls.assert_called_once_with(self.video.pk, source_path)
+        mock_rename.assert_called_once_with(source_path)
+
+        publish_video(self.video.pk)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.processing_state, Video.PUBLISHED)
+
+    def test_failed_job_marks_video_failed(self):
+        """
+        Tests that the failure callback of the pipeline jobs records the error on the video.
+        """
+
+        job = MagicMock(meta={'video_id': self.video.pk}, func_name='videoflix.tasks.convert_renditions', started_at=None)
+        pipeline_failed(job, None, RuntimeError, RuntimeError('ffmpeg exited with 1'), None)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.processing_state, Video.FAILED)
+        self.assertIn('ffmpeg exited with 1', self.video.processing_error)
+
+    def test_reupload_is_attached_to_published_original(self):
+        """
+        Tests that a video whose source matches a published video is not converted.
+        This test verifies that, once the hash job has stored the content hash, the probe job:
+        - Enqueues no conversion jobs.
+        - Attaches the video to the media and renditions of the original, deletes 
+          the duplicate source and publishes the video.
+        """
+
+        source_path = self.video.video_file.path
+        original = Video.objects.create(
+            title="Original",
+            description="The first upload",
+            video_file=default_storage.save("videos/original_1080p.mp4", ContentFile(b"original")),
+            thumbnail_file="thumbnails/original.jpg",
+            hls_playlist="hls/original/master.m3u8",
+            duration=12.5,
+            processing_state=Video.PUBLISHED,
+            content_hash=file_sha256(source_path),
+        )
+        VideoRendition.objects.create(
+            video=original, resolution="360p", width=640, height=360,
+            bandwidth=800000, average_bandwidth=600000, playlist_file="hls/original/360p/index.m3u8",
+        )
+        queues = {name: get_queue(name) for name in ('default', 'thumbnail', 'transcode_fast', 'transcode_heavy')}
+        initial_counts = {name: queue.count for name, queue in queues.items()}
+
+        hash_source(self.video.pk)
+        probe_source(self.video.pk)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.content_hash, original.content_hash)
+        self.assertEqual(self.video.processing_state, Video.PUBLISHED)
+        self.assertEqual(self.video.video_file.name, original.video_file.name)
+        self.assertTrue(os.path.exists(self.video.video_file.path))
+        self.assertEqual(self.video.thumbnail_file.name, "thumbnails/original.jpg")
+        self.assertEqual(self.video.hls_playlist.name, "hls/original/master.m3u8")
+        self.assertEqual(self.video.duration, 12.5)
+        self.assertEqual(list(self.video.renditions.values_list("resolution", "playlist_file")),
+                         [("360p", "hls/original/360p/index.m3u8")])
+        self.assertFalse(os.path.exists(source_path))
+        for name, queue in queues.items():
+            self.assertEqual(queue.count, initial_counts[name])
+
+    def test_either_attached_video_can_be_deleted(self):
+        """
+        Tests that deleting the original or a re-upload attached to it keeps the
+        shared media files, so the remaining video can still be played.
+        """
+
+        shared_names = [
+            default_storage.save(name, ContentFile(b"media"))
+            for name in ("videos/shared_1080p.mp4", "thumbnails/shared.jpg", "previews/shared/preview.vtt", "hls/shared/master.m3u8")
+        ]
+        for deleted in ("original", "duplicate"):
+            with self.subTest(deleted=deleted):
+                original = Video.objects.create(
+                    title="Original", description="The first upload", video_file=shared_names[0],
+                    thumbnail_file=shared_names[1], preview_track=shared_names[2], hls_playlist=shared_names[3],
+                    processing_state=Video.PUBLISHED, content_hash="b" * 64,
+                )
+                duplicate = Video.objects.create(
+                    title="Re-upload", description="The same file again", content_hash="b" * 64,
+                    video_file=default_storage.save("videos/reupload.mp4", ContentFile(b"media")),
+                )
+                duplicate_source = duplicate.video_file.path
+                attach_to_original(duplicate, original)
+                self.assertFalse(os.path.exists(duplicate_source))
+
+                remaining = original if deleted == "duplicate" else duplicate
+                (duplicate if deleted == "duplicate" else original).delete()
+                remaining.refresh_from_db()
+                self.assertEqual(
+                    [remaining.video_file.name, remaining.thumbnail_file.name, remaining.preview_track.name, remaining.hls_playlist.name],
+                    shared_names,
+                )
+                self.assertTrue(all(default_storage.exists(name) for name in shared_names))
+                remaining.delete()
+        for name in shared_names:
+            default_storage.delete(name)
+
+    @override_settings(VIDEO_CHUNKED_MIN_DURATION=600)
+    @patch('videoflix.pipeline.probe_video', return_value={'duration': 3600.0})
+    def test_long_source_is_split_first(self, mock_probe_video):
+        """
+        Tests that a source longer than VIDEO_CHUNKED_MIN_DURATION is split into segments
+        instead of being converted by a single job per queue (the preview job is unchanged).
         """
 
-        mock_create_thumbnail.return_value = 'media/thumbnails/3327959-hd_1920_1080_24fps.jpg'
+        queue = get_queue('transcode_fast')
+        heavy_queue = get_queue('transcode_heavy')
+        initial_count, initial_heavy_count = queue.count, heavy_queue.count
+        probe_source(self.video.pk)
+
+        self.assertEqual(queue.count, initial_count + 2)
+        self.assertEqual([job.func for job in queue.jobs[-2:]], [generate_preview, split_video])
+        self.assertEqual(heavy_queue.count, initial_heavy_count)
+
+    @override_settings(VIDEO_CHUNK_SECONDS=60)
+    @patch('videoflix.pipeline.split_source')
+    def test_split_fans_out_segment_jobs(self, mock_split_source):
+        """
+        Tests that the split job enqueues one fast and one heavy job per segment,
+        and a concat job plus the finalize and publish jobs waiting for them.
+        """
+
+        mock_split_source.return_value = [('/tmp/chunks/chunk_0000.mp4', 0.0), ('/tmp/chunks/chunk_0001.mp4', 61.25)]
+        queues = {name: get_queue(name) for name in ('default', 'transcode_fast', 'transcode_heavy')}
+        initial_counts = {name: queue.count for name, queue in queues.items()}
+        initial_deferred = queues['default'].deferred_job_registry.count
+        split_video(self.video.pk, self.video.video_file.path, [])
+
+        mock_split_source.assert_called_once_with(self.video.video_file.path, 60)
+        self.assertEqual(queues['transcode_fast'].count, initial_counts['transcode_fast'] + 2)
+        self.assertEqual(queues['transcode_heavy'].count, initial_counts['transcode_heavy'] + 2)
+        self.assertEqual(queues['transcode_heavy'].jobs[-1].args, ('/tmp/chunks/chunk_0001.mp4', HEAVY_RENDITIONS, 61.25))
+        self.assertEqual(queues['default'].count, initial_counts['default'])
+        self.assertEqual(queues['default'].deferred_job_registry.count, initial_deferred + 3)
+
+    @override_settings(VIDEO_CHUNK_SECONDS=60)
+    @patch('videoflix.tasks.run_ffmpeg')
+    @patch('videoflix.pipeline.split_source')
+    def test_split_segments_align_across_renditions(self, mock_split_source, mock_run):
+        """
+        Tests that in chunked mode the HLS segments of all renditions have the same
+        durations: keyframes forced by every segment job fall on the HLS_SEGMENT_SECONDS
+        grid of the whole video, although the segments do not start on it.
+        """
+
+        fps = 24
+        starts = [0.0, 61.25, 122.5]
+        end = 150.0
+        mock_split_source.return_value = [('/tmp/chunks/chunk_{:04d}.mp4'.format(index), start) for index, start in enumerate(starts)]
+        queues = [get_queue(name) for name in ('transcode_fast', 'transcode_heavy')]
+        for queue in queues:
+            queue.empty()
+        split_video(self.video.pk, self.video.video_file.path, [])
+
+        segment_durations = {}
+        for queue in queues:
+            for job in queue.jobs:
+                chunk_path, resolutions, start = job.args
+                convert_renditions(chunk_path, resolutions, start)
+                cmd = mock_run.call_args[0][0]
+                offset, interval = re.search(r'expr:gte\(t,(?:([\d.]+)\+)?n_forced\*(\d+)\)', cmd).groups()
+                chunk_end = starts[starts.index(start) + 1] if start != starts[-1] else end
+                # Forced keyframes as FFMPEG evaluates the expression on each frame, plus
+                # the first frame of the segment, in seconds of the whole video.
+                keyframes, forced = [start], 0
+                for frame in range(round((chunk_end - start) * fps)):
+                    if frame / fps >= float(offset or 0) + forced * int(interval):
+                        forced += 1
+                        keyframes.append(round(start + frame / fps, 6))
+                for resolution in resolutions:
+                    segment_durations.setdefault(resolution, []).append(keyframes)
+
+        for resolution, keyframe_lists in segment_durations.items():
+            keyframes = sorted(set(sum(keyframe_lists, [])))
+            # The HLS muxer cuts at the first keyframe at or after every multiple of the segment length.
+            cuts, target = [0.0], HLS_SEGMENT_SECONDS
+            for keyframe in keyframes:
+                if keyframe >= target:
+                    cuts.append(keyframe)
+                    target += HLS_SEGMENT_SECONDS
+            segment_durations[resolution] = [round(b - a, 6) for a, b in zip(cuts, cuts[1:] + [end])]
+
+        durations = list(segment_durations.values())
+        self.assertEqual(set(segment_durations), {'720p', '360p', '120p'})
+        self.assertTrue(all(other == durations[0] for other in durations))
+        self.assertEqual(set(durations[0][:-1]), {HLS_SEGMENT_SECONDS})
+
+    def test_job_timeout_scales_with_duration(self):
+        """
+        Tests that job timeouts grow with the duration of the source and fall back
+        to the queue default when the duration is unknown.
+        """
+
+        config = settings.VIDEO_JOB_CLASSES['heavy_transcode']
+        self.assertEqual(job_timeout('heavy_transcode', 600), config['BASE_TIMEOUT'] + 600 * config['TIMEOUT_PER_SECOND'])
+        self.assertIsNone(job_timeout('heavy_transcode', None))
+
+    @patch('videoflix.tasks.create_thumbnail_variants')
+    @patch('videoflix.tasks.create_thumbnail')
+    def test_generate_thumbnail_updates_only_thumbnail(self, mock_create_thumbnail, mock_create_thumbnail_variants):
+        """
+        Tests that the background thumbnail job stores the thumbnail and its variants
+        on the video without triggering the upload pipeline again.
+        """
+
+        thumbnail_path = os.path.join(settings.MEDIA_ROOT, 'thumbnails', '3327959-hd_1920_1080_24fps.jpg')
+        variants = [{'type': 'image/webp', 'width': 320, 'file': 'thumbnails/3327959-hd_1920_1080_24fps_320w.webp'}]
+        mock_create_thumbnail.return_value = thumbnail_path
+        mock_create_thumbnail_variants.return_value = variants
         queue = get_queue('default')
         initial_count = queue.count
-        video_post_save(Video, self.video, created=True)
+        generate_thumbnail(self.video.pk, self.video.video_file.path)
 
-        self.assertTrue(self.video.thumbnail_file)
-        self.assertIn('3327959-hd_1920_1080_24fps.jpg', self.video.thumbnail_file.name)
-        self.assertEqual(queue.count, initial_count + 2)
-        print(f"Mock enqueue called: {mock_enqueue.called}")
-        if not mock_enqueue.called:
-            print("Warning: mock_enqueue was not called.")
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_file.name, 'thumbnails/3327959-hd_1920_1080_24fps.jpg')
+        self.assertEqual(self.video.thumbnail_variants, variants)
+        mock_create_thumbnail_variants.assert_called_once_with(thumbnail_path)
+        self.assertEqual(queue.count, initial_count)
+
+    @patch('videoflix.tasks.create_thumbnail_variants', return_value=[])
+    @patch('videoflix.tasks.create_thumbnail')
+    def test_generate_thumbnail_keeps_uploaded_thumbnail(self, mock_create_thumbnail, mock_create_thumbnail_variants):
+        """
+        Tests that an uploaded thumbnail is kept and only its variants are created.
+        """
+
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_file='thumbnails/uploaded.jpg')
+        generate_thumbnail(self.video.pk, self.video.video_file.path)
+
+        mock_create_thumbnail.assert_not_called()
+        mock_create_thumbnail_variants.assert_called_once_with(os.path.join(settings.MEDIA_ROOT, 'thumbnails', 'uploaded.jpg'))
+
+    @patch('videoflix.tasks.create_preview_sprites')
+    def test_generate_preview_updates_only_preview_track(self, mock_create_preview_sprites):
+        """
+        Tests that the preview job stores the WebVTT track on the video, and that
+        videos of unknown duration get no preview.
+        """
+
+        self.assertIsNone(generate_preview(self.video.pk, self.video.video_file.path))
+        mock_create_preview_sprites.assert_not_called()
+
+        Video.objects.filter(pk=self.video.pk).update(duration=42.0)
+        mock_create_preview_sprites.return_value = os.path.join(settings.MEDIA_ROOT, 'previews', 'movie', 'preview.vtt')
+        generate_preview(self.video.pk, self.video.video_file.path)
+
+        mock_create_preview_sprites.assert_called_once_with(self.video.video_file.path, 42.0)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.preview_track.name, 'previews/movie/preview.vtt')
+
+
+class VideoTaskTest(TestCase):
+
+    @patch('videoflix.tasks.subprocess.run')
+    def test_convert_renditions_decodes_source_once(self, mock_run):
+        """
+        Tests that all renditions are written by a single FFMPEG run.
+        The command must read the source once and split the decoded stream
+        into one scaled output per requested resolution.
+        """
+
+        new_file_names = convert_renditions("/tmp/movie.mp4", ["720p", "360p", "120p"])
+
+        self.assertEqual(mock_run.call_count, 1)
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd.count('-i "/tmp/movie.mp4"'), 1)
+        self.assertIn("split=3", cmd)
+        self.assertIn("scale=1280:720", cmd)
+        self.assertIn("scale=160:120", cmd)
+        self.assertEqual(
+            new_file_names,
+            ["/tmp/movie_720p.mp4", "/tmp/movie_360p.mp4", "/tmp/movie_120p.mp4"],
+        )
+
+    @override_settings(VIDEO_X264_PRESET='veryfast', VIDEO_X264_CRF=26, VIDEO_X264_THREADS=2)
+    @patch('videoflix.tasks.subprocess.run')
+    def test_convert_renditions_uses_encoder_settings(self, mock_run):
+        """
+        Tests that the x264 preset, CRF and thread count are read from the settings
+        on every call, so they can be tuned (and benchmarked) without code changes.
+        """
+
+        convert_renditions("/tmp/movie.mp4", ["360p"])
+
+        cmd = mock_run.call_args[0][0]
+        self.assertIn("-preset veryfast -crf 26 -threads 2", cmd)
+
+    @patch('videoflix.tasks.subprocess.run')
+    def test_create_thumbnail_seeks_before_decoding(self, mock_run):
+        """
+        Tests that the thumbnail timestamp is passed as an input option,
+        so FFMPEG seeks instead of decoding from the start of the file.
+        """
+
+        create_thumbnail("/tmp/movie.mp4")
+
+        cmd = mock_run.call_args[0][0]
+        self.assertLess(cmd.index("-ss"), cmd.index("-i"))
+
+    @override_settings(MEDIA_ROOT='/tmp/media', THUMBNAIL_VARIANT_WIDTHS=(480, 160), THUMBNAIL_VARIANT_FORMATS=('webp', 'avif'))
+    @patch('videoflix.tasks.subprocess.run')
+    def test_create_thumbnail_variants_decodes_image_once(self, mock_run):
+        """
+        Tests that all variants are written by a single FFMPEG run and are returned
+        with the most efficient format and the smallest width first.
+        """
+
+        variants = create_thumbnail_variants("/tmp/media/thumbnails/movie.jpg")
+
+        self.assertEqual(mock_run.call_count, 1)
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd.count(' -i '), 1)
+        self.assertIn("split=4", cmd)
+        self.assertIn("libwebp", cmd)
+        self.assertIn("libaom-av1", cmd)
+        self.assertEqual(variants, [
+            {"type": "image/avif", "width": 160, "file": "thumbnails/movie_160w.avif"},
+            {"type": "image/avif", "width": 480, "file": "thumbnails/movie_480w.avif"},
+            {"type": "image/webp", "width": 160, "file": "thumbnails/movie_160w.webp"},
+            {"type": "image/webp", "width": 480, "file": "thumbnails/movie_480w.webp"},
+        ])
+
+    @override_settings(
+        MEDIA_ROOT=tempfile.mkdtemp(), VIDEO_PREVIEW_INTERVAL=5, VIDEO_PREVIEW_SIZE=(160, 90), VIDEO_PREVIEW_GRID=(2, 2)
+    )
+    @patch('videoflix.tasks.subprocess.run')
+    def test_create_preview_sprites_writes_track(self, mock_run):
+        """
+        Tests that the sprite sheets are written by a single FFMPEG run sampling and
+        tiling the frames, and that the WebVTT track has one cue per frame pointing
+        to its area of a sheet, the last one ending with the video.
+        """
+
+        track_path = create_preview_sprites("/tmp/movie.mp4", 22.5)
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, True)
+
+        self.assertEqual(mock_run.call_count, 1)
+        cmd = mock_run.call_args[0][0]
+        self.assertIn("fps=1/5", cmd)
+        self.assertIn("tile=2x2", cmd)
+        self.assertEqual(track_path, os.path.join(settings.MEDIA_ROOT, "previews", "movie", "preview.vtt"))
+        with open(track_path) as track_file:
+            cues = track_file.read().split("\n\n")
+        self.assertEqual(cues[0], "WEBVTT")
+        self.assertEqual(len(cues) - 1, 5)
+        self.assertEqual(cues[1], "00:00:00.000 --> 00:00:05.000\nsprite_001.jpg#xywh=0,0,160,90")
+        self.assertEqual(cues[4], "00:00:15.000 --> 00:00:20.000\nsprite_001.jpg#xywh=160,90,160,90")
+        self.assertEqual(cues[5].strip(), "00:00:20.000 --> 00:00:22.500\nsprite_002.jpg#xywh=0,0,160,90")
+
+    @override_settings(
+        MEDIA_ROOT=tempfile.mkdtemp(), VIDEO_PREVIEW_INTERVAL=5, VIDEO_PREVIEW_SIZE=(160, 90), VIDEO_PREVIEW_GRID=(2, 2)
+    )
+    @patch('videoflix.tasks.subprocess.run')
+    def test_preview_frame_count_matches_cues(self, mock_run):
+        """
+        Tests that FFMPEG is told to write exactly one frame per cue, also for durations
+        that are not a multiple of the interval (where the 'fps' filter alone may emit
+        one frame more or less than there are cues).
+        """
+
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, True)
+        for duration, frames in ((20.0, 4), (20.04, 5), (24.96, 5), (3.0, 1)):
+            with self.subTest(duration=duration):
+                track_path = create_preview_sprites("/tmp/movie.mp4", duration)
+                cmd = mock_run.call_args[0][0]
+                self.assertIn("tpad=stop_mode=clone:stop_duration=5,fps=1/5,trim=end_frame={},".format(frames), cmd)
+                with open(track_path) as track_file:
+                    cues = track_file.read().strip().split("\n\n")[1:]
+                self.assertEqual(len(cues), frames)
+                self.assertTrue(cues[-1].startswith("{} --> {}\n".format(vtt_timestamp((frames - 1) * 5), vtt_timestamp(duration))))
+
+    @patch('videoflix.tasks.run_ffmpeg')
+    def test_split_source_returns_segment_start_times(self, mock_run):
+        """
+        Tests that the segments are returned with their start times from the segment list FFMPEG writes.
+        """
+
+        media_root = tempfile.mkdtemp()
+        chunk_dir = os.path.join(media_root, 'chunks', 'movie')
+
+        def write_segment_list(cmd, step):
+            with open(os.path.join(chunk_dir, 'chunks.csv'), 'w') as list_file:
+                list_file.write('chunk_0000.mp4,0.000000,61.250000\nchunk_0001.mp4,61.250000,90.000000\n')
+
+        mock_run.side_effect = write_segment_list
+        with override_settings(MEDIA_ROOT=media_root):
+            chunks = split_source('/tmp/movie.mp4', 60)
+
+        self.assertIn('-segment_list_type csv', mock_run.call_args[0][0])
+        self.assertEqual(chunks, [(os.path.join(chunk_dir, 'chunk_0000.mp4'), 0.0), (os.path.join(chunk_dir, 'chunk_0001.mp4'), 61.25)])
+        shutil.rmtree(media_root)
+
+    @patch('videoflix.tasks.subprocess.run')
+    def test_concat_renditions_joins_segments_without_encoding(self, mock_run):
+        """
+        Tests that the converted segments are joined by stream copy with the concat
+        demuxer and that the segments are removed afterwards.
+        """
+
+        chunk_dir = tempfile.mkdtemp()
+        chunk_paths = [os.path.join(chunk_dir, 'chunk_0000.mp4'), os.path.join(chunk_dir, 'chunk_0001.mp4')]
+        lists = []
+        mock_run.side_effect = lambda cmd, **kwargs: lists.append(open(os.path.join(chunk_dir, '360p.txt')).read())
+
+        new_file_names = concat_renditions('/tmp/movie.mp4', chunk_paths, ['360p'])
+
+        self.assertEqual(new_file_names, ['/tmp/movie_360p.mp4'])
+        cmd = mock_run.call_args[0][0]
+        self.assertIn('-f concat', cmd)
+        self.assertIn('-c:v copy', cmd)
+        self.assertEqual(lists[0].splitlines(), [
+            "file '{}'".format(os.path.join(chunk_dir, 'chunk_0000_360p.mp4')),
+            "file '{}'".format(os.path.join(chunk_dir, 'chunk_0001_360p.mp4')),
+        ])
+        self.assertFalse(os.path.exists(chunk_dir))
+
+    def test_playlist_bandwidth_reports_peak_and_average(self):
+        """
+        Tests that the bitrate of a media playlist is measured per segment.
+        """
+
+        with tempfile.TemporaryDirectory() as playlist_dir:
+            for name, size in (("segment_000.ts", 4000), ("segment_001.ts", 1000)):
+                with open(os.path.join(playlist_dir, name), "wb") as segment:
+                    segment.write(b"0" * size)
+            playlist_path = os.path.join(playlist_dir, "index.m3u8")
+            with open(playlist_path, "w") as playlist:
+                playlist.write(
+                    "#EXTM3U\n#EXTINF:4.000000,\nsegment_000.ts\n"
+                    "#EXTINF:1.000000,\nsegment_001.ts\n#EXT-X-ENDLIST\n"
+                )
+
+            bandwidth, average_bandwidth = playlist_bandwidth(playlist_path)
+
+        self.assertEqual(bandwidth, 8000)
+        self.assertEqual(average_bandwidth, 8000)
 
 
 User = get_user_model()
@@ -275,4 +892,1138 @@ class VideoFlixAPITests(TestCase):
         """
         
         response = self.client.get('/videos/')
-        self.assertEqual(len(response.data), 1) 
\ No newline at end of file
+        self.assertEqual(len(response.data), 1) 
+
+# URL configuration of MediaStreamViewTest: the project URLs plus the media route, which
+# the project only registers with DEBUG enabled.
+urlpatterns = project_urls.urlpatterns + project_urls.media_urlpatterns
+
+
+@override_settings(ROOT_URLCONF='videoflix.tests')
+class MediaStreamViewTest(TestCase):
+    """
+    Test suite for byte-range media serving.
+    """
+
+    def setUp(self):
+        """
+        Creates a media root with a single 1000 byte video file.
+        """
+        self.media_root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.media_root.name, "videos"))
+        self.content = bytes(range(250)) * 4
+        with open(os.path.join(self.media_root.name, "videos", "clip.mp4"), "wb") as video_file:
+            video_file.write(self.content)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_SENDFILE_BACKEND=None)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        """
+        Removes the temporary media root.
+        """
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    @override_settings(ROOT_URLCONF='videoflix_backend.urls')
+    def test_media_route_is_debug_only(self):
+        """
+        Test that the unauthenticated media route is not registered without DEBUG.
+        """
+        self.assertFalse(settings.DEBUG)
+        self.assertEqual(self.client.get('/media/videos/clip.mp4').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_full_response_advertises_ranges(self):
+        """
+        Test that a plain GET streams the whole file and advertises range support.
+        """
+        response = self.client.get('/media/videos/clip.mp4')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_single_range(self):
+        """
+        Test that a single range is answered with 206 and only the requested bytes.
+        """
+        response = self.client.get('/media/videos/clip.mp4', HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1000')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+    def test_suffix_and_multiple_ranges(self):
+        """
+        Test that several ranges are answered with a multipart/byteranges body.
+        """
+        response = self.client.get('/media/videos/clip.mp4', HTTP_RANGE='bytes=0-9,-10')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges'))
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(b'Content-Range: bytes 990-999/1000', body)
+        self.assertIn(self.content[990:], body)
+
+    def test_unsatisfiable_range(self):
+        """
+        Test that a range beyond the end of the file is answered with 416.
+        """
+        response = self.client.get('/media/videos/clip.mp4', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */1000')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """
+        Test that the range is ignored when 'If-Range' no longer matches.
+        """
+        response = self.client.get('/media/videos/clip.mp4', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_none_match_returns_not_modified(self):
+        """
+        Test that a matching ETag is answered with 304.
+        """
+        etag = self.client.get('/media/videos/clip.mp4')['ETag']
+        response = self.client.get('/media/videos/clip.mp4', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_path_outside_media_root(self):
+        """
+        Test that paths escaping MEDIA_ROOT are not served.
+        """
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect')
+    def test_accel_redirect_offload(self):
+        """
+        Test that the transfer is handed to nginx when X-Accel-Redirect is enabled.
+        """
+        response = self.client.get('/media/videos/clip.mp4')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/videos/clip.mp4')
+        self.assertEqual(response.content, b'')
+
+
+class VideoPaginationTest(TestCase):
+    """
+    Test suite for the keyset pagination of the video catalog.
+    """
+
+    def setUp(self):
+        """
+        Creates five videos (two sharing a date) and an authenticated client.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='pager@example.com', password='password123'))
+        days = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 3), date(2024, 1, 4)]
+        self.videos = Video.objects.bulk_create([
+            Video(title=f"Video {index}", description="", genre="pets" if index % 2 else "fitness", created_at=day)
+            for index, day in enumerate(days)
+        ])
+
+    def test_pages_cover_catalog_in_order(self):
+        """
+        Test that following the 'next' links returns every video once, ordered by (created_at, id).
+        """
+        url, seen = '/videos/?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [video['id'] for video in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, [video.pk for video in self.videos])
+
+    def test_previous_link_returns_previous_page(self):
+        """
+        Test that the 'previous' link of the second page leads back to the first page.
+        """
+        first = self.client.get('/videos/?page_size=2')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_genre_filter(self):
+        """
+        Test that '?genre=' limits the page to one genre.
+        """
+        response = self.client.get('/videos/?genre=pets')
+        self.assertEqual({video['genre'] for video in response.data['results']}, {'pets'})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor is rejected.
+        """
+        response = self.client.get('/videos/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogCacheTest(TestCase):
+    """
+    Test suite for the versioned catalog cache.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with an empty cache and an authenticated client.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='cache@example.com', password='password123'))
+        self.video = Video.objects.create(title="Cached", description="", genre="pets", video_file='videos/cached.mp4')
+
+    def test_get_or_compute_computes_once(self):
+        """
+        Test that a cached value is computed only on the first miss.
+        """
+        compute = MagicMock(return_value={"value": 1})
+        key = catalog_key(LIST_NAMESPACE, get_catalog_version(LIST_NAMESPACE), "test")
+        self.assertEqual(get_or_compute(key, compute), {"value": 1})
+        self.assertEqual(get_or_compute(key, compute), {"value": 1})
+        self.assertEqual(compute.call_count, 1)
+
+    def test_bump_only_affects_given_namespaces(self):
+        """
+        Test that invalidating one genre leaves other namespaces and unrelated keys alone.
+        """
+        cache.set('unrelated', 'kept')
+        list_version = get_catalog_version(LIST_NAMESPACE)
+        pets_version = get_catalog_version(genre_namespace('pets'))
+        bump_catalog_versions(genre_namespace('pets'))
+        self.assertEqual(get_catalog_version(LIST_NAMESPACE), list_version)
+        self.assertEqual(get_catalog_version(genre_namespace('pets')), pets_version + 1)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+    def test_list_is_served_from_cache_until_video_changes(self):
+        """
+        Test that a repeated request needs no queries and that saving a video refreshes the list.
+        """
+        self.client.get('/videos/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/videos/')
+        self.assertEqual(response.data['results'][0]['title'], "Cached")
+
+        self.video.title = "Renamed"
+        self.video.save()
+        response = self.client.get('/videos/')
+        self.assertEqual(response.data['results'][0]['title'], "Renamed")
+
+    def test_conditional_get_returns_not_modified(self):
+        """
+        Test that a matching ETag is answered with 304 without touching the database.
+        """
+        response = self.client.get('/videos/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0), patch('videoflix.views.VideoSerializer') as mock_serializer:
+            not_modified = self.client.get('/videos/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        mock_serializer.assert_not_called()
+
+    def test_etag_changes_when_video_changes(self):
+        """
+        Test that saving a video invalidates the ETags of the full list and of its genre list.
+        """
+        list_etag = self.client.get('/videos/')['ETag']
+        genre_etag = self.client.get('/videos/', {'genre': 'pets'})['ETag']
+        self.video.save()
+        self.assertEqual(self.client.get('/videos/', HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/videos/', {'genre': 'pets'}, HTTP_IF_NONE_MATCH=genre_etag).status_code, status.HTTP_200_OK)
+
+
+class CatalogSnapshotTest(TestCase):
+    """
+    Test suite for the precomputed catalog snapshots.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with an empty cache, an authenticated client and two videos.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='snapshot@example.com', password='password123'))
+        Video.objects.create(title="Dog", description="", genre="pets", video_file='videos/dog.mp4')
+        Video.objects.create(title="Beach", description="", genre="holiday", video_file='videos/beach.mp4')
+
+    def test_choose_encoding(self):
+        """
+        Test that the best accepted stored coding is chosen and q=0 codings are never used.
+        """
+        self.assertEqual(choose_encoding(None), 'identity')
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('gzip;q=0, deflate'), 'identity')
+        self.assertEqual(choose_encoding('*;q=0.5'), SNAPSHOT_ENCODINGS[0])
+        self.assertEqual(choose_encoding('identity, gzip;q=0.1'), 'gzip')
+
+    def test_snapshot_is_sent_in_accepted_encoding(self):
+        """
+        Test that a stored snapshot is sent without queries, compressed as accepted, per genre and with a 304.
+        """
+        rebuild_snapshots()
+        with self.assertNumQueries(0):
+            plain = self.client.get('/videos/snapshot/')
+            compressed = self.client.get('/videos/snapshot/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        data = json.loads(plain.content)
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([video['title'] for video in data['results']], ["Dog", "Beach"])
+        self.assertTrue(data['results'][0]['video_file'].startswith(settings.CATALOG_SNAPSHOT_BASE_URL))
+
+        pets = json.loads(self.client.get('/videos/snapshot/', {'genre': 'pets'}).content)
+        self.assertEqual([video['title'] for video in pets['results']], ["Dog"])
+        not_modified = self.client.get('/videos/snapshot/', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_change_schedules_one_rebuild(self):
+        """
+        Test that saving videos queues a single rebuild and a stale snapshot is sent meanwhile.
+        """
+        rebuild_snapshots()
+        etag = self.client.get('/videos/snapshot/')['ETag']
+        with patch('videoflix.snapshots.enqueue_job') as mock_enqueue, self.captureOnCommitCallbacks(execute=True):
+            Video.objects.create(title="Cat", description="", genre="pets", video_file='videos/cat.mp4')
+            Video.objects.create(title="Hike", description="", genre="holiday", video_file='videos/hike.mp4')
+        mock_enqueue.assert_called_once_with('snapshot', rebuild_snapshots, duration=0)
+
+        response = self.client.get('/videos/snapshot/')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['count'], 2)
+        rebuild_snapshots()
+        self.assertEqual(json.loads(self.client.get('/videos/snapshot/').content)['count'], 4)
+
+    @override_settings(CATALOG_SNAPSHOT_RETRY_AFTER=5)
+    @patch('videoflix.snapshots.enqueue_job')
+    def test_missing_snapshot_is_not_built_in_the_request(self, mock_enqueue_job):
+        """
+        Test that without a snapshot a single rebuild is queued and requests get 503 with
+        Retry-After instead of serializing the catalog, and that unknown genres are rejected.
+        """
+        with self.assertNumQueries(0), self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                response = self.client.get('/videos/snapshot/', {'genre': 'holiday'}, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+                self.assertEqual(response['Retry-After'], '5')
+        mock_enqueue_job.assert_called_once()
+
+        rebuild_snapshots()
+        response = self.client.get('/videos/snapshot/', {'genre': 'holiday'})
+        self.assertEqual([video['title'] for video in json.loads(response.content)['results']], ["Beach"])
+        self.assertEqual(self.client.get('/videos/snapshot/', {'genre': 'opera'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VideoSearchTest(TestCase):
+    """
+    Test suite for the full-text search of the catalog.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with an empty cache, an authenticated client and a few videos.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='search@example.com', password='password123'))
+        self.training = Video.objects.create(
+            title="Dog training", description="Teach your dog to sit.", genre="pets", video_file='videos/training.mp4'
+        )
+        self.beach = Video.objects.create(
+            title="Beach holiday", description="A trip with the dog to the sea.", genre="holiday", video_file='videos/beach.mp4'
+        )
+        Video.objects.create(title="Morning yoga", description="Stretching.", genre="fitness", video_file='videos/yoga.mp4')
+
+    def search(self, **params):
+        """
+        Helper running a search and returning the titles of the results.
+        """
+        response = self.client.get('/videos/search/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [video['title'] for video in response.data['results']]
+
+    def test_prefixes_match_while_typing(self):
+        """
+        Test that every word matches as a prefix and all words must match.
+        """
+        self.assertEqual(self.search(q='yog'), ["Morning yoga"])
+        self.assertEqual(self.search(q='dog tra'), ["Dog training"])
+        self.assertEqual(self.search(q='Beach, DOG!'), ["Beach holiday"])
+        self.assertEqual(self.search(q='cat'), [])
+
+    def test_title_matches_rank_first(self):
+        """
+        Test that a match in the title outranks one in the description, and the genre filter and limit apply.
+        """
+        self.assertEqual(self.search(q='dog'), ["Dog training", "Beach holiday"])
+        self.assertEqual(self.search(q='dog', genre='holiday'), ["Beach holiday"])
+        self.assertEqual(self.search(q='dog', limit=1), ["Dog training"])
+
+    def test_short_or_empty_query_returns_nothing(self):
+        """
+        Test that texts below VIDEO_SEARCH_MIN_LENGTH are not searched.
+        """
+        self.assertEqual(self.search(q='d'), [])
+        self.assertEqual(self.search(q=' &:* '), [])
+        self.assertEqual(self.search(), [])
+
+    def test_search_vector_follows_title_changes(self):
+        """
+        Test that the trigger updates the search document when the title changes, and the API hides it.
+        """
+        self.beach.title = "Mountain holiday"
+        self.beach.save()
+        self.assertEqual(self.search(q='mount'), ["Mountain holiday"])
+        self.assertEqual(self.search(q='beach'), [])
+        self.assertNotIn('search_vector', self.client.get('/videos/').data['results'][0])
+
+
+class HomeFeedTest(TestCase):
+    """
+    Test suite for the genre rows of the home feed.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with an empty cache, an authenticated client and videos of two genres.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='feed@example.com', password='password123'))
+        for day in range(1, 5):
+            Video.objects.create(
+                title=f"Pets {day}", description="", genre="pets", created_at=date(2024, 1, day), video_file='videos/pets.mp4'
+            )
+        Video.objects.create(title="Holiday", description="", genre="holiday", video_file='videos/holiday.mp4')
+
+    def test_newest_videos_per_genre(self):
+        """
+        Test that every genre gets a row with its newest videos, read with one query plus renditions.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get('/videos/home/', {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = {row['genre']: [video['title'] for video in row['results']] for row in response.data['genres']}
+        self.assertEqual([row['genre'] for row in response.data['genres']], [genre for genre, _ in Video.GENRES])
+        self.assertEqual(rows, {'fitness': [], 'pets': ["Pets 4", "Pets 3", "Pets 2"], 'holiday': ["Holiday"]})
+
+    def test_feed_is_cached_per_catalog_version(self):
+        """
+        Test that the feed is served from the cache until a video changes.
+        """
+        self.client.get('/videos/home/')
+        with self.assertNumQueries(0):
+            self.client.get('/videos/home/')
+        Video.objects.create(title="Pets 5", description="", genre="pets", created_at=date(2024, 1, 5), video_file='videos/pets.mp4')
+        response = self.client.get('/videos/home/')
+        self.assertEqual(response.data['genres'][1]['results'][0]['title'], "Pets 5")
+
+
+class WatchProgressTest(TestCase):
+    """
+    Test suite for the write-behind watch progress and the continue watching list.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with empty Redis data, an authenticated client and two videos.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(email='viewer@example.com', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.first = Video.objects.create(title="First", description="", genre="pets", video_file='videos/first.mp4', duration=100)
+        self.second = Video.objects.create(title="Second", description="", genre="pets", video_file='videos/second.mp4', duration=100)
+
+    def test_heartbeats_touch_redis_only(self):
+        """
+        Test that heartbeats need no query once the video is known to exist and schedule a single flush.
+        """
+        with patch('videoflix.progress.schedule_flush') as mock_schedule, self.assertNumQueries(1):
+            for position in (5, 10, 15):
+                response = self.client.post('/progress/', {'video': self.first.pk, 'position': position})
+                self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        mock_schedule.assert_called_once()
+        self.assertFalse(WatchProgress.objects.exists())
+        self.assertEqual(self.client.post('/progress/', {'video': 'x', 'position': 1}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post('/progress/', {'video': self.first.pk, 'position': -1}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_heartbeat_for_unknown_video_is_rejected(self):
+        """
+        Test that a heartbeat for a video that does not exist (or was deleted) returns 404 and stores nothing.
+        """
+        with patch('videoflix.progress.schedule_flush') as mock_schedule:
+            self.assertEqual(self.client.post('/progress/', {'video': self.second.pk, 'position': 5}).status_code, status.HTTP_204_NO_CONTENT)
+            second_pk = self.second.pk
+            self.second.delete()
+            for video_id in (second_pk, 999999):
+                response = self.client.post('/progress/', {'video': video_id, 'position': 5})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        mock_schedule.assert_called_once()
+
+    def test_flush_upserts_latest_positions(self):
+        """
+        Test that a flush writes the latest position per video, updates existing rows and skips deleted videos.
+        """
+        WatchProgress.objects.create(user=self.user, video=self.first, position=1, updated_at=timezone.now())
+        deleted = Video.objects.create(title="Deleted", description="", genre="pets", video_file='videos/deleted.mp4')
+        with patch('videoflix.progress.schedule_flush'):
+            record_heartbeat(self.user.pk, self.first.pk, 20)
+            record_heartbeat(self.user.pk, self.first.pk, 25)
+            record_heartbeat(self.user.pk, self.second.pk, 40)
+            record_heartbeat(self.user.pk, deleted.pk, 30)
+        deleted.delete()
+
+        self.assertEqual(flush_watch_progress(), 2)
+        positions = dict(WatchProgress.objects.values_list('video_id', 'position'))
+        self.assertEqual(positions, {self.first.pk: 25, self.second.pk: 40})
+        self.assertEqual(flush_watch_progress(), 0)
+
+    def test_overlapping_flush_is_rescheduled(self):
+        """
+        Test that a flush starting while another one holds the lock leaves the renamed set alone
+        and schedules another flush, and that the lock is released after a flush.
+        """
+        with patch('videoflix.progress.schedule_flush'):
+            record_heartbeat(self.user.pk, self.first.pk, 20)
+        connection = get_redis_connection('default')
+        connection.rename(DIRTY_KEY, FLUSHING_KEY)
+        connection.set(FLUSH_LOCK_KEY, 'running flush')
+
+        with patch('videoflix.progress.schedule_flush') as mock_schedule:
+            self.assertEqual(flush_watch_progress(), 0)
+        mock_schedule.assert_called_once()
+        self.assertTrue(connection.exists(FLUSHING_KEY))
+        self.assertFalse(WatchProgress.objects.exists())
+
+        connection.delete(FLUSH_LOCK_KEY)
+        self.assertEqual(flush_watch_progress(), 1)
+        self.assertFalse(connection.exists(FLUSH_LOCK_KEY))
+
+    def test_continue_watching(self):
+        """
+        Test that the list is ordered by recency without finished videos, and is rebuilt from the database.
+        """
+        third = Video.objects.create(title="Third", description="", genre="pets", video_file='videos/third.mp4', duration=100)
+        with patch('videoflix.progress.schedule_flush'):
+            record_heartbeat(self.user.pk, self.first.pk, 10, timestamp=1000)
+            record_heartbeat(self.user.pk, self.second.pk, 20, timestamp=2000)
+            record_heartbeat(self.user.pk, third.pk, 99, timestamp=3000)
+
+        response = self.client.get('/progress/')
+        self.assertEqual([(entry['video']['title'], entry['position']) for entry in response.data['results']], [("Second", 20), ("First", 10)])
+
+        flush_watch_progress()
+        cache.clear()
+        response = self.client.get('/progress/', {'limit': 1})
+        self.assertEqual([entry['video']['title'] for entry in response.data['results']], ["Second"])
+
+
+class TrendingTest(TestCase):
+    """
+    Test suite for view counting and the trending list.
+    """
+
+    def setUp(self):
+        """
+        Starts every test with empty Redis data, an authenticated client and two videos.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(email='trending@example.com', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.popular = Video.objects.create(title="Popular", description="", genre="pets", video_file='videos/popular.mp4')
+        self.niche = Video.objects.create(title="Niche", description="", genre="pets", video_file='videos/niche.mp4')
+        self.now = 1700000000
+
+    def play(self, video, *user_ids, hours_ago=0):
+        """
+        Helper recording one play of a video per user id.
+        """
+        with patch('videoflix.trending.schedule_fold'):
+            for user_id in user_ids:
+                record_play(user_id, video.pk, timestamp=self.now - hours_ago * 3600)
+
+    def test_play_needs_no_query(self):
+        """
+        Test that counting a play touches Redis only once the video is known to exist and schedules one fold.
+        """
+        with patch('videoflix.trending.schedule_fold') as mock_schedule, self.assertNumQueries(1):
+            for _ in range(3):
+                response = self.client.post(f'/videos/{self.popular.pk}/play/')
+                self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        mock_schedule.assert_called_once()
+
+    def test_play_of_unknown_video_is_rejected(self):
+        """
+        Test that playing a video that does not exist (or was deleted) returns 404 and counts nothing.
+        """
+        niche_pk = self.niche.pk
+        self.assertEqual(self.client.post(f'/videos/{niche_pk}/play/').status_code, status.HTTP_204_NO_CONTENT)
+        self.niche.delete()
+        for video_id in (niche_pk, 999999):
+            self.assertEqual(self.client.post(f'/videos/{video_id}/play/').status_code, status.HTTP_404_NOT_FOUND)
+        bucket = int(time.time() // settings.PLAY_BUCKET_SECONDS)
+        self.assertEqual(get_redis_connection("default").hgetall(f"videoflix:plays:{bucket}"), {str(niche_pk).encode(): b'1'})
+
+    def test_fold_is_idempotent_and_closes_buckets(self):
+        """
+        Test that folding twice does not count plays twice, ended buckets are removed from Redis 
+        and the next fold is scheduled while the current bucket is open.
+        """
+        self.play(self.popular, 1, 1, 2)
+        self.play(self.popular, 3, hours_ago=5)
+        with patch('videoflix.trending.schedule_fold') as mock_schedule:
+            self.assertEqual(fold_play_counts(now=self.now), 2)
+            self.assertEqual(fold_play_counts(now=self.now), 1)
+        self.assertEqual(mock_schedule.call_count, 2)
+        self.assertEqual(get_redis_connection("default").smembers(BUCKETS_KEY), {str(int(self.now // 3600)).encode()})
+
+        buckets = VideoViewBucket.objects.order_by('bucket_start').values_list('plays', 'unique_viewers')
+        self.assertEqual(list(buckets), [(1, 1), (3, 2)])
+
+    def test_trending_prefers_recent_unique_viewers(self):
+        """
+        Test that the trending list is ordered by decayed unique viewers and served by the endpoint.
+        """
+        self.play(self.popular, 1, 2, 3)
+        self.play(self.niche, 1, 1, 1, 1)
+        self.play(self.niche, 2, 3, 4, 5, hours_ago=48)
+        with patch('videoflix.trending.schedule_fold'):
+            fold_play_counts(now=self.now)
+
+        self.assertEqual([video_id for video_id, _ in get_trending(10)], [self.popular.pk, self.niche.pk])
+        response = self.client.get('/videos/trending/', {'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['video']['title'] for entry in response.data['results']], ["Popular"])
+
+    def test_trending_empties_after_last_play_leaves_window(self):
+        """
+        Test that folds continue after the last bucket closed, so the trending list
+        is emptied once its plays left the window although no more plays arrive,
+        and that the list expires then even if no fold runs.
+        """
+        self.play(self.popular, 1, 2, hours_ago=2)
+        with patch('videoflix.trending.schedule_fold') as mock_schedule:
+            fold_play_counts(now=self.now)
+            self.assertEqual(get_redis_connection("default").smembers(BUCKETS_KEY), set())
+            mock_schedule.assert_called_once()
+            ttl = get_redis_connection("default").ttl(TRENDING_KEY)
+            self.assertTrue(0 < ttl <= settings.TRENDING_WINDOW)
+
+            fold_play_counts(now=self.now + settings.TRENDING_WINDOW)
+            self.assertEqual(get_trending(10), [])
+            mock_schedule.assert_called_once()
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """
+    Test suite for the cached token authentication.
+    """
+
+    def setUp(self):
+        """
+        Creates a user with a token and a client sending it.
+        """
+        cache.clear()
+        self.user = User.objects.create_user(email='token@example.com', password='password123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_cached_token_needs_no_queries(self):
+        """
+        Test that the token is only looked up in the database on the first request.
+        """
+        self.client.get('/videos/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/videos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_holds_no_password_and_no_shared_user(self):
+        """
+        Test that the cached entry has no password hash and every request gets its own user instance.
+        """
+        self.client.get('/videos/')
+        entry = cache.get(token_cache_key(self.token.key))
+        self.assertNotIn('password', entry['user'])
+
+        authentication = CachedTokenAuthentication()
+        first_user, _ = authentication.authenticate_credentials(self.token.key)
+        second_user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertIsNot(first_user, second_user)
+        self.assertEqual((first_user.pk, first_user.email), (self.user.pk, self.user.email))
+        self.assertEqual(token.user_id, self.user.pk)
+        first_user.first_name = 'Changed'
+        first_user.save()
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('password123'))
+
+    def test_deleted_token_is_rejected_by_every_process(self):
+        """
+        Test that deleting a token in another process (only the database row and the shared
+        cache entry change) revokes it for the next request.
+        """
+        self.client.get('/videos/')
+        Token.objects.filter(pk=self.token.pk).delete()
+        cache.delete(token_cache_key(self.token.key))
+        self.assertEqual(self.client.get('/videos/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_cached_token(self):
+        """
+        Test that a token used before logout is rejected right after it.
+        """
+        self.client.get('/videos/')
+        response = self.client.post('/logout/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
+        self.assertEqual(self.client.get('/videos/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Test that deactivating a user evicts the cached token.
+        """
+        self.client.get('/videos/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/videos/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class VerificationRedirectTest(TestCase):
+    """
+    Test suite for the signup and password reset verification redirects.
+    """
+
+    def setUp(self):
+        """
+        Creates an unverified user.
+        """
+        self.user = User.objects.create_user(email='verify@example.com', password='password123')
+
+    def test_register_verified_verifies_in_process(self):
+        """
+        Test that a valid signup code verifies the user and redirects to the success page.
+        """
+        SignupCode.objects.create(user=self.user, code='signupcode', ipaddr='127.0.0.1')
+        with patch('requests.get') as mock_get:
+            response = self.client.get('/register-verified/?code=signupcode')
+        mock_get.assert_not_called()
+        self.assertEqual(response.url, 'http://localhost:4200/register-verified')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        self.assertFalse(SignupCode.objects.filter(code='signupcode').exists())
+
+    def test_register_verified_invalid_code(self):
+        """
+        Test that an unknown signup code redirects to the 404 page.
+        """
+        response = self.client.get('/register-verified/?code=unknown')
+        self.assertEqual(response.url, 'http://localhost:4200/404')
+
+    def test_password_reset_verified_redirects_with_code(self):
+        """
+        Test that a valid password reset code redirects to the reset page with the code.
+        """
+        PasswordResetCode.objects.create(user=self.user, code='resetcode')
+        response = self.client.get('/password-reset-verified/?code=resetcode')
+        self.assertEqual(response.url, 'http://localhost:4200/password-reset?code=resetcode')
+        self.assertEqual(self.client.get('/password-reset-verified/?code=unknown').url, 'http://localhost:4200/404')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_READ_SIZE=4)
+class UploadViewTest(TestCase):
+    """
+    Test suite for the resumable upload endpoints.
+    """
+
+    def setUp(self):
+        """
+        Creates a user with a token and a client sending it.
+        """
+        self.user = User.objects.create_user(email='upload@example.com', password='password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.content = b'0123456789abcdef'
+
+    def tearDown(self):
+        """
+        Removes the uploaded files, so every test gets the same file names.
+        """
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, 'videos'), ignore_errors=True)
+
+    def start_upload(self, **metadata):
+        """
+        Starts an upload of 'self.content' and returns its URL.
+        """
+        metadata = {'filename': 'clip.mp4', 'title': 'Clip', 'description': 'A clip', **metadata}
+        header = ','.join('{} {}'.format(key, base64.b64encode(value.encode()).decode()) for key, value in metadata.items())
+        response = self.client.post('/uploads/', HTTP_UPLOAD_LENGTH=str(len(self.content)), HTTP_UPLOAD_METADATA=header)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Tus-Resumable'], '1.0.0')
+        return response['Location']
+
+    def send_chunk(self, url, offset, data):
+        """
+        Sends one chunk of an upload with PATCH.
+        """
+        return self.client.patch(
+            url, data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    @patch('videoflix.signals.start_pipeline')
+    def test_chunked_upload_creates_video_on_last_chunk(self, mock_start_pipeline):
+        """
+        Tests that chunks are appended to the final file, the offset can be queried
+        with HEAD and the video is only created once the last byte arrived.
+        """
+
+        url = self.start_upload()
+        self.assertEqual(self.send_chunk(url, 0, self.content[:10]).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Video.objects.count(), 0)
+        mock_start_pipeline.assert_not_called()
+
+        response = self.client.head(url)
+        self.assertEqual(response['Upload-Offset'], '10')
+        self.assertEqual(response['Upload-Length'], '16')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_chunk(url, 10, self.content[10:])
+        self.assertEqual(response['Upload-Offset'], '16')
+        upload = Upload.objects.get()
+        self.assertEqual(upload.sha256, hashlib.sha256(self.content).hexdigest())
+        video = Video.objects.get()
+        self.assertEqual(upload.video, video)
+        self.assertEqual(video.title, 'Clip')
+        self.assertEqual(video.content_hash, upload.sha256)
+        self.assertEqual(video.video_file.name, 'videos/clip.mp4')
+        with open(video.video_file.path, 'rb') as video_file:
+            self.assertEqual(video_file.read(), self.content)
+        mock_start_pipeline.assert_called_once_with(video)
+
+    def test_offset_mismatch_is_rejected(self):
+        """
+        Tests that a chunk sent for the wrong offset is rejected with 409 Conflict.
+        """
+
+        url = self.start_upload()
+        response = self.send_chunk(url, 4, self.content[4:8])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    @patch('videoflix.signals.start_pipeline')
+    def test_resume_in_another_process_rehashes_prefix(self, mock_start_pipeline):
+        """
+        Tests that the content hash is correct when the running hash of the
+        process is lost between two chunks.
+        """
+
+        url = self.start_upload()
+        self.send_chunk(url, 0, self.content[:7])
+        _running_hashes.clear()
+        self.send_chunk(url, 7, self.content[7:])
+        self.assertEqual(Upload.objects.get().sha256, hashlib.sha256(self.content).hexdigest())
+
+    def test_chunk_at_same_offset_waits_for_lock(self):
+        """
+        Tests that a second chunk sent at the same offset while the first one is
+        streamed in is rejected with 423 Locked and writes nothing.
+        """
+
+        url = self.start_upload()
+        upload = Upload.objects.get()
+        responses = []
+        test = self
+
+        class FirstStream:
+            """
+            Chunk stream during which a second request sends a chunk at the same offset.
+            """
+            def __init__(self):
+                self.data = test.content[:8]
+
+            def read(self, size):
+                if not responses:
+                    responses.append(test.send_chunk(url, 0, b'x' * 8))
+                data, self.data = self.data[:size], self.data[size:]
+                return data
+
+        written = append_chunk(upload, FirstStream())
+        self.assertEqual(written, 8)
+        self.assertEqual(responses[0].status_code, 423)
+        self.assertEqual(responses[0]['Upload-Offset'], '0')
+        with open(os.path.join(settings.MEDIA_ROOT, upload.file_name), 'rb') as upload_file:
+            self.assertEqual(upload_file.read(8), self.content[:8])
+        self.assertEqual(self.send_chunk(url, 8, self.content[8:]).status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_offset_is_read_again_under_lock(self):
+        """
+        Tests that a chunk is discarded if the offset advanced between reading the
+        upload and taking its lock.
+        """
+
+        self.start_upload()
+        upload = Upload.objects.get()
+        Upload.objects.filter(pk=upload.pk).update(offset=4)
+
+        self.assertIsNone(append_chunk(upload, MagicMock()))
+        self.assertEqual(upload.offset, 4)
+
+    def test_concurrent_chunk_is_not_counted(self):
+        """
+        Tests that a chunk is discarded with 409 Conflict if another request advanced
+        the offset while it was streamed in (e.g. after the lock expired), so no
+        bytes are counted twice.
+        """
+
+        self.start_upload()
+        upload = Upload.objects.get()
+
+        class RacingStream:
+            """
+            Chunk stream during which another request stores its chunk.
+            """
+            def read(self, size):
+                Upload.objects.filter(pk=upload.pk).update(offset=4)
+                return b''
+
+        written = append_chunk(upload, RacingStream())
+        self.assertIsNone(written)
+        self.assertEqual(upload.offset, 4)
+        self.assertEqual(Upload.objects.get().offset, 4)
+
+    @patch('videoflix.signals.start_pipeline')
+    def test_repeated_final_chunk_creates_one_video(self, mock_start_pipeline):
+        """
+        Tests that a retried final chunk does not create a second video.
+        """
+
+        url = self.start_upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send_chunk(url, 0, self.content)
+            response = self.send_chunk(url, len(self.content), b'')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        upload = Upload.objects.get()
+        create_upload_video(upload)
+
+        self.assertEqual(Video.objects.count(), 1)
+        self.assertEqual(upload.video, Video.objects.get())
+        mock_start_pipeline.assert_called_once()
+
+    def test_invalid_metadata_is_rejected(self):
+        """
+        Tests that an upload without a filename or with an unknown genre cannot be started.
+        """
+
+        header = 'title ' + base64.b64encode(b'Clip').decode()
+        response = self.client.post('/uploads/', HTTP_UPLOAD_LENGTH='16', HTTP_UPLOAD_METADATA=header)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        metadata = ','.join('{} {}'.format(key, base64.b64encode(value).decode()) for key, value in (
+            ('filename', b'clip.mp4'), ('title', b'Clip'), ('description', b'A clip'), ('genre', b'horror'),
+        ))
+        response = self.client.post('/uploads/', HTTP_UPLOAD_LENGTH='16', HTTP_UPLOAD_METADATA=metadata)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Upload.objects.count(), 0)
+
+    def test_uploads_of_other_users_are_hidden(self):
+        """
+        Tests that an upload cannot be read or continued by another user.
+        """
+
+        url = self.start_upload()
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key)
+        self.assertEqual(self.client.head(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.send_chunk(url, 0, self.content).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CatalogBenchmarkTest(TestCase):
+    """
+    Test suite for the catalog benchmark command.
+    """
+
+    def setUp(self):
+        """
+        Clears the cache, so the benchmark starts cold.
+        """
+        cache.clear()
+
+    def test_percentile_uses_nearest_rank(self):
+        """
+        Tests the percentile helper on a known distribution.
+        """
+
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 95), 95)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_run_benchmarks_reports_every_scenario(self):
+        """
+        Tests that a small benchmark run generates the synthetic rows and reports
+        latency, queries and memory for every scenario.
+        """
+
+        results = BenchmarkCatalogCommand(stdout=StringIO(), stderr=StringIO()).run_benchmarks([10, 20], 2)
+
+        self.assertEqual(Video.objects.count(), 20)
+        self.assertEqual([entry['videos'] for entry in results['sizes']], [10, 20])
+        scenarios = results['sizes'][-1]['scenarios']
+        self.assertEqual(
+            set(scenarios),
+            {
+                'list', 'list_uncached', 'home', 'home_uncached', 'detail', 'detail_uncached', 'login', 'logout',
+                'serialize', 'serialize_fast', 'search', 'search_uncached',
+            },
+        )
+        for summary in scenarios.values():
+            self.assertEqual(summary['runs'], 2)
+            self.assertLessEqual(summary['p50_ms'], summary['p95_ms'])
+        self.assertGreater(scenarios['list_uncached']['queries'], scenarios['list']['queries'])
+        self.assertIn('serialize_speedup', results['sizes'][-1])
+
+
+class TranscodeBenchmarkTest(TestCase):
+    """
+    Test suite for the transcode benchmark command.
+    """
+
+    def test_parse_profile(self):
+        """
+        Tests that encoder profiles are parsed into the VIDEO_X264_* settings.
+        """
+
+        self.assertEqual(parse_profile('slow:21:4'), {
+            'VIDEO_X264_PRESET': 'slow', 'VIDEO_X264_CRF': 21, 'VIDEO_X264_THREADS': 4,
+        })
+        self.assertEqual(parse_profile('veryfast:26')['VIDEO_X264_THREADS'], 0)
+        with self.assertRaises(CommandError):
+            parse_profile('veryfast')
+
+    @patch('videoflix.management.commands.benchmark_transcode.convert_renditions')
+    def test_measure_task_reports_throughput(self, mock_convert_renditions):
+        """
+        Tests that a measured task reports frame rate, size, bitrate and speed,
+        and removes the encoded files.
+        """
+
+        output_path = os.path.join(tempfile.mkdtemp(), 'clip_360p.mp4')
+        def convert(clip_path, resolutions):
+            with open(output_path, 'wb') as output_file:
+                output_file.write(b'0' * 12500)
+            return [output_path]
+        mock_convert_renditions.side_effect = convert
+
+        measurement = BenchmarkTranscodeCommand().measure_task('/tmp/clip.mp4', ['360p'], 10)
+
+        self.assertEqual(measurement['output_bytes'], 12500)
+        self.assertEqual(measurement['bitrate_kbps'], 10.0)
+        self.assertGreater(measurement['fps'], 0)
+        self.assertGreater(measurement['speed'], 0)
+        self.assertFalse(os.path.exists(output_path))
+
+    @patch.object(BenchmarkTranscodeCommand, 'generate_clip', return_value='/tmp/clip.mp4')
+    @patch.object(BenchmarkTranscodeCommand, 'measure_task')
+    def test_runs_are_not_recorded_as_metrics(self, mock_measure_task, mock_generate_clip):
+        """
+        Tests that the benchmark runs with metrics disabled and the encoder settings of the profile.
+        """
+
+        mock_measure_task.side_effect = lambda *args: {
+            'metrics_enabled': settings.METRICS_ENABLED, 'preset': settings.VIDEO_X264_PRESET,
+        }
+        stdout = StringIO()
+        call_command('benchmark_transcode', profiles=['slow:21'], durations=[10], sizes=['640x360'], stdout=stdout, stderr=StringIO())
+
+        results = json.loads(stdout.getvalue())['results']
+        self.assertTrue(results)
+        self.assertTrue(all(result['metrics_enabled'] is False and result['preset'] == 'slow' for result in results))
+
+
+class MetricsTest(TestCase):
+    """
+    Test suite for the metrics subsystem and the /metrics endpoint.
+    """
+
+    def setUp(self):
+        """
+        Clears the stored metrics and creates an authenticated client.
+        """
+        cache.clear()
+        metrics.flush()
+        self.user = User.objects.create_user(email='metrics@example.com', password='password123')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+    def test_counters_and_histograms_are_rendered(self):
+        """
+        Tests that counters and histograms are stored and rendered in the
+        text exposition format with cumulative buckets.
+        """
+
+        metrics.increment('videoflix_ffmpeg_runs_total', {'operation': 'thumbnail', 'status': 'failed'})
+        metrics.increment('videoflix_ffmpeg_runs_total', {'operation': 'thumbnail', 'status': 'failed'})
+        metrics.observe('videoflix_transcode_duration_seconds', 3, {'renditions': '720p', 'preset': 'medium', 'crf': 23})
+        metrics.observe('videoflix_transcode_duration_seconds', 90, {'renditions': '720p', 'preset': 'medium', 'crf': 23})
+
+        text = metrics.render_metrics()
+
+        self.assertIn('# TYPE videoflix_ffmpeg_runs_total counter', text)
+        self.assertIn('videoflix_ffmpeg_runs_total{operation="thumbnail",status="failed"} 2', text)
+        labels = 'crf="23",preset="medium",renditions="720p"'
+        self.assertIn('videoflix_transcode_duration_seconds_bucket{%s,le="1"} 0' % labels, text)
+        self.assertIn('videoflix_transcode_duration_seconds_bucket{%s,le="5"} 1' % labels, text)
+        self.assertIn('videoflix_transcode_duration_seconds_bucket{%s,le="120"} 2' % labels, text)
+        self.assertIn('videoflix_transcode_duration_seconds_bucket{%s,le="+Inf"} 2' % labels, text)
+        self.assertIn('videoflix_transcode_duration_seconds_sum{%s} 93' % labels, text)
+        self.assertIn('videoflix_rq_jobs{queue="transcode_heavy",state="queued"}', text)
+
+    @override_settings(DEBUG=True, METRICS_AUTH_TOKEN=None)
+    def test_requests_are_measured_per_route(self):
+        """
+        Tests that the middleware records latencies per URL pattern and that the
+        catalog cache and token authentication paths are counted.
+        """
+
+        self.client.get('/videos/')
+        self.client.get('/videos/')
+
+        text = self.client.get('/metrics').content.decode()
+
+        self.assertIn('videoflix_http_request_duration_seconds_count{method="GET",route="videos/",status="200"} 2', text)
+        self.assertIn('videoflix_catalog_cache_total{result="miss"} 1', text)
+        self.assertIn('videoflix_catalog_cache_total{result="hit"} 1', text)
+        self.assertIn('videoflix_token_auth_total{source="database"} 1', text)
+        self.assertIn('videoflix_token_auth_total{source="cache"} 1', text)
+
+    @patch('videoflix.tasks.subprocess.run', side_effect=subprocess.CalledProcessError(1, 'ffmpeg'))
+    def test_ffmpeg_failures_are_counted(self, mock_run):
+        """
+        Tests that a failing FFMPEG run raises and is counted as failed.
+        """
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            create_thumbnail('/tmp/movie.mp4')
+        self.assertIn('videoflix_ffmpeg_runs_total{operation="thumbnail",status="failed"} 1', metrics.render_metrics())
+
+    @override_settings(METRICS_AUTH_TOKEN='secret')
+    def test_metrics_require_token_if_configured(self):
+        """
+        Tests that /metrics is only served with the configured bearer token.
+        """
+
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(DEBUG=False, METRICS_AUTH_TOKEN=None)
+    def test_metrics_are_hidden_without_token(self):
+        """
+        Tests that /metrics is not served publicly when no token is configured outside DEBUG.
+        """
+
+        self.assertEqual(APIClient().get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,206 @@
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django_redis import get_redis_connection
+from .models import Video, VideoViewBucket
+from .queues import get_job_queue, job_failed, job_succeeded, job_timeout
+
+KEY_PREFIX = "videoflix:plays:"
+BUCKETS_KEY = KEY_PREFIX + "buckets"
+FOLD_SCHEDULED_KEY = KEY_PREFIX + "fold_scheduled"
+TRENDING_KEY = "videoflix:trending"
+
+# Plays are counted in Redis per time bucket of PLAY_BUCKET_SECONDS:
+# - videoflix:plays:<bucket>               hash video id -> number of plays,
+# - videoflix:plays:<bucket>:<video id>    HyperLogLog of the users who played the video,
+# - videoflix:plays:buckets                set of the buckets not folded completely yet.
+# A scheduled job ('fold_play_counts') copies them into VideoViewBucket rows and
+# recomputes the trending sorted set, so reading the trending list is a ZREVRANGE.
+
+
+def bucket_of(timestamp):
+    return int(timestamp // settings.PLAY_BUCKET_SECONDS)
+
+
+def plays_key(bucket):
+    return f"{KEY_PREFIX}{bucket}"
+
+
+def viewers_key(bucket, video_id):
+    return f"{KEY_PREFIX}{bucket}:{video_id}"
+
+
+def get_connection():
+    return get_redis_connection("default")
+
+
+def record_play(user_id, video_id, timestamp=None):
+    """
+    Count a play of a video in the current time bucket.
+
+    All commands are sent in one pipelined round trip; the database is not
+    touched. If no fold is pending, one is scheduled.
+
+    Parameters:
+    - user_id (int): The viewer, counted once per bucket as unique viewer.
+    - video_id (int): The played video.
+    - timestamp (float, optional): The time of the play. Defaults to now.
+    """
+
+    bucket = bucket_of(time.time() if timestamp is None else timestamp)
+    pipe = get_connection().pipeline(transaction=False)
+    pipe.hincrby(plays_key(bucket), video_id, 1)
+    pipe.pfadd(viewers_key(bucket, video_id), user_id)
+    pipe.expire(plays_key(bucket), settings.PLAY_KEY_TTL)
+    pipe.expire(viewers_key(bucket, video_id), settings.PLAY_KEY_TTL)
+    pipe.sadd(BUCKETS_KEY, bucket)
+    pipe.set(FOLD_SCHEDULED_KEY, 1, nx=True, ex=2 * settings.PLAY_FOLD_INTERVAL)
+    if pipe.execute()[-1]:
+        schedule_fold()
+
+
+def schedule_fold():
+    """
+    Enqueue 'fold_play_counts' to run after PLAY_FOLD_INTERVAL seconds.
+
+    The job runs on a worker started with '--with-scheduler' (as 'rqworkerpool' does).
+    """
+
+    get_job_queue("trending").enqueue_in(
+        timedelta(seconds=settings.PLAY_FOLD_INTERVAL),
+        fold_play_counts,
+        job_timeout=job_timeout("trending", 0),
+        on_success=job_succeeded,
+        on_failure=job_failed,
+    )
+
+
+def fold_play_counts(now=None):
+    """
+    Copy the play counters of all pending buckets into VideoViewBucket rows and update the trending list.
+
+    Every pending bucket is upserted with its current totals (plays and the
+    HyperLogLog estimate of unique viewers), so folding a bucket again, e.g.
+    the current one on the next run, overwrites the row instead of counting
+    plays twice. A bucket is closed once it ended PLAY_BUCKET_GRACE seconds
+    ago: it is folded one last time and its keys are deleted. While open
+    buckets remain or the trending list is not empty, the next fold is
+    scheduled, so the trending list keeps decaying, every bucket gets closed
+    and videos drop out of the list (until it is empty) once their plays
+    left the window, also if no more plays arrive. The 'scheduled' flag is cleared
+    when the fold starts and outlives the delay of a scheduled fold, so only
+    one fold is pending at a time.
+
+    Parameters:
+    - now (float, optional): The current time as timestamp. Defaults to now.
+
+    Returns:
+    - int: The number of VideoViewBucket rows written.
+    """
+
+    now = time.time() if now is None else now
+    connection = get_connection()
+    connection.delete(FOLD_SCHEDULED_KEY)
+    written = 0
+    pending = False
+    for bucket in sorted(int(bucket) for bucket in connection.smembers(BUCKETS_KEY)):
+        written += fold_bucket(connection, bucket)
+        if (bucket + 1) * settings.PLAY_BUCKET_SECONDS + settings.PLAY_BUCKET_GRACE <= now:
+            video_ids = connection.hkeys(plays_key(bucket))
+            connection.delete(plays_key(bucket), *(viewers_key(bucket, video_id.decode()) for video_id in video_ids))
+            connection.srem(BUCKETS_KEY, bucket)
+        else:
+            pending = True
+    listed = rebuild_trending(now)
+    if (pending or listed) and connection.set(FOLD_SCHEDULED_KEY, 1, nx=True, ex=2 * settings.PLAY_FOLD_INTERVAL):
+        schedule_fold()
+    return written
+
+
+def fold_bucket(connection, bucket):
+    """
+    Upsert the plays and unique viewers of one bucket, skipping videos deleted meanwhile.
+
+    Returns:
+    - int: The number of rows written.
+    """
+
+    plays = {int(video_id): int(count) for video_id, count in connection.hgetall(plays_key(bucket)).items()}
+    existing = list(Video.objects.filter(pk__in=plays).values_list("pk", flat=True))
+    pipe = connection.pipeline(transaction=False)
+    for video_id in existing:
+        pipe.pfcount(viewers_key(bucket, video_id))
+    viewers = pipe.execute()
+    bucket_start = datetime.fromtimestamp(bucket * settings.PLAY_BUCKET_SECONDS, tz=timezone.utc)
+    rows = [
+        VideoViewBucket(video_id=video_id, bucket_start=bucket_start, plays=plays[video_id], unique_viewers=count)
+        for video_id, count in zip(existing, viewers)
+    ]
+    VideoViewBucket.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["video", "bucket_start"],
+        update_fields=["plays", "unique_viewers"],
+    )
+    return len(rows)
+
+
+def rebuild_trending(now=None):
+    """
+    Recompute the trending sorted set from the VideoViewBucket rows of the last TRENDING_WINDOW seconds.
+
+    The score of a video is the sum of the unique viewers of its buckets,
+    each halved every TRENDING_HALF_LIFE seconds of age, so recent views
+    count most. The TRENDING_SIZE best videos are written to a new key that
+    replaces the list atomically. The key expires when its newest bucket
+    leaves the window, so the list does not outlive its plays even if no
+    fold runs anymore (e.g. no worker with a scheduler is running).
+
+    Parameters:
+    - now (float, optional): The current time as timestamp. Defaults to now.
+
+    Returns:
+    - int: The number of videos in the trending list.
+    """
+
+    now = time.time() if now is None else now
+    since = datetime.fromtimestamp(now - settings.TRENDING_WINDOW, tz=timezone.utc)
+    scores = defaultdict(float)
+    newest = 0.0
+    buckets = VideoViewBucket.objects.filter(bucket_start__gte=since).values_list("video_id", "bucket_start", "unique_viewers")
+    for video_id, bucket_start, unique_viewers in buckets.iterator():
+        age = max(0.0, now - bucket_start.timestamp() - settings.PLAY_BUCKET_SECONDS / 2)
+        scores[video_id] += unique_viewers * 0.5 ** (age / settings.TRENDING_HALF_LIFE)
+        newest = max(newest, bucket_start.timestamp())
+    best = dict(sorted(scores.items(), key=lambda item: item[1], reverse=True)[:settings.TRENDING_SIZE])
+
+    connection = get_connection()
+    if not best:
+        connection.delete(TRENDING_KEY)
+        return 0
+    pipe = connection.pipeline(transaction=True)
+    pipe.delete(TRENDING_KEY + ":new")
+    pipe.zadd(TRENDING_KEY + ":new", best)
+    pipe.rename(TRENDING_KEY + ":new", TRENDING_KEY)
+    pipe.expire(TRENDING_KEY, max(1, math.ceil(newest + settings.TRENDING_WINDOW - now)))
+    pipe.execute()
+    return len(best)
+
+
+def get_trending(limit):
+    """
+    Read the best videos of the trending list.
+
+    Parameters:
+    - limit (int): The number of videos.
+
+    Returns:
+    - list: Tuples (video id, score), best first.
+    """
+
+    return [
+        (int(video_id), score)
+        for video_id, score in get_connection().zrevrange(TRENDING_KEY, 0, limit - 1, withscores=True)
+    ]
@@ -0,0 +1,230 @@
+import base64
+import binascii
+import hashlib
+import os
+import threading
+import uuid
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django_redis import get_redis_connection
+from .models import Upload, Video
+
+# Version of the tus protocol (https://tus.io) the upload endpoints follow.
+TUS_VERSION = "1.0.0"
+
+# Redis key of the lock held by the request appending a chunk to an upload.
+LOCK_KEY = "videoflix:uploads:lock:{}"
+
+# Process-local running hashes: upload id -> (offset, sha256 object). Chunks of
+# one upload usually reach the same process, so the file only has to be read
+# again if an upload is resumed on another process or after a restart.
+_running_hashes = {}
+_running_hashes_lock = threading.Lock()
+
+
+def parse_upload_metadata(header):
+    """
+    Decode a tus 'Upload-Metadata' header.
+
+    The header is a comma separated list of 'key base64(value)' pairs.
+
+    Parameters:
+    - header (str): The header value (may be empty).
+
+    Returns:
+    - dict: The decoded values.
+
+    Raises:
+    - ValueError: If a value is not valid base64 encoded UTF-8.
+    """
+
+    metadata = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value.strip(), validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f"Invalid Upload-Metadata value for '{key}'.")
+    return metadata
+
+
+class UploadLocked(Exception):
+    """
+    Raised when a chunk is sent while another request is appending to the same upload.
+    """
+
+
+def reserve_upload_file(file_name):
+    """
+    Create the empty file a new upload is written to.
+
+    The file is created at its final location below MEDIA_ROOT/videos, so
+    completing the upload needs no copy. Creating it right away reserves the
+    name for later uploads of a file with the same name.
+
+    Parameters:
+    - file_name (str): The name of the uploaded file sent by the client.
+
+    Returns:
+    - str: The storage name of the file (e.g. "videos/movie.mp4").
+    """
+
+    name = default_storage.get_available_name(os.path.join("videos", os.path.basename(file_name)))
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return name
+
+
+def get_running_hash(upload):
+    """
+    Return the SHA-256 hash of the bytes of an upload received so far.
+
+    The process-local running hash is used if it covers exactly the current
+    offset; otherwise it is rebuilt from the file on disk.
+    """
+
+    with _running_hashes_lock:
+        entry = _running_hashes.pop(upload.id, None)
+    if entry is not None and entry[0] == upload.offset:
+        return entry[1]
+    digest = hashlib.sha256()
+    remaining = upload.offset
+    with open(default_storage.path(upload.file_name), "rb") as upload_file:
+        while remaining > 0:
+            data = upload_file.read(min(remaining, settings.UPLOAD_READ_SIZE))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest
+
+
+def append_chunk(upload, stream):
+    """
+    Append a chunk read from a request stream to the file of an upload.
+
+    Only one request appends to an upload at a time: a Redis lock per 
+    upload is taken first (shared by all processes) and held while the chunk 
+    is written and its offset stored. It expires after UPLOAD_LOCK_TIMEOUT 
+    seconds without progress, so a crashed process does not block the 
+    upload. The offset is read again once the lock is held.
+
+    The chunk is written at that offset, so bytes left over by an 
+    interrupted request are overwritten, and it is never written past the 
+    announced length. Afterwards the new offset is stored with a 
+    compare-and-set ('commit_chunk'), also if the client disconnects in the 
+    middle of the chunk, so the upload can be resumed from there.
+
+    Parameters:
+    - upload (Upload): The upload, as read before the chunk.
+    - stream: A file-like object with the chunk (e.g. the request), or None for an empty chunk.
+
+    Returns:
+    - int: The number of bytes written, or None if another request advanced the 
+      offset meanwhile (the chunk is discarded and 'upload' holds the current offset).
+
+    Raises:
+    - UploadLocked: If another request is appending to the upload.
+    """
+
+    connection = get_redis_connection("default")
+    key = LOCK_KEY.format(upload.pk)
+    token = uuid.uuid4().hex
+    if not connection.set(key, token, nx=True, ex=settings.UPLOAD_LOCK_TIMEOUT):
+        raise UploadLocked()
+    try:
+        start = upload.offset
+        upload.refresh_from_db(fields=["offset", "sha256"])
+        if upload.offset != start:
+            return None
+        return write_chunk(upload, stream, lambda: connection.expire(key, settings.UPLOAD_LOCK_TIMEOUT))
+    finally:
+        if connection.get(key) == token.encode():
+            connection.delete(key)
+
+
+def write_chunk(upload, stream, keep_lock):
+    """
+    Write a chunk at the current offset of an upload and commit it; the caller holds the upload lock.
+
+    'keep_lock' is called after every block read, to extend the lock.
+    """
+
+    start = upload.offset
+    digest = get_running_hash(upload)
+    written = 0
+    try:
+        with open(default_storage.path(upload.file_name), "r+b") as upload_file:
+            upload_file.seek(start)
+            while stream is not None and start + written < upload.length:
+                size = min(settings.UPLOAD_READ_SIZE, upload.length - start - written)
+                data = stream.read(size)
+                if not data:
+                    break
+                upload_file.write(data)
+                digest.update(data)
+                written += len(data)
+                keep_lock()
+    finally:
+        committed = commit_chunk(upload, start, written, digest)
+    return written if committed else None
+
+
+def commit_chunk(upload, start, written, digest):
+    """
+    Advance the offset of an upload by a written chunk, unless it changed since the chunk started.
+
+    The offset is only updated if it is still 'start' (a single conditional 
+    UPDATE), so a chunk is not counted if its lock expired and another 
+    request stored a chunk meanwhile. Once the upload is complete, the content hash is stored.
+
+    Parameters:
+    - upload (Upload): The upload, updated in place.
+    - start (int): The offset the chunk was written at.
+    - written (int): The number of bytes written.
+    - digest: The running SHA-256 hash including the chunk.
+
+    Returns:
+    - bool: Whether the offset was advanced.
+    """
+
+    offset = start + written
+    sha256 = digest.hexdigest() if offset >= upload.length else ""
+    if not Upload.objects.filter(pk=upload.pk, offset=start).update(offset=offset, sha256=sha256):
+        upload.refresh_from_db(fields=["offset", "sha256"])
+        return False
+    upload.offset, upload.sha256 = offset, sha256
+    if not upload.is_complete:
+        with _running_hashes_lock:
+            _running_hashes[upload.id] = (upload.offset, digest)
+    return True
+
+
+def create_upload_video(upload):
+    """
+    Create the Video of a completed upload, once.
+
+    The file is already at its final location, so it is only referenced, and 
+    the hash computed while receiving it is stored as the content hash. The 
+    upload row is locked while the Video is created, so repeated or 
+    concurrent final chunks create a single Video. Saving the Video starts 
+    its upload pipeline once the transaction is committed (see videoflix.signals).
+
+    Parameters:
+    - upload (Upload): The completed upload, updated in place.
+
+    Returns:
+    - Video: The video of the upload.
+    """
+
+    with transaction.atomic():
+        locked = Upload.objects.select_for_update().get(pk=upload.pk)
+        if locked.video_id is None:
+            locked.video = Video.objects.create(video_file=locked.file_name, content_hash=locked.sha256, **locked.metadata)
+            locked.save(update_fields=["video"])
+    upload.video = locked.video
+    return upload.video
@@ -1,25 +1,66 @@
 from django.conf import settings
 from django.shortcuts import render
-import requests
+from authemail.views import SignupVerify, PasswordResetVerify
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.authentication import TokenAuthentication
+from videoflix.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status, viewsets
-from django.core.cache.backends.base import DEFAULT_TIMEOUT
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
-from videoflix.models import Video
-from videoflix.serializers import VideoSerializer
+from videoflix.models import Upload, Video
+from videoflix.serializers import VideoCatalogSerializer, VideoSerializer
+from videoflix.renderers import FastJSONRenderer
+from rest_framework.renderers import BrowsableAPIRenderer
+from videoflix.pagination import VideoCursorPagination
+from videoflix.catalog_cache import (
+    LIST_NAMESPACE,
+    catalog_etag,
+    catalog_key,
+    detail_namespace,
+    genre_namespace,
+    get_catalog_state,
+    get_or_compute,
+    video_exists,
+)
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse, UnreadablePostError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date
+from django.views import View
+from urllib.parse import quote
+import os
+from videoflix.metrics import increment, render_metrics
+from videoflix.search import search_videos
+from videoflix.feed import build_home_feed, newest_per_genre
+from videoflix.progress import continue_watching, record_heartbeat
+from videoflix.trending import get_trending, record_play
+from videoflix.snapshots import (
+    choose_encoding,
+    get_snapshot,
+    schedule_snapshot_rebuild,
+)
+from videoflix.uploads import (
+    TUS_VERSION,
+    UploadLocked,
+    append_chunk,
+    create_upload_video,
+    parse_upload_metadata,
+    reserve_upload_file,
+)
+from videoflix.streaming import (
+    if_range_matches,
+    iter_file_range,
+    media_content_type,
+    media_etag,
+    media_file_path,
+    multipart_byteranges,
+    parse_range_header,
+)
 
 # Create your views here.
 
-CACHE_TTL = getattr(settings, "CACHE_TTL", DEFAULT_TIMEOUT)
-
 class LoginView(ObtainAuthToken):
     """
     Custom view for user login.
@@ -54,7 +95,8 @@ class LogoutView(APIView):
     Custom view for user logout.
     
     POST method: Requires authentication. The token of the authenticated user 
-    is deleted, effectively logging out the user.
+    is deleted, effectively logging out the user. Deleting the token also 
+    evicts it from the token caches (see CachedTokenAuthentication).
     
     Parameters:
     - request: HTTP POST request with authentication token.
@@ -63,12 +105,10 @@ class LogoutView(APIView):
     - Response: JSON message confirming successful logout.
     """
     
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        token = Token.objects.get(user=request.user)
-        token.delete()
         request.auth.delete()
         return Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
     
@@ -87,42 +127,342 @@ class VideoViewSet(viewsets.ModelViewSet):
     - IsAuthenticated: Only authenticated users can access this viewset.
     """
     
-    queryset = Video.objects.all().order_by("created_at")
+    queryset = Video.objects.prefetch_related("renditions").order_by("created_at")
     serializer_class = VideoSerializer
     permission_classes = [IsAuthenticated]
 
 
-# @method_decorator(cache_page(CACHE_TTL))
 class VideoView(APIView):
     """
     Custom API view for handling video resources.
     
     GET method:
     - If a primary key (pk) is provided, fetch a specific video by ID.
-    - If no pk is provided, fetch all available videos.
+    - If no pk is provided, fetch one page of videos ordered by creation date, 
+      optionally filtered by '?genre='. Pages are addressed with the 'cursor' 
+      links of the response (see VideoCursorPagination), so every page costs 
+      the same regardless of catalog size.
+    
+    Responses are cached per request URL in versioned catalog cache namespaces, 
+    which are invalidated when a video changes. The namespace version also 
+    yields the 'ETag' and 'Last-Modified' headers, so conditional requests 
+    ('If-None-Match', 'If-Modified-Since') are answered with 304 before any 
+    query or serialization happens.
     
-    Returns serialized video data in JSON format. Only accessible to authenticated users.
+    Returns serialized video data in JSON format, including the HLS master playlist 
+    URL and the available renditions. Only accessible to authenticated users.
     
     Parameters:
     - request: HTTP GET request.
     - pk (optional): Primary key of the video.
     
     Returns:
-    - Response: Serialized video data (single or list) in JSON format.
+    - Response: Serialized video data (single video or paginated list) in JSON format.
     """
     
     permission_classes = [IsAuthenticated]
+    pagination_class = VideoCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     def get(self, request, pk=None, format=None):
         try:
-            if pk:
-                video = get_object_or_404(Video, pk=pk)
-                serializer = VideoSerializer(video, context={'request': request})
+            namespace = self.get_cache_namespace(request, pk)
+            version, last_modified = get_catalog_state(namespace)
+            url = request.build_absolute_uri()
+            etag = catalog_etag(namespace, version, url, request.accepted_renderer.format)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                increment("videoflix_catalog_cache_total", {"result": "not_modified"})
             else:
-                videos = Video.objects.all()
-                serializer = VideoSerializer(videos, many=True, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
+                key = catalog_key(namespace, version, url)
+                data = get_or_compute(key, lambda: self.get_payload(request, pk))
+                response = Response(data, status=status.HTTP_200_OK)
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            response["Cache-Control"] = "private, no-cache"
+            return response
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def get_cache_namespace(self, request, pk):
+        """
+        Return the catalog cache namespace the requested data belongs to.
+        
+        Detail responses are invalidated per video, list responses per genre 
+        filter (see videoflix.catalog_cache).
+        """
+        
+        if pk:
+            return detail_namespace(pk)
+        genre = request.query_params.get("genre")
+        return genre_namespace(genre) if genre else LIST_NAMESPACE
+    
+    def get_payload(self, request, pk):
+        """
+        Query and serialize the requested video or page of videos.
+        
+        Only called on a cache miss. Rows are read with '.values()' and 
+        serialized by 'VideoCatalogSerializer', which returns the same data as 
+        'VideoSerializer' at a fraction of the cost.
+        """
+        
+        serializer = VideoCatalogSerializer(request)
+        videos = Video.objects.values(*serializer.fields)
+        if pk:
+            video = get_object_or_404(videos, pk=pk)
+            return serializer.serialize([video])[0]
+        genre = request.query_params.get("genre")
+        if genre:
+            videos = videos.filter(genre=genre)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(videos, request, view=self)
+        return paginator.get_paginated_response(serializer.serialize(page)).data
+        
+        
+class VideoSearchView(VideoView):
+    """
+    API view searching the catalog by title and description.
+    
+    GET method: Returns the videos matching all words of '?q=', best match 
+    first, optionally filtered by '?genre='. Every word also matches as a 
+    prefix, so the endpoint can be queried while the user types. '?limit=' 
+    sets the number of results (VIDEO_SEARCH_LIMIT by default, at most 
+    VIDEO_SEARCH_MAX_LIMIT). See videoflix.search.
+    
+    Results are cached and validated like the catalog pages (see VideoView), 
+    so repeated searches are answered without a query.
+    
+    Parameters:
+    - request: HTTP GET request.
+    
+    Returns:
+    - Response: The serialized matching videos as 'results'.
+    """
+    
+    def get_payload(self, request, pk):
+        """
+        Run the search and serialize the results. Only called on a cache miss.
+        """
+        
+        try:
+            limit = int(request.query_params.get("limit", settings.VIDEO_SEARCH_LIMIT))
+        except ValueError:
+            limit = settings.VIDEO_SEARCH_LIMIT
+        limit = max(1, min(limit, settings.VIDEO_SEARCH_MAX_LIMIT))
+        serializer = VideoCatalogSerializer(request)
+        videos = search_videos(request.query_params.get("q"), request.query_params.get("genre"))
+        return {"results": serializer.serialize(videos.values(*serializer.fields)[:limit])}
+        
+        
+class HomeFeedView(VideoView):
+    """
+    API view returning the rows of the home screen: the newest videos of every genre.
+    
+    GET method: Returns one row per entry of Video.GENRES with its newest 
+    videos, read by a single query with one index-bounded subquery per genre 
+    (see videoflix.feed). '?limit=' sets the videos per genre 
+    (VIDEO_HOME_FEED_SIZE by default, at most VIDEO_HOME_FEED_MAX_SIZE).
+    
+    The feed is cached in the catalog list namespace, so it is computed once 
+    per catalog version and validated with 'ETag' and 'Last-Modified' like 
+    the catalog pages (see VideoView).
+    
+    Parameters:
+    - request: HTTP GET request.
+    
+    Returns:
+    - Response: The rows as 'genres', each with 'genre', 'name' and 'results'.
+    """
+    
+    def get_cache_namespace(self, request, pk):
+        """
+        Every change of a video changes the feed, so it belongs to the list namespace.
+        """
+        
+        return LIST_NAMESPACE
+    
+    def get_payload(self, request, pk):
+        """
+        Query and serialize the newest videos of every genre. Only called on a cache miss.
+        """
+        
+        try:
+            limit = int(request.query_params.get("limit", settings.VIDEO_HOME_FEED_SIZE))
+        except ValueError:
+            limit = settings.VIDEO_HOME_FEED_SIZE
+        limit = max(1, min(limit, settings.VIDEO_HOME_FEED_MAX_SIZE))
+        serializer = VideoCatalogSerializer(request)
+        videos = serializer.serialize(newest_per_genre(limit, serializer.fields))
+        return {"genres": build_home_feed(videos)}
+        
+        
+class WatchProgressView(APIView):
+    """
+    API view recording playback positions and listing the videos to continue watching.
+    
+    POST method: Heartbeat of a player with 'video' (id) and 'position' (seconds). 
+    The position is stored in Redis only and written to the database in batches 
+    by a periodic job (see videoflix.progress), so heartbeats need no query 
+    (whether the video exists is cached, see 'video_exists').
+    
+    GET method: Returns the started, unfinished videos of the user, most 
+    recently watched first, with their positions ('?limit=', at most 
+    CONTINUE_WATCHING_SIZE). Positions are read from Redis, falling back to the 
+    database once if they are not cached.
+    
+    Parameters:
+    - request: HTTP POST request with 'video' and 'position', or GET request.
+    
+    Returns:
+    - Response: 204 No Content for a heartbeat, the list as 'results' for GET, 
+      400 Bad Request for invalid data or 404 Not Found for an unknown video.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    
+    def post(self, request, format=None):
+        try:
+            video_id = int(request.data.get("video"))
+            position = float(request.data.get("position"))
+        except (TypeError, ValueError):
+            return Response({'error': "'video' and 'position' are required numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if video_id < 1 or not 0 <= position < float("inf"):
+            return Response({'error': "Invalid video or position."}, status=status.HTTP_400_BAD_REQUEST)
+        if not video_exists(video_id):
+            return Response({'error': 'Video not found.'}, status=status.HTTP_404_NOT_FOUND)
+        record_heartbeat(request.user.pk, video_id, position)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    def get(self, request, format=None):
+        try:
+            limit = int(request.query_params.get("limit", settings.CONTINUE_WATCHING_SIZE))
+        except ValueError:
+            limit = settings.CONTINUE_WATCHING_SIZE
+        limit = max(1, min(limit, settings.CONTINUE_WATCHING_SIZE))
+        entries = continue_watching(request.user.pk, VideoCatalogSerializer(request), limit)
+        return Response({"results": entries}, status=status.HTTP_200_OK)
+        
+        
+class PlayView(APIView):
+    """
+    API view counting a play of a video.
+    
+    POST method: Called by the player when playback of a video starts. The 
+    play and the viewer are counted in Redis with one pipelined call, without 
+    a database query (see videoflix.trending; whether the video exists is 
+    cached, see 'video_exists').
+    
+    Parameters:
+    - request: HTTP POST request.
+    - pk: Primary key of the video.
+    
+    Returns:
+    - Response: 204 No Content, or 404 Not Found for an unknown video.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk, format=None):
+        if not video_exists(pk):
+            return Response({'error': 'Video not found.'}, status=status.HTTP_404_NOT_FOUND)
+        record_play(request.user.pk, pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TrendingView(APIView):
+    """
+    API view returning the trending videos.
+    
+    GET method: Returns the videos with the most recent unique viewers, best 
+    first, with their scores ('?limit=', at most TRENDING_SIZE). The list is 
+    precomputed by the scheduled fold of the play counters (see 
+    videoflix.trending), so it is read with a single ZREVRANGE.
+    
+    Parameters:
+    - request: HTTP GET request.
+    
+    Returns:
+    - Response: The trending videos as 'results', each with the serialized 'video' and its 'score'.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    
+    def get(self, request, format=None):
+        try:
+            limit = int(request.query_params.get("limit", settings.TRENDING_LIMIT))
+        except ValueError:
+            limit = settings.TRENDING_LIMIT
+        trending = get_trending(max(1, min(limit, settings.TRENDING_SIZE)))
+        serializer = VideoCatalogSerializer(request)
+        rows = Video.objects.filter(pk__in=[video_id for video_id, _ in trending]).values(*serializer.fields)
+        videos = {video["id"]: video for video in serializer.serialize(rows)}
+        results = [
+            {"video": videos[video_id], "score": round(score, 3)}
+            for video_id, score in trending
+            if video_id in videos
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class CatalogSnapshotView(APIView):
+    """
+    API view returning the whole catalog, or one genre, from a precomputed snapshot.
+    
+    GET method: Sends the stored snapshot (see videoflix.snapshots) in the best 
+    content coding the client accepts ('Accept-Encoding': br, gzip or none). 
+    Answering needs one cache round trip and no query, serialization or 
+    compression. Filter by '?genre='.
+    
+    If the catalog changed since the snapshot was built, the previous snapshot 
+    is still sent while a rebuild is queued. If there is no snapshot yet (cold 
+    start or evicted), a rebuild is queued and '503 Service Unavailable' is 
+    returned with 'Retry-After', so concurrent requests never serialize the 
+    catalog themselves. 'ETag' and 
+    'Last-Modified' are those of the snapshot, so conditional requests are 
+    answered with 304.
+    
+    Parameters:
+    - request: HTTP GET request.
+    
+    Returns:
+    - HttpResponse: The catalog as JSON ('count' and 'results'), a 304 response, or 
+      a 503 response while the snapshot is built.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, format=None):
+        genre = request.query_params.get("genre")
+        if genre and genre not in dict(Video.GENRES):
+            return Response({'error': f"Unknown genre '{genre}'."}, status=status.HTTP_400_BAD_REQUEST)
+        namespace = genre_namespace(genre) if genre else LIST_NAMESPACE
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        snapshot, stale = get_snapshot(namespace, encoding)
+        if stale:
+            schedule_snapshot_rebuild()
+        if snapshot is None:
+            increment("videoflix_catalog_snapshot_total", {"result": "miss", "encoding": "identity"})
+            response = Response(
+                {'error': 'The catalog snapshot is being built.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(settings.CATALOG_SNAPSHOT_RETRY_AFTER)},
+            )
+        else:
+            version, built_at, body = snapshot
+            etag = catalog_etag(namespace, version, "snapshot", encoding)
+            response = get_conditional_response(request, etag=etag, last_modified=built_at)
+            result = "not_modified" if response is not None else ("stale" if stale else "hit")
+            increment("videoflix_catalog_snapshot_total", {"result": result, "encoding": encoding})
+            if response is None:
+                response = HttpResponse(body, content_type="application/json")
+                if encoding != "identity":
+                    response["Content-Encoding"] = encoding
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(built_at)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        response["Cache-Control"] = "private, no-cache"
+        return response
         
         
 class RegisterVerified(APIView):
@@ -130,7 +470,8 @@ class RegisterVerified(APIView):
     Custom API view for handling user registration verification.
     
     GET method: Receives a verification code from the request's query parameters.
-    Sends a request to the authemail verification endpoint to verify the user.
+    Runs the authemail signup verification view in-process to verify the user, 
+    so the verification needs no second request to this server.
     
     On success:
     - Redirects the user to the frontend's registration success page.
@@ -145,15 +486,10 @@ class RegisterVerified(APIView):
     """
     
     def get(self, request, *args, **kwargs):
-        verification_code = request.query_params.get('code', None)
-        verify_url = f"http://127.0.0.1:8000/api/accounts/signup/verify/?code={verification_code}"
-        try:
-            response = requests.get(verify_url)
-            if response.status_code == 200:
-                return HttpResponseRedirect('http://localhost:4200/register-verified')
-            else:
-                return HttpResponseRedirect('http://localhost:4200/404')
-        except requests.exceptions.RequestException as e:
+        response = SignupVerify.as_view()(request._request)
+        if response.status_code == 200:
+            return HttpResponseRedirect('http://localhost:4200/register-verified')
+        else:
             return HttpResponseRedirect('http://localhost:4200/404')
         
         
@@ -162,7 +498,8 @@ class PasswordResetVerified(APIView):
     Custom API view for handling password reset verification.
     
     GET method: Receives a verification code from the request's query parameters.
-    Sends a request to the authemail password reset verification endpoint.
+    Runs the authemail password reset verification view in-process, so the 
+    verification needs no second request to this server.
     
     On success:
     - Redirects the user to the frontend password reset page with the verification code.
@@ -178,12 +515,256 @@ class PasswordResetVerified(APIView):
     
     def get(self, request, *args, **kwargs):
         verification_code = request.query_params.get('code', None)
-        verify_url = f"http://127.0.0.1:8000/api/accounts/password/reset/verify/?code={verification_code}"
-        try:
-            response = requests.get(verify_url)
-            if response.status_code == 200:
-                return HttpResponseRedirect(f'http://localhost:4200/password-reset?code={verification_code}')
+        response = PasswordResetVerify.as_view()(request._request)
+        if response.status_code == 200:
+            return HttpResponseRedirect(f'http://localhost:4200/password-reset?code={verification_code}')
+        else:
+            return HttpResponseRedirect('http://localhost:4200/404')
+        
+        
+class MediaStreamView(View):
+    """
+    View for serving uploaded media files with HTTP range support.
+    
+    The view does not authenticate requests, so its route is only registered 
+    with DEBUG enabled (see videoflix_backend.urls); in production the front 
+    proxy serves MEDIA_ROOT.
+    
+    GET/HEAD method: Sends a file below MEDIA_ROOT. Clients can request one or 
+    several byte ranges ('Range'), which are answered with '206 Partial Content' 
+    (a 'multipart/byteranges' body for several ranges) or '416' if none can be 
+    satisfied. 'If-Range', 'If-None-Match' and 'If-Modified-Since' are honoured, 
+    so seeking in a video only transfers the requested bytes.
+    
+    The file is streamed from disk in MEDIA_STREAM_CHUNK_SIZE chunks. If 
+    MEDIA_SENDFILE_BACKEND is set to 'x-accel-redirect' (nginx) or 'x-sendfile' 
+    (Apache/lighttpd), the transfer is handed to the front proxy instead and the 
+    worker is released immediately.
+    
+    Parameters:
+    - request: HTTP GET or HEAD request.
+    - path: The file path relative to MEDIA_URL.
+    
+    Returns:
+    - HttpResponse: The (partial) file content, a 304/412 response or a sendfile response.
+    """
+    
+    http_method_names = ["get", "head"]
+    
+    def get(self, request, path):
+        full_path = media_file_path(path)
+        stat_result = os.stat(full_path)
+        size = stat_result.st_size
+        last_modified = int(stat_result.st_mtime)
+        etag = media_etag(stat_result)
+        content_type = media_content_type(full_path)
+        
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", None)
+            if backend:
+                response = self.sendfile_response(path, full_path, backend, content_type)
             else:
-                return HttpResponseRedirect('http://localhost:4200/404')
-        except requests.exceptions.RequestException as e:
-            return HttpResponseRedirect('http://localhost:4200/404')
\ No newline at end of file
+                response = self.file_response(request, full_path, size, etag, last_modified, content_type)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Accept-Ranges"] = "bytes"
+        return response
+    
+    def sendfile_response(self, path, full_path, backend, content_type):
+        """
+        Hand the transfer over to the front proxy.
+        
+        The proxy resolves the internal location, applies range requests itself 
+        and sends the file, so no file data passes through the application.
+        """
+        
+        response = HttpResponse(content_type=content_type)
+        if backend == "x-accel-redirect":
+            prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+            response["X-Accel-Redirect"] = prefix + quote(path)
+        elif backend == "x-sendfile":
+            response["X-Sendfile"] = full_path
+        else:
+            raise ValueError(f"Unknown MEDIA_SENDFILE_BACKEND: {backend}")
+        return response
+    
+    def file_response(self, request, full_path, size, etag, last_modified, content_type):
+        """
+        Build a full, partial or multipart response streamed from disk.
+        """
+        
+        chunk_size = getattr(settings, "MEDIA_STREAM_CHUNK_SIZE", 64 * 1024)
+        ranges = None
+        if if_range_matches(request.headers.get("If-Range"), etag, last_modified):
+            ranges = parse_range_header(request.headers.get("Range"), size)
+        if ranges == []:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        
+        head = request.method == "HEAD"
+        if ranges is None:
+            response_status, content_type_header, length = status.HTTP_200_OK, content_type, size
+            body = iter_file_range(full_path, 0, size - 1, chunk_size)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response_status, content_type_header, length = status.HTTP_206_PARTIAL_CONTENT, content_type, end - start + 1
+            body = iter_file_range(full_path, start, end, chunk_size)
+        else:
+            boundary, length, body = multipart_byteranges(full_path, ranges, size, content_type, chunk_size)
+            response_status = status.HTTP_206_PARTIAL_CONTENT
+            content_type_header = f"multipart/byteranges; boundary={boundary}"
+        
+        if head:
+            response = HttpResponse(status=response_status, content_type=content_type_header)
+        else:
+            response = StreamingHttpResponse(body, status=response_status, content_type=content_type_header)
+        response["Content-Length"] = str(length)
+        if ranges is not None and len(ranges) == 1:
+            response["Content-Range"] = f"bytes {ranges[0][0]}-{ranges[0][1]}/{size}"
+        return response
+
+
+class UploadView(APIView):
+    """
+    API view for resumable video uploads, following the tus protocol (core).
+    
+    POST method: Starts an upload. Requires the 'Upload-Length' header and an 
+    'Upload-Metadata' header with the base64 encoded 'filename', 'title', 
+    'description' and optionally 'genre'. Responds with '201 Created' and the 
+    URL of the upload in 'Location'.
+    
+    GET/HEAD method: Returns the number of bytes received ('Upload-Offset') 
+    and the total size ('Upload-Length'), so an interrupted upload can be 
+    resumed from there. GET also returns the id of the created video.
+    
+    PATCH method: Appends a chunk ('Content-Type: application/offset+octet-stream') 
+    at 'Upload-Offset', which must match the bytes received so far ('409 Conflict' 
+    otherwise, also if another request appended meanwhile). The chunk is written 
+    directly to the final file below MEDIA_ROOT/videos while a running SHA-256 
+    hash is updated; no database transaction is held while it streams in. Once 
+    the last byte arrives, the Video is created (once, also for repeated final 
+    chunks) and its upload pipeline starts.
+    
+    Uploads are only visible to the user who started them.
+    
+    Parameters:
+    - request: HTTP POST, GET, HEAD or PATCH request.
+    - pk (optional): The UUID of the upload.
+    
+    Returns:
+    - Response: The upload state, with the tus headers.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk=None):
+        length = request.headers.get("Upload-Length", "")
+        if not length.isdigit():
+            return Response({'error': 'Upload-Length header required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if int(length) > settings.UPLOAD_MAX_SIZE:
+            return Response({'error': 'Upload too large.'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            metadata = parse_upload_metadata(request.headers.get("Upload-Metadata"))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not metadata.get("filename"):
+            return Response({'error': 'Upload-Metadata must contain a filename.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = VideoSerializer(data={key: metadata[key] for key in ("title", "description", "genre") if key in metadata})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = Upload.objects.create(
+            user=request.user,
+            file_name=reserve_upload_file(metadata["filename"]),
+            length=int(length),
+            metadata=serializer.validated_data,
+        )
+        response = Response(self.get_state(upload), status=status.HTTP_201_CREATED)
+        response["Location"] = request.build_absolute_uri(f"{upload.pk}/")
+        response["Upload-Offset"] = str(upload.offset)
+        return response
+    
+    def get(self, request, pk=None):
+        upload = get_object_or_404(Upload, pk=pk, user=request.user)
+        response = Response(self.get_state(upload), status=status.HTTP_200_OK)
+        response["Upload-Offset"] = str(upload.offset)
+        response["Upload-Length"] = str(upload.length)
+        response["Cache-Control"] = "no-store"
+        return response
+    
+    def patch(self, request, pk=None):
+        if request.content_type != "application/offset+octet-stream":
+            return Response({'error': 'Content-Type must be application/offset+octet-stream.'}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        offset = request.headers.get("Upload-Offset", "")
+        if not offset.isdigit():
+            return Response({'error': 'Upload-Offset header required.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        upload = get_object_or_404(Upload, pk=pk, user=request.user)
+        if int(offset) != upload.offset:
+            return Response({'error': 'Upload-Offset does not match.'}, status=status.HTTP_409_CONFLICT, headers={"Upload-Offset": str(upload.offset)})
+        if not upload.is_complete:
+            try:
+                written = append_chunk(upload, request.stream)
+            except UnreadablePostError:
+                written = 0
+            except UploadLocked:
+                return Response({'error': 'Another chunk of this upload is being written.'}, status=status.HTTP_423_LOCKED, headers={"Upload-Offset": str(upload.offset)})
+            if written is None:
+                return Response({'error': 'Upload-Offset does not match.'}, status=status.HTTP_409_CONFLICT, headers={"Upload-Offset": str(upload.offset)})
+        
+        if upload.is_complete and upload.video_id is None:
+            create_upload_video(upload)
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response["Upload-Offset"] = str(upload.offset)
+        return response
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        response["Tus-Resumable"] = TUS_VERSION
+        return response
+    
+    def get_state(self, upload):
+        """
+        Return the JSON representation of an upload.
+        """
+        
+        return {
+            "id": str(upload.pk),
+            "offset": upload.offset,
+            "length": upload.length,
+            "video": upload.video_id,
+        }
+
+
+class MetricsView(View):
+    """
+    View exposing the application metrics for Prometheus.
+    
+    GET method: Returns request latencies per URL pattern, catalog cache and 
+    token authentication counters, background job and transcode durations, 
+    FFMPEG failures and the state of the RQ queues in the text exposition 
+    format (see videoflix.metrics).
+    
+    The scraper must send METRICS_AUTH_TOKEN as 'Authorization: Bearer <token>'. 
+    Without a configured token the metrics are only served with DEBUG enabled, 
+    since they expose routes, queues and job internals.
+    
+    Parameters:
+    - request: HTTP GET request.
+    
+    Returns:
+    - HttpResponse: The metrics as plain text, 401 without a valid token or 403 if 
+      no token is configured outside DEBUG.
+    """
+    
+    http_method_names = ["get"]
+    
+    def get(self, request):
+        token = getattr(settings, "METRICS_AUTH_TOKEN", None)
+        if not token and not settings.DEBUG:
+            return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+        if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -70,6 +70,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken',
@@ -81,6 +82,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'videoflix.metrics.MetricsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -180,23 +182,91 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
 IMPORT_EXPORT_USE_TRANSACTIONS = True
 
+# Shown by the API while the thumbnail of a new upload is generated in the background.
+THUMBNAIL_PLACEHOLDER = 'videoflix/thumbnail_placeholder.svg'
+
+# Smaller copies of every thumbnail for responsive images (videoflix.tasks.create_thumbnail_variants):
+# the widths in pixels and the formats, "webp" and/or "avif" (needs FFmpeg 6 built with libaom).
+THUMBNAIL_VARIANT_WIDTHS = (160, 320, 480, 854)
+THUMBNAIL_VARIANT_FORMATS = ('webp',)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Catalog pagination (videoflix.pagination.VideoCursorPagination)
+VIDEO_PAGE_SIZE = 24
+VIDEO_MAX_PAGE_SIZE = 100
+
+# Catalog search (videoflix.search): results per request (default and maximum), the minimum
+# number of letters and digits searched for and the maximum number of words.
+VIDEO_SEARCH_LIMIT = 20
+VIDEO_SEARCH_MAX_LIMIT = 50
+VIDEO_SEARCH_MIN_LENGTH = 2
+VIDEO_SEARCH_MAX_WORDS = 8
+
+# Watch progress (videoflix.progress): heartbeats are kept in Redis for WATCH_PROGRESS_CACHE_TTL
+# seconds after the last one and written to the database every WATCH_PROGRESS_FLUSH_INTERVAL
+# seconds in batches of WATCH_PROGRESS_FLUSH_BATCH_SIZE. A video counts as finished at
+# WATCH_PROGRESS_FINISHED_RATIO of its duration. "Continue watching" lists CONTINUE_WATCHING_SIZE
+# videos, picked from the WATCH_PROGRESS_MAX_ENTRIES most recently watched ones.
+WATCH_PROGRESS_CACHE_TTL = 30 * 24 * 3600
+WATCH_PROGRESS_FLUSH_INTERVAL = 30
+WATCH_PROGRESS_FLUSH_BATCH_SIZE = 1000
+WATCH_PROGRESS_FINISHED_RATIO = 0.95
+WATCH_PROGRESS_MAX_ENTRIES = 100
+CONTINUE_WATCHING_SIZE = 20
+
+# View counting and trending (videoflix.trending): plays are counted in Redis per bucket of
+# PLAY_BUCKET_SECONDS and folded into the database every PLAY_FOLD_INTERVAL seconds. A bucket is
+# closed PLAY_BUCKET_GRACE seconds after it ended; its keys expire after PLAY_KEY_TTL at the latest.
+# The trending list holds the TRENDING_SIZE videos with the most unique viewers over the last
+# TRENDING_WINDOW seconds, where views lose half their weight every TRENDING_HALF_LIFE seconds.
+PLAY_BUCKET_SECONDS = 3600
+PLAY_BUCKET_GRACE = 300
+PLAY_FOLD_INTERVAL = 60
+PLAY_KEY_TTL = 2 * 24 * 3600
+TRENDING_WINDOW = 3 * 24 * 3600
+TRENDING_HALF_LIFE = 24 * 3600
+TRENDING_SIZE = 100
+TRENDING_LIMIT = 20
+
+# Videos per genre row of the home feed (videoflix.feed): default and maximum.
+VIDEO_HOME_FEED_SIZE = 12
+VIDEO_HOME_FEED_MAX_SIZE = 50
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'videoflix.authentication.CachedTokenAuthentication',
     ]
 }
 
+# Token lookups of CachedTokenAuthentication are cached in Redis (without the password hash).
+# A deleted token is evicted at once, so it is rejected by every worker process.
+TOKEN_CACHE_TTL = 60 * 5
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# With DEBUG enabled, media files are served by 'videoflix.views.MediaStreamView' with byte-range
+# support (without authentication, so the route is not registered otherwise; in production the
+# front proxy serves MEDIA_ROOT, see the nginx example in README.md). Set MEDIA_SENDFILE_BACKEND
+# to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd) to let the proxy send the file.
+MEDIA_STREAM_CHUNK_SIZE = 64 * 1024
+MEDIA_SENDFILE_BACKEND = os.getenv('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Resumable uploads (videoflix.uploads): largest accepted file, the size of the
+# blocks read from a request and written to disk, and the seconds after which the
+# lock of a request appending a chunk expires if no block arrives.
+UPLOAD_MAX_SIZE = 20 * 1024 ** 3
+UPLOAD_READ_SIZE = 1024 * 1024
+UPLOAD_LOCK_TIMEOUT = 60
+
 AUTH_USER_MODEL = 'videoflix.MyUser'
 
 # Bypass SSL certificate verification (for local development only)
@@ -217,6 +287,17 @@ EMAIL_USE_SSL = False
 
 CACHE_TTL = 60 * 15
 
+# Seconds a catalog cache miss may take before waiting requests compute it themselves
+# (dogpile protection in videoflix.catalog_cache.get_or_compute).
+CATALOG_CACHE_LOCK_TIMEOUT = 10
+
+# Site URL the absolute media URLs of the precomputed catalog snapshots (videoflix.snapshots,
+# served on /videos/snapshot/) are built with, since they are not built for a request.
+CATALOG_SNAPSHOT_BASE_URL = os.getenv('SITE_URL', default='http://127.0.0.1:8000')
+
+# Seconds clients are asked to wait (Retry-After) while a missing catalog snapshot is built.
+CATALOG_SNAPSHOT_RETRY_AFTER = 5
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
@@ -240,12 +321,71 @@ def show_toolbar(request):
 
 DEBUG_TOOLBAR_CONFIG = { 'SHOW_TOOLBAR_CALLBACK': show_toolbar,}
 
+# Metrics exposed on /metrics (videoflix.metrics). Measurements are buffered per process and
+# written to Redis every METRICS_FLUSH_INTERVAL seconds. Scrapers must send METRICS_AUTH_TOKEN as
+# 'Authorization: Bearer <token>'; without a token, /metrics is only served with DEBUG enabled.
+METRICS_ENABLED = True
+METRICS_FLUSH_INTERVAL = 5
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN') or None
+
+RQ_CONNECTION = {
+    'HOST': 'localhost',
+    'PORT': 6379,
+    'DB': 0,
+    'PASSWORD': 'foobared',
+}
+
 RQ_QUEUES = {
-    'default': {
-        'HOST': 'localhost',
-        'PORT': 6379,
-        'DB': 0,
-        'PASSWORD': 'foobared',
-        'DEFAULT_TIMEOUT': 360
-    },
+    'default': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 360},
+    'thumbnail': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 120},
+    'hash': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 1800},
+    'transcode_fast': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 1800},
+    'transcode_heavy': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 4 * 3600},
+}
+
+# Job classes of the upload pipeline (videoflix.queues): the queue a job is routed to and
+# its timeout, BASE_TIMEOUT + TIMEOUT_PER_SECOND * duration of the source in seconds
+# (+ TIMEOUT_PER_GB * size of the source file, for jobs running before it is probed).
+# If neither is known, the DEFAULT_TIMEOUT of the queue applies.
+VIDEO_JOB_CLASSES = {
+    'hash': {'QUEUE': 'hash', 'BASE_TIMEOUT': 60, 'TIMEOUT_PER_SECOND': 0, 'TIMEOUT_PER_GB': 30},
+    'probe': {'QUEUE': 'thumbnail', 'BASE_TIMEOUT': 60, 'TIMEOUT_PER_SECOND': 0},
+    'thumbnail': {'QUEUE': 'thumbnail', 'BASE_TIMEOUT': 60, 'TIMEOUT_PER_SECOND': 0},
+    'preview': {'QUEUE': 'transcode_fast', 'BASE_TIMEOUT': 60, 'TIMEOUT_PER_SECOND': 0.2},
+    'fast_transcode': {'QUEUE': 'transcode_fast', 'BASE_TIMEOUT': 120, 'TIMEOUT_PER_SECOND': 1},
+    'heavy_transcode': {'QUEUE': 'transcode_heavy', 'BASE_TIMEOUT': 300, 'TIMEOUT_PER_SECOND': 6},
+    'split': {'QUEUE': 'transcode_fast', 'BASE_TIMEOUT': 120, 'TIMEOUT_PER_SECOND': 0.1},
+    'concat': {'QUEUE': 'default', 'BASE_TIMEOUT': 120, 'TIMEOUT_PER_SECOND': 0.5},
+    'finalize': {'QUEUE': 'default', 'BASE_TIMEOUT': 120, 'TIMEOUT_PER_SECOND': 0.5},
+    'snapshot': {'QUEUE': 'default', 'BASE_TIMEOUT': 300, 'TIMEOUT_PER_SECOND': 0},
+    'progress': {'QUEUE': 'default', 'BASE_TIMEOUT': 300, 'TIMEOUT_PER_SECOND': 0},
+    'trending': {'QUEUE': 'default', 'BASE_TIMEOUT': 300, 'TIMEOUT_PER_SECOND': 0},
+}
+
+# x264 encoder settings of the renditions (see 'python manage.py benchmark_transcode').
+# A thread count of 0 lets x264 choose one based on the number of cores.
+VIDEO_X264_PRESET = 'medium'
+VIDEO_X264_CRF = 23
+VIDEO_X264_THREADS = 0
+
+# Sources of at least VIDEO_CHUNKED_MIN_DURATION seconds are split into segments of about
+# VIDEO_CHUNK_SECONDS (a multiple of the HLS segment length), which are transcoded in parallel
+# by all workers and joined afterwards. Set VIDEO_CHUNKED_MIN_DURATION to None to disable.
+VIDEO_CHUNKED_MIN_DURATION = 600
+VIDEO_CHUNK_SECONDS = 60
+
+# Seek-preview sprite sheets (videoflix.tasks.create_preview_sprites): one frame every
+# VIDEO_PREVIEW_INTERVAL seconds, scaled to VIDEO_PREVIEW_SIZE (width, height) and tiled
+# into sheets of VIDEO_PREVIEW_GRID (columns, rows) frames.
+VIDEO_PREVIEW_INTERVAL = 5
+VIDEO_PREVIEW_SIZE = (160, 90)
+VIDEO_PREVIEW_GRID = (10, 10)
+
+# Number of workers started per queue by 'python manage.py rqworkerpool'.
+RQ_WORKER_POOL = {
+    'default': 1,
+    'thumbnail': 1,
+    'hash': 1,
+    'transcode_fast': 2,
+    'transcode_heavy': 2,
 }
@@ -15,11 +15,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 '''
 from django.contrib import admin
-from django.urls import include, path
-from videoflix.views import LoginView, LogoutView, VideoView, RegisterVerified, PasswordResetVerified
+from django.urls import include, path, re_path
+from videoflix.views import LoginView, LogoutView, VideoView, RegisterVerified, PasswordResetVerified, MediaStreamView, MetricsView, UploadView, CatalogSnapshotView, VideoSearchView, HomeFeedView, WatchProgressView, PlayView, TrendingView
 from django.conf import settings
-from django.conf.urls.static import static
-from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+import re
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,7 +27,25 @@ urlpatterns = [
     path('api/accounts/', include('authemail.urls')),
     path('__debug__/', include('debug_toolbar.urls')),
     path('django-rq/', include('django_rq.urls')),
+    path('metrics', MetricsView.as_view()),
     path('videos/', VideoView.as_view()),
+    path('videos/snapshot/', CatalogSnapshotView.as_view()),
+    path('videos/search/', VideoSearchView.as_view()),
+    path('videos/home/', HomeFeedView.as_view()),
+    path('videos/trending/', TrendingView.as_view()),
+    path('videos/<int:pk>/play/', PlayView.as_view()),
+    path('videos/<int:pk>/', VideoView.as_view()),
+    path('progress/', WatchProgressView.as_view()),
+    path('uploads/', UploadView.as_view()),
+    path('uploads/<uuid:pk>/', UploadView.as_view()),
     path('register-verified/', RegisterVerified.as_view()),
     path('password-reset-verified/', PasswordResetVerified.as_view()),
-] +  static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# Media files are served by Django during development only. In production the front proxy
+# serves MEDIA_ROOT itself (see the nginx example in README.md).
+media_urlpatterns = [
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), MediaStreamView.as_view()),
+]
+if settings.DEBUG:
+    urlpatterns += media_urlpatterns